@@ -58,6 +58,7 @@ setup(
             "wagtail-factories>=4.0.0,<5.0",
         ],
         "docs": ["pydoc-markdown==4.6.3"],
+        "orjson": ["orjson>=3.0"],
     },
     zip_safe=False,
 )
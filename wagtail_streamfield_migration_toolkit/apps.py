@@ -1,7 +1,30 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, pre_migrate
 
 
 class WagtailStreamfieldMigrationToolkitAppConfig(AppConfig):
+    default_auto_field = "django.db.models.AutoField"
     label = "wagtail_streamfield_migration_toolkit"
     name = "wagtail_streamfield_migration_toolkit"
     verbose_name = "Wagtail streamfield-migration-toolkit"
+
+    def ready(self):
+        from wagtail_streamfield_migration_toolkit.coalesce import (
+            flush_stream_data_queue,
+            run_recorded_stream_data_operations,
+        )
+        from wagtail_streamfield_migration_toolkit.deferred import (
+            enable_migrate_on_read,
+            get_migrate_on_read_setting,
+        )
+        from wagtail_streamfield_migration_toolkit.pending_migrations import (
+            clear_pending_migrations,
+        )
+
+        # The migration files are reloaded before the recorded operations are looked up in them
+        pre_migrate.connect(clear_pending_migrations, sender=self)
+        pre_migrate.connect(run_recorded_stream_data_operations, sender=self)
+        post_migrate.connect(flush_stream_data_queue, sender=self)
+
+        if get_migrate_on_read_setting():
+            enable_migrate_on_read()
@@ -0,0 +1,6 @@
+def parse_block_path(block_path_str):
+    """Splits a '.' separated block path string into a list of block names"""
+
+    if block_path_str == "":
+        return []
+    return block_path_str.split(".")
@@ -0,0 +1,406 @@
+import logging
+from django.db import connections, transaction
+from django.db.migrations import AlterField
+from django.db.migrations.recorder import MigrationRecorder
+from wagtail.fields import StreamField
+
+from wagtail_streamfield_migration_toolkit import utils
+from wagtail_streamfield_migration_toolkit.pending_migrations import (
+    pending_migrations,
+)
+
+logger = logging.getLogger(__name__)
+
+# The options of `MigrateStreamData` operations which must be the same for the operations to be
+# run together
+COMBINED_OPTIONS = [
+    "revisions_from",
+    "chunk_size",
+    "row_source",
+    "workers",
+    "writer",
+    "raw",
+    "json_backend",
+    "revision_fields",
+    "interleave_revisions",
+    "revisions_keep_recent",
+    "revision_cache_bytes",
+]
+
+
+def get_combined_options(operation):
+    return {option: getattr(operation, option) for option in COMBINED_OPTIONS}
+
+
+def can_combine_with_following(operation, following_operations, apps, connection):
+    """Whether an operation with `coalesce=True` can be left pending until the next stream data
+    operation on the same model among the following operations, so that both are run together.
+
+    This is the case if the next stream data operation on the model also has `coalesce=True` and
+    the same options, and no operation in between may change the table of the model or read or
+    write its data. Operations which only change the block definitions of StreamFields of the model
+    don't affect the table.
+
+    Args:
+        operation: The `MigrateStreamData` operation being run.
+        following_operations (:obj:`list` of :obj:`tuple` of (str, operation)): The app label and
+            each operation to be applied after the operation, in order.
+        apps: The project state before the operation.
+        connection: The database connection the operation is run on.
+    """
+
+    from wagtail_streamfield_migration_toolkit.migrate_operation import (
+        MigrateStreamData,
+        MigrateStreamDataBatch,
+    )
+
+    model_name = operation.model_name.lower()
+    model = apps.get_model(operation.app_name, operation.model_name)
+    for app_label, following_operation in following_operations:
+        if isinstance(following_operation, MigrateStreamData):
+            if (
+                following_operation.app_name != operation.app_name
+                or following_operation.model_name.lower() != model_name
+            ):
+                # Other models' operations only change the revisions of those models
+                continue
+            return following_operation.coalesce and get_combined_options(
+                following_operation
+            ) == get_combined_options(operation)
+
+        if isinstance(following_operation, MigrateStreamDataBatch):
+            if any(
+                batched_operation.app_name == operation.app_name
+                and batched_operation.model_name.lower() == model_name
+                for batched_operation in following_operation.operations
+            ):
+                return False
+            continue
+
+        if (
+            isinstance(following_operation, AlterField)
+            and app_label == operation.app_name
+            and following_operation.model_name_lower == model_name
+            and isinstance(following_operation.field, StreamField)
+        ):
+            field = model._meta.get_field(following_operation.name)
+            if isinstance(field, StreamField) and field.db_type(
+                connection
+            ) == following_operation.field.db_type(connection):
+                continue
+
+        if following_operation.references_model(model_name, operation.app_name):
+            return False
+        # The revisions are kept in tables of wagtailcore
+        for revision_model_name in ("revision", "pagerevision"):
+            if following_operation.references_model(revision_model_name, "wagtailcore"):
+                return False
+
+    return False
+
+
+def get_following_operations(migration, index, later_migrations=()):
+    """Returns the app label and each operation to be applied after the operation at the given
+    index of a migration, in order, followed by the operations of the later migrations."""
+
+    following_operations = [
+        (migration.app_label, operation)
+        for operation in migration.operations[index + 1:]
+    ]
+    for later_migration in later_migrations:
+        following_operations.extend(
+            (later_migration.app_label, operation)
+            for operation in later_migration.operations
+        )
+    return following_operations
+
+
+def can_leave_pending_for_later_migrations(apps, schema_editor):
+    """Whether operations can be left pending for the operations of later migrations.
+
+    The migration must be run in a transaction, so that the pending operation is recorded in the
+    database along with the migration, and must depend on the migrations of this package.
+    """
+
+    if not schema_editor.atomic_migration:
+        return False
+    try:
+        apps.get_model(
+            "wagtail_streamfield_migration_toolkit", "PendingStreamDataOperation"
+        )
+    except LookupError:
+        return False
+    return True
+
+
+class StreamDataQueue:
+    """Keeps `MigrateStreamData` operations with `coalesce=True` pending until the next stream
+    data operation on the same model, so that consecutive operations on a model are run in a
+    single pass over its instances and revisions.
+
+    An operation is only left pending if it is safe to run it later, see
+    `can_combine_with_following`, so the pending operations of a model are run by the last of them.
+    An operation which is left pending for an operation of a later migration is recorded as a
+    `models.PendingStreamDataOperation` in the transaction of its migration, and the record is
+    deleted in the transaction which runs it. Operations which are still pending when `migrate`
+    finishes (for example when it is run up to a given migration) are run on the `post_migrate`
+    signal, and those left pending by a `migrate` which was stopped are run on the `pre_migrate`
+    signal of the next one.
+    """
+
+    def __init__(self):
+        # The pending operations of each model, along with the project state before each of them,
+        # the schema editor of their migration and the id of their record, by the database
+        # alias, app label and model name
+        self.pending = {}
+
+    def clear(self):
+        self.pending = {}
+
+    def add(self, operation, apps, schema_editor):
+        from wagtail_streamfield_migration_toolkit.models import (
+            PendingStreamDataOperation,
+        )
+
+        connection = schema_editor.connection
+        key = (
+            connection.alias,
+            operation.app_name,
+            operation.model_name.lower(),
+        )
+        pending = self.get_valid_pending(self.pending.pop(key, []), schema_editor)
+        if operation.get_pending_revision_ids(apps, connection) is not None:
+            # The revisions which earlier deferred migrations haven't migrated yet are recorded
+            # under the deferred migration of the operation, so it is run by itself
+            if pending:
+                self.run(pending, schema_editor)
+            operation.migrate_stream_data(apps, schema_editor)
+            return
+
+        found = pending_migrations.find(operation, connection)
+        if found is None:
+            # The operation isn't in a migration file
+            pending.append((operation, apps, schema_editor, None))
+            self.run(pending, schema_editor)
+            return
+
+        migration, index = found
+        pending_operation_id = None
+        if not can_combine_with_following(
+            operation, get_following_operations(migration, index), apps, connection
+        ):
+            if not can_leave_pending_for_later_migrations(
+                apps, schema_editor
+            ) or not can_combine_with_following(
+                operation,
+                get_following_operations(
+                    migration, index, self.get_later_migrations(migration, connection)
+                ),
+                apps,
+                connection,
+            ):
+                pending.append((operation, apps, schema_editor, None))
+                self.run(pending, schema_editor)
+                return
+            pending_operation_id = (
+                PendingStreamDataOperation.objects.using(connection.alias)
+                .create(
+                    app_label=migration.app_label,
+                    migration_name=migration.name,
+                    operation_index=index,
+                    key=operation.checkpoint_key,
+                )
+                .pk
+            )
+        pending.append((operation, apps, schema_editor, pending_operation_id))
+        self.pending[key] = pending
+
+    def get_valid_pending(self, pending, schema_editor):
+        """Drops the pending operations of a migration which failed. Operations left pending for
+        a later operation of their migration are only valid in the same run of the migration,
+        while operations left pending for a later migration are valid as long as their record
+        hasn't been rolled back."""
+
+        from wagtail_streamfield_migration_toolkit.models import (
+            PendingStreamDataOperation,
+        )
+
+        pending_operation_ids = [
+            pending_operation_id
+            for _, _, _, pending_operation_id in pending
+            if pending_operation_id is not None
+        ]
+        if pending_operation_ids:
+            pending_operation_ids = set(
+                PendingStreamDataOperation.objects.using(
+                    schema_editor.connection.alias
+                )
+                .filter(pk__in=pending_operation_ids)
+                .values_list("pk", flat=True)
+            )
+        return [
+            (operation, apps, operation_schema_editor, pending_operation_id)
+            for operation, apps, operation_schema_editor, pending_operation_id in pending
+            if (
+                pending_operation_id in pending_operation_ids
+                if pending_operation_id is not None
+                else operation_schema_editor is schema_editor
+            )
+        ]
+
+    def get_later_migrations(self, migration, connection):
+        """Returns the pending migrations to be applied after a migration, in order"""
+
+        migrations = pending_migrations.get(connection)
+        keys = [
+            (pending_migration.app_label, pending_migration.name)
+            for pending_migration in migrations
+        ]
+        return migrations[keys.index((migration.app_label, migration.name)) + 1:]
+
+    def run(self, pending, schema_editor):
+        """Runs the pending operations of a model in a single pass, and deletes their records"""
+
+        from wagtail_streamfield_migration_toolkit.migrate_operation import (
+            MigrateStreamFields,
+        )
+        from wagtail_streamfield_migration_toolkit.models import (
+            PendingStreamDataOperation,
+        )
+
+        pending_operation_ids = [
+            pending_operation_id
+            for _, _, _, pending_operation_id in pending
+            if pending_operation_id is not None
+        ]
+        if pending_operation_ids:
+            PendingStreamDataOperation.objects.using(
+                schema_editor.connection.alias
+            ).filter(pk__in=pending_operation_ids).delete()
+
+        if len(pending) == 1:
+            [(operation, apps, _, _)] = pending
+            operation.migrate_stream_data(apps, schema_editor)
+            return
+
+        # The table of the model is unchanged since the first operation, but the latest state
+        # has the latest block definitions
+        last_operation, last_apps, _, _ = pending[-1]
+        fields_operations_and_block_paths = {}
+        plans_by_field_name = {}
+        for operation, apps, _, _ in pending:
+            plan = operation.make_plan(
+                apps.get_model(operation.app_name, operation.model_name)
+            )
+            for (field_name, operations_and_block_paths), field_plan in zip(
+                operation.get_fields_operations_and_block_paths(), plan.plans
+            ):
+                fields_operations_and_block_paths.setdefault(field_name, []).extend(
+                    operations_and_block_paths
+                )
+                plans_by_field_name.setdefault(field_name, []).append(field_plan)
+
+        combined_operation = MigrateStreamFields(
+            app_name=last_operation.app_name,
+            model_name=last_operation.model_name,
+            fields_operations_and_block_paths=fields_operations_and_block_paths,
+            **get_combined_options(last_operation)
+        )
+        combined_operation.migrate_stream_data(
+            last_apps,
+            schema_editor,
+            plan=utils.StreamFieldsMigrationPlan(
+                [
+                    utils.ChainedMigrationPlan(plans_by_field_name[field_name])
+                    for field_name in combined_operation.get_field_names()
+                ]
+            ),
+        )
+
+    def flush(self, connection):
+        """Runs the pending operations on the database of the connection, including those which
+        were left pending by an earlier `migrate`"""
+
+        for key in list(self.pending):
+            if key[0] != connection.alias:
+                continue
+            pending = self.pending.pop(key)
+            # The operations only change data, so the schema editor is only used for its
+            # connection, outside of a migration
+            with transaction.atomic(using=connection.alias):
+                schema_editor = connection.schema_editor(atomic=False)
+                pending = self.get_valid_pending(pending, schema_editor)
+                if pending:
+                    self.run(pending, schema_editor)
+        self.run_recorded(connection)
+
+    def run_recorded(self, connection):
+        """Runs the operations which were recorded as pending but not run, e.g. because
+        `migrate` was stopped. The operations are found in the migration files, and run against
+        the state of the project before each of them, see `PendingMigrations.get_state`."""
+
+        from wagtail_streamfield_migration_toolkit.models import (
+            PendingStreamDataOperation,
+        )
+
+        if (
+            PendingStreamDataOperation._meta.db_table
+            not in connection.introspection.table_names()
+        ):
+            return
+        pending_operations = list(
+            PendingStreamDataOperation.objects.using(connection.alias).order_by("pk")
+        )
+        if not pending_operations:
+            return
+
+        loader = pending_migrations.get_loader(connection)
+        applied = MigrationRecorder(connection).applied_migrations()
+        pending_by_model = {}
+        for pending_operation in pending_operations:
+            migration_key = (pending_operation.app_label, pending_operation.migration_name)
+            if migration_key not in applied:
+                # The migration will run the operation again
+                pending_operation.delete()
+                continue
+            migration = loader.graph.nodes.get(migration_key)
+            index = pending_operation.operation_index
+            operation = None
+            if migration is not None and index < len(migration.operations):
+                operation = migration.operations[index]
+            if getattr(operation, "checkpoint_key", None) != pending_operation.key:
+                logger.warning(
+                    "Can't find the pending stream data operation %s of the migration %s.%s, "
+                    "its data has to be migrated again",
+                    pending_operation.key,
+                    pending_operation.app_label,
+                    pending_operation.migration_name,
+                )
+                pending_operation.delete()
+                continue
+
+            state = pending_migrations.get_state(migration, index, connection)
+            pending_by_model.setdefault(
+                (operation.app_name, operation.model_name.lower()), []
+            ).append((operation, state.apps, None, pending_operation.pk))
+
+        for pending in pending_by_model.values():
+            with transaction.atomic(using=connection.alias):
+                self.run(pending, connection.schema_editor(atomic=False))
+
+
+stream_data_queue = StreamDataQueue()
+
+
+def run_recorded_stream_data_operations(sender, using, **kwargs):
+    """`pre_migrate` handler which drops the operations left pending by an earlier run of
+    `migrate` in this process, and runs those recorded in the database"""
+
+    stream_data_queue.clear()
+    stream_data_queue.run_recorded(connections[using])
+
+
+def flush_stream_data_queue(sender, using, **kwargs):
+    """`post_migrate` handler which runs the operations still pending when `migrate` finishes"""
+
+    stream_data_queue.flush(connections[using])
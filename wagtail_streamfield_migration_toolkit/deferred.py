@@ -0,0 +1,384 @@
+import functools
+import logging
+import time
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.migrations.loader import MigrationLoader
+
+from wagtail_streamfield_migration_toolkit import utils
+from wagtail_streamfield_migration_toolkit.json_backends import StdlibJSONBackend
+from wagtail_streamfield_migration_toolkit.pending_migrations import (
+    iter_stream_data_operations,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def get_revision_model():
+    try:
+        from wagtail.models import Revision
+    except ImportError:
+        # Wagtail 3
+        from wagtail.models import PageRevision as Revision
+    return Revision
+
+
+class DeferredMigrationRegistry:
+    """Keeps the plans of `MigrateStreamData` operations, by the key of their deferred migration.
+
+    Besides the operations with `defer_revisions=True`, any operation may have a deferred
+    migration, for the revisions which an earlier deferred migration of its fields hadn't migrated
+    yet when it was run.
+
+    Operations are registered when they are run, by their checkpoint key. Operations which were
+    run in another process are found in the migration files of all apps, and the plan of each is
+    compiled against the definition of the StreamField at the state of the project before the
+    migration, either when it is needed or by `preload`.
+    """
+
+    def __init__(self):
+        self.plans = {}
+        self.preloaded = False
+        self.loader = None
+        # The migration key of each operation in the migration files, by the key of its deferred
+        # migration
+        self.migration_keys = None
+        # The checkpoint key of each operation run in this process, by the key of its deferred
+        # migration
+        self.checkpoint_keys = {}
+
+    def register(self, operation, plan):
+        self.plans[operation.checkpoint_key] = (operation.get_field_names(), plan)
+
+    def add_key(self, key, operation):
+        """Finds the plan of an operation run in this process by the key of its deferred
+        migration"""
+
+        self.checkpoint_keys[key] = operation.checkpoint_key
+
+    def load_from_migrations(self):
+        self.loader = MigrationLoader(None, ignore_no_migrations=True)
+        self.migration_keys = {}
+        for key, migration in self.loader.disk_migrations.items():
+            for _, operation in iter_stream_data_operations(migration):
+                deferred_migration_key = operation.make_deferred_migration_key(
+                    migration.app_label, migration.name
+                )
+                self.migration_keys[deferred_migration_key] = (key, operation)
+
+    def load_plan(self, key, migration_key, operation, states=None):
+        if states is not None and migration_key in states:
+            state = states[migration_key]
+        else:
+            state = self.loader.project_state(migration_key, at_end=False)
+            if states is not None:
+                states[migration_key] = state
+        model = state.apps.get_model(operation.app_name, operation.model_name)
+        self.plans[key] = (
+            operation.get_field_names(),
+            utils.StreamFieldsMigrationPlan(
+                [
+                    utils.StreamDataMigrationPlan(
+                        stream_block=getattr(model, field_name).field.stream_block,
+                        operations_and_block_paths=operations_and_block_paths,
+                    )
+                    for field_name, operations_and_block_paths in (
+                        operation.get_fields_operations_and_block_paths()
+                    )
+                ]
+            ),
+        )
+
+    def preload(self, keys):
+        """Compiles the plans of the deferred migrations with the given keys together, so that
+        the state of the project before a migration is only rendered once for its operations."""
+
+        self.preloaded = True
+        keys = [key for key in keys if key not in self.plans]
+        if not keys:
+            return
+        if self.migration_keys is None:
+            self.load_from_migrations()
+        # The state of the project before each migration, shared by its operations
+        states = {}
+        for key in keys:
+            if key in self.migration_keys:
+                self.load_plan(key, *self.migration_keys[key], states=states)
+
+    def get(self, key):
+        """Returns the names of the StreamFields and the plan of the deferred migration with the
+        given key, or `None` if the operation can't be found."""
+
+        if key not in self.plans:
+            if self.checkpoint_keys.get(key) in self.plans:
+                return self.plans[self.checkpoint_keys[key]]
+            if self.migration_keys is None:
+                self.load_from_migrations()
+            if key in self.migration_keys:
+                self.load_plan(key, *self.migration_keys[key])
+        return self.plans.get(key)
+
+
+registry = DeferredMigrationRegistry()
+
+
+class UnmigratedRevisionsGuard:
+    """Caches whether there are any unmigrated revisions for `ttl` seconds, so that revisions
+    aren't looked up one by one when there are none."""
+
+    ttl = 60
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.expires_at = None
+        self.has_unmigrated_revisions = None
+
+    def __call__(self):
+        from wagtail_streamfield_migration_toolkit.models import UnmigratedRevision
+
+        now = time.monotonic()
+        if self.expires_at is None or now >= self.expires_at:
+            self.has_unmigrated_revisions = UnmigratedRevision.objects.exists()
+            self.expires_at = now + self.ttl
+        return self.has_unmigrated_revisions
+
+
+has_unmigrated_revisions = UnmigratedRevisionsGuard()
+
+
+def migrate_deferred_revision(revision):
+    """Applies the deferred migrations which haven't been applied to a revision yet to its
+    content, in the order they were run. The revision isn't written back, its stored content is
+    migrated by `migrate_deferred_revisions`.
+
+    If the operation of a deferred migration can't be found, or the stream data of the revision is
+    invalid for it, that migration and the ones after it are left unapplied.
+
+    Returns:
+        Whether any deferred migrations were applied.
+    """
+
+    from wagtail_streamfield_migration_toolkit.models import (
+        DeferredStreamDataMigration,
+        UnmigratedRevision,
+    )
+
+    # The content of a revision instance is only migrated once
+    if getattr(revision, "_deferred_migrations_applied", False):
+        return False
+    revision._deferred_migrations_applied = True
+
+    if not has_unmigrated_revisions():
+        return False
+
+    if not registry.preloaded:
+        # The plans of all deferred migrations are compiled when the first revision is read,
+        # rather than one by one
+        registry.preload(
+            DeferredStreamDataMigration.objects.values_list("key", flat=True)
+        )
+
+    deferred_migrations = [
+        unmigrated_revision.deferred_migration
+        for unmigrated_revision in UnmigratedRevision.objects.filter(
+            revision_id=revision.pk
+        )
+        .select_related("deferred_migration")
+        .order_by("deferred_migration_id")
+    ]
+    applied = False
+    for deferred_migration in deferred_migrations:
+        field_names_and_plan = registry.get(deferred_migration.key)
+        if field_names_and_plan is None:
+            logger.warning(
+                "Can't find the operation of the deferred migration %s",
+                deferred_migration.key,
+            )
+            break
+
+        field_names, plan = field_names_and_plan
+        [(raw_data_tuple, error)] = plan.apply_to_chunk(
+            [tuple(revision.content.get(field_name) for field_name in field_names)],
+            json_backend=StdlibJSONBackend(),
+        )
+        if error is not None:
+            logger.error(
+                "Invalid block def in revision id (%s) for the deferred migration %s",
+                revision.pk,
+                deferred_migration.key,
+                exc_info=error,
+            )
+            break
+        if raw_data_tuple is not None:
+            for field_name, raw_data in zip(field_names, raw_data_tuple):
+                if raw_data is not None:
+                    revision.content[field_name] = raw_data
+        applied = True
+    return applied
+
+
+def get_as_object_method_name(RevisionModel):
+    """The name of the method which creates the object of a revision from its content, which is
+    used to compare, revert to and preview revisions"""
+
+    if hasattr(RevisionModel, "as_object"):
+        return "as_object"
+    # Wagtail 3
+    return "as_page_object"
+
+
+def enable_migrate_on_read():
+    """Applies the deferred migrations of revisions when the object of a revision is created from
+    its content."""
+
+    RevisionModel = get_revision_model()
+    method_name = get_as_object_method_name(RevisionModel)
+    as_object = getattr(RevisionModel, method_name)
+    if hasattr(as_object, "without_migrate_on_read"):
+        return
+
+    @functools.wraps(as_object)
+    def as_object_migrated_on_read(revision, *args, **kwargs):
+        migrate_deferred_revision(revision)
+        return as_object(revision, *args, **kwargs)
+
+    as_object_migrated_on_read.without_migrate_on_read = as_object
+    setattr(RevisionModel, method_name, as_object_migrated_on_read)
+
+
+def disable_migrate_on_read():
+    RevisionModel = get_revision_model()
+    method_name = get_as_object_method_name(RevisionModel)
+    as_object = getattr(RevisionModel, method_name)
+    if hasattr(as_object, "without_migrate_on_read"):
+        setattr(RevisionModel, method_name, as_object.without_migrate_on_read)
+
+
+def get_migrate_on_read_setting():
+    return getattr(
+        settings, "WAGTAIL_STREAMFIELD_MIGRATION_TOOLKIT_MIGRATE_ON_READ", False
+    )
+
+
+def migrate_deferred_revisions(
+    deferred_migration, chunk_size=1024, sleep=0, json_backend=None, writer=None
+):
+    """Applies a deferred migration to its unmigrated revisions in chunks, committing each chunk
+    in its own transaction.
+
+    The unmigrated revisions are fetched in order of their revision ids, and are removed once
+    they have been migrated, so a run which is stopped can be continued by running it again.
+    Revisions which still have an unmigrated revision of an earlier deferred migration, or which
+    have invalid stream data, are left unmigrated.
+
+    Args:
+        deferred_migration: The `models.DeferredStreamDataMigration` to apply.
+        chunk_size (:obj:`int`, optional): The number of revisions in each chunk. Defaults to
+            1024.
+        sleep (:obj:`float`, optional): Seconds to wait between chunks, to limit the load on the
+            database. Defaults to 0.
+        json_backend (:obj:`str`, optional): Name of the JSON library to decode and encode
+            revision content with, see `json_backends.get_json_backend`. Defaults to `None`.
+        writer (:obj:`object`, optional): Writes back the changed revisions. Defaults to
+            `writers.BulkUpdateWriter()`.
+
+    Yields:
+        The number of revisions in each chunk which were migrated.
+    """
+
+    from wagtail_streamfield_migration_toolkit.json_backends import get_json_backend
+    from wagtail_streamfield_migration_toolkit.migrate_operation import (
+        RevisionContentCodec,
+    )
+    from wagtail_streamfield_migration_toolkit.models import UnmigratedRevision
+    from wagtail_streamfield_migration_toolkit.writers import (
+        BulkUpdateWriter,
+        supports_json_key_writes,
+    )
+
+    field_names_and_plan = registry.get(deferred_migration.key)
+    if field_names_and_plan is None:
+        logger.warning(
+            "Can't find the operation of the deferred migration %s",
+            deferred_migration.key,
+        )
+        return
+    field_names, plan = field_names_and_plan
+
+    RevisionModel = get_revision_model()
+    using = router.db_for_write(RevisionModel)
+    writer = writer or BulkUpdateWriter()
+    codec = RevisionContentCodec(
+        field_names,
+        get_json_backend(json_backend),
+        ["id"] if supports_json_key_writes(connections[using]) else None,
+    )
+    unmigrated_revisions = UnmigratedRevision.objects.filter(
+        deferred_migration=deferred_migration
+    ).exclude(
+        revision_id__in=UnmigratedRevision.objects.filter(
+            deferred_migration_id__lt=deferred_migration.id
+        ).values("revision_id")
+    )
+
+    last_revision_id = None
+    while True:
+        chunk = unmigrated_revisions.order_by("revision_id")
+        if last_revision_id is not None:
+            chunk = chunk.filter(revision_id__gt=last_revision_id)
+        revision_ids = list(chunk.values_list("revision_id", flat=True)[:chunk_size])
+        if not revision_ids:
+            return
+        last_revision_id = revision_ids[-1]
+
+        with transaction.atomic(using=using):
+            revisions = []
+            stream_data_list = []
+            for revision in codec.prepare_queryset(
+                RevisionModel.objects.using(using).filter(pk__in=revision_ids)
+            ):
+                stream_data = codec.get_stream_data(revision)
+                if any(data is not None for data in stream_data):
+                    revisions.append(revision)
+                    stream_data_list.append(stream_data)
+            results = plan.apply_to_chunk(
+                stream_data_list, json_backend=codec.json_backend
+            )
+
+            # Revisions which have been deleted or have no stream data for the fields don't need
+            # to be migrated
+            migrated_revision_ids = set(revision_ids) - {
+                revision.pk for revision in revisions
+            }
+            updated_revisions = {field_name: [] for field_name in field_names}
+            for revision, (raw_data_tuple, error) in zip(revisions, results):
+                if error is not None:
+                    logger.error(
+                        "Invalid block def in revision id (%s) for the deferred migration %s",
+                        revision.pk,
+                        deferred_migration.key,
+                        exc_info=error,
+                    )
+                    continue
+                migrated_revision_ids.add(revision.pk)
+                if raw_data_tuple is not None:
+                    codec.set_stream_data(revision, raw_data_tuple)
+                    for field_name, raw_data in zip(field_names, raw_data_tuple):
+                        if raw_data is not None:
+                            updated_revisions[field_name].append(revision)
+
+            for field_name, revisions_of_field in updated_revisions.items():
+                if revisions_of_field:
+                    writer.write_json_key(
+                        RevisionModel, revisions_of_field, "content", field_name, using
+                    )
+            UnmigratedRevision.objects.filter(
+                deferred_migration=deferred_migration,
+                revision_id__in=migrated_revision_ids,
+            ).delete()
+
+        yield len(migrated_revision_ids)
+        if sleep:
+            time.sleep(sleep)
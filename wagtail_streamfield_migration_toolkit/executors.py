@@ -0,0 +1,164 @@
+import os
+import pickle
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import django
+
+from wagtail_streamfield_migration_toolkit import utils
+
+
+class SerialPlanExecutor:
+    """Applies a `utils.StreamDataMigrationPlan` to chunks of raw stream data in the current
+    process."""
+
+    def __init__(self, plan):
+        self.plan = plan
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def submit(self, raw_data_list, json_backend=None):
+        """Applies the plan to a chunk straight away. Returns a future which is already done."""
+
+        future = Future()
+        try:
+            future.set_result(
+                self.plan.apply_to_chunk(raw_data_list, json_backend=json_backend)
+            )
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def apply_to_chunk(self, raw_data_list, json_backend=None):
+        """See `utils.StreamDataMigrationPlan.apply_to_chunk`"""
+        return self.submit(raw_data_list, json_backend=json_backend).result()
+
+
+# The plan of the migration being run and its result caches, in each worker process
+_worker_plan = None
+_worker_caches = []
+
+
+def _init_worker(pickled_plan):
+    global _worker_plan, _worker_caches
+    # Worker processes which are spawned rather than forked need to set up Django before the
+    # operations of the plan (and the block classes they may import) can be loaded.
+    django.setup()
+    _worker_plan = pickle.loads(pickled_plan)
+    _worker_caches = utils.get_result_caches(_worker_plan)
+
+
+def _apply_to_chunk_in_worker(raw_data_list, json_backend):
+    """Returns the results for a part of a chunk, along with the id of the worker process and the
+    hits and misses of each of its result caches for the part, and the size of each cache."""
+
+    counts = [(cache.hits, cache.misses) for cache in _worker_caches]
+    results = _worker_plan.apply_to_chunk(raw_data_list, json_backend=json_backend)
+    return (
+        results,
+        os.getpid(),
+        [
+            (cache.hits - hits, cache.misses - misses, cache.size)
+            for cache, (hits, misses) in zip(_worker_caches, counts)
+        ],
+    )
+
+
+class ProcessPoolPlanExecutor:
+    """Applies a `utils.StreamDataMigrationPlan` to chunks of raw stream data in a pool of worker
+    processes, with each chunk split evenly between the workers.
+
+    The plan is sent to each worker once, when the pool is started, so the operations of the plan
+    must be picklable. The database is only accessed from the main process.
+
+    Each worker keeps its own copy of the result caches of the plan (see
+    `utils.CachedMigrationPlan`), so they may take up to `workers` times their maximum size. The
+    hits and misses of the caches of the workers are added to the caches of the plan in the main
+    process as the results of each chunk are collected, and their size is set to the total size
+    of the caches of all workers.
+
+    Args:
+        plan: The `utils.StreamDataMigrationPlan` to apply.
+        workers (int): The number of worker processes.
+    """
+
+    def __init__(self, plan, workers):
+        self.plan = plan
+        self.workers = workers
+        self.pool = None
+        self.caches = utils.get_result_caches(plan)
+        # The size of each result cache in each worker, by the id of the worker process and the
+        # index of the cache
+        self.cache_sizes = {}
+
+    def __enter__(self):
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(pickle.dumps(self.plan),),
+        )
+        return self
+
+    def __exit__(self, *exc_info):
+        self.pool.shutdown()
+        self.pool = None
+
+    def submit(self, raw_data_list, json_backend=None):
+        """Starts applying the plan to a chunk in the worker processes, without waiting for it to
+        finish. Returns a future for the results of the whole chunk."""
+
+        part_size = max(-(-len(raw_data_list) // self.workers), 1)
+        return _ChunkFuture(
+            [
+                self.pool.submit(
+                    _apply_to_chunk_in_worker,
+                    raw_data_list[i:i + part_size],
+                    json_backend,
+                )
+                for i in range(0, len(raw_data_list), part_size)
+            ],
+            self.add_cache_stats,
+        )
+
+    def add_cache_stats(self, pid, cache_stats):
+        """Adds the hits and misses of the result caches of a worker for a part of a chunk to the
+        caches of the plan"""
+
+        for i, (cache, (hits, misses, size)) in enumerate(
+            zip(self.caches, cache_stats)
+        ):
+            cache.hits += hits
+            cache.misses += misses
+            self.cache_sizes[pid, i] = size
+            cache.size = sum(
+                worker_size
+                for (_, cache_index), worker_size in self.cache_sizes.items()
+                if cache_index == i
+            )
+
+    def apply_to_chunk(self, raw_data_list, json_backend=None):
+        """See `utils.StreamDataMigrationPlan.apply_to_chunk`"""
+        return self.submit(raw_data_list, json_backend=json_backend).result()
+
+
+class _ChunkFuture:
+    """Combines the futures for the parts of a chunk which were sent to different workers, and
+    passes on the statistics of the result caches of the workers for each part"""
+
+    def __init__(self, part_futures, add_cache_stats):
+        self.part_futures = part_futures
+        self.add_cache_stats = add_cache_stats
+        self.results = None
+
+    def result(self):
+        if self.results is None:
+            results = []
+            for part_future in self.part_futures:
+                part_results, pid, cache_stats = part_future.result()
+                results.extend(part_results)
+                self.add_cache_stats(pid, cache_stats)
+            self.results = results
+        return self.results
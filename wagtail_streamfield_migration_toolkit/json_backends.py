@@ -0,0 +1,91 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class StdlibJSONBackend:
+    """Encodes and decodes JSON with the `json` module of the standard library"""
+
+    name = "json"
+
+    def loads(self, s):
+        return json.loads(s)
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+
+class OrjsonBackend:
+    """Encodes and decodes JSON with `orjson`. The JSON is encoded without whitespace and with
+    non ASCII characters as they are.
+
+    Note that `orjson` decodes integers which don't fit in 64 bits as floats, and encodes `NaN` and
+    infinite floats as `null`. JSON which `orjson` can't decode, such as the `NaN` values written by
+    the `json` module, is decoded with the `json` module instead.
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+
+    def loads(self, s):
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            return json.loads(s)
+
+    def dumps(self, obj):
+        return orjson.dumps(obj).decode()
+
+
+class UjsonBackend:
+    """Encodes and decodes JSON with `ujson`. The JSON is encoded without whitespace."""
+
+    name = "ujson"
+
+    def __init__(self):
+        if ujson is None:
+            raise ImportError("ujson is not installed")
+
+    def loads(self, s):
+        return ujson.loads(s)
+
+    def dumps(self, obj):
+        return ujson.dumps(obj)
+
+
+JSON_BACKENDS = {
+    backend_class.name: backend_class
+    for backend_class in [OrjsonBackend, UjsonBackend, StdlibJSONBackend]
+}
+
+
+def get_json_backend(name=None):
+    """Returns the JSON backend with the given name (`"orjson"`, `"ujson"` or `"json"`).
+
+    If no name is given, the `json` module of the standard library is used, since the other
+    libraries don't decode all JSON in the same way (see `OrjsonBackend`).
+    """
+
+    if name is None:
+        return StdlibJSONBackend()
+
+    try:
+        backend_class = JSON_BACKENDS[name]
+    except KeyError:
+        raise ValueError(
+            "Unknown JSON backend {}, expected one of {}".format(
+                name, ", ".join(JSON_BACKENDS)
+            )
+        )
+    return backend_class()
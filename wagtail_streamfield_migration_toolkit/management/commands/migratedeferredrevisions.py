@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from wagtail_streamfield_migration_toolkit.deferred import migrate_deferred_revisions
+from wagtail_streamfield_migration_toolkit.models import DeferredStreamDataMigration
+
+
+class Command(BaseCommand):
+    help = "Migrate the revisions left unmigrated by MigrateStreamData operations with \
+        defer_revisions=True, in chunks. Can be stopped and run again at any time."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "keys",
+            nargs="*",
+            help="Keys of the deferred migrations to apply. Applies all of them by default.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1024,
+            help="Number of revisions to migrate in each transaction.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to wait between chunks.",
+        )
+        parser.add_argument(
+            "--json-backend",
+            help="JSON library to decode and encode revision content with.",
+        )
+
+    def handle(self, *args, **options):
+        deferred_migrations = DeferredStreamDataMigration.objects.order_by("id")
+        if options["keys"]:
+            deferred_migrations = deferred_migrations.filter(key__in=options["keys"])
+
+        for deferred_migration in deferred_migrations:
+            self.stdout.write("Migrating revisions for {}".format(deferred_migration.key))
+
+            migrated_count = 0
+            for chunk_migrated_count in migrate_deferred_revisions(
+                deferred_migration,
+                chunk_size=options["chunk_size"],
+                sleep=options["sleep"],
+                json_backend=options["json_backend"],
+            ):
+                migrated_count += chunk_migrated_count
+                self.stdout.write("  {} revisions migrated".format(migrated_count))
+
+            remaining_count = deferred_migration.unmigrated_revisions.count()
+            if remaining_count:
+                self.stdout.write(
+                    "  {} revisions could not be migrated".format(remaining_count)
+                )
+            else:
+                deferred_migration.delete()
@@ -11,7 +11,12 @@ from wagtail.fields import StreamField
 from wagtail_streamfield_migration_toolkit.autodetect.streamchangedetector import (
     StreamDefChangeDetector,
 )
-from wagtail_streamfield_migration_toolkit.migrate_operation import MigrateStreamData
+from wagtail_streamfield_migration_toolkit.migrate_operation import (
+    make_stream_data_migration,
+)
+from wagtail_streamfield_migration_toolkit.optimizer import (
+    optimize_operations_and_block_paths,
+)
 
 
 class Command(BaseCommand):
@@ -42,6 +47,9 @@ class Command(BaseCommand):
                 if isinstance(op, AlterField) and isinstance(op.field, StreamField):
                     changed_streamfields.append(op)
 
+            # The operations of the changed streamfields of each model, so that they are all
+            # migrated with a single operation
+            fields_operations_and_block_paths_by_model = {}
             for op in changed_streamfields:
                 print("\nCHANGES FOR MODEL " + op.model_name)
 
@@ -57,11 +65,22 @@ class Command(BaseCommand):
                 comparer.create_data_migration_operations()
                 # print(comparer.merged_operations_and_block_paths)
 
-                migration_operation = MigrateStreamData(
+                # Blocks are only renamed to names which aren't in the old definition
+                fields_operations_and_block_paths_by_model.setdefault(op.model_name, {})[
+                    op.name
+                ] = optimize_operations_and_block_paths(
+                    comparer.merged_operations_and_block_paths,
+                    assume_new_names_unused=True,
+                )
+
+            for (
+                model_name,
+                fields_operations_and_block_paths,
+            ) in fields_operations_and_block_paths_by_model.items():
+                migration_operation = make_stream_data_migration(
                     app_name=app,
-                    model_name=op.model_name,
-                    field_name=op.name,
-                    operations_and_block_paths=comparer.merged_operations_and_block_paths,
+                    model_name=model_name,
+                    fields_operations_and_block_paths=fields_operations_and_block_paths,
                 )
                 migration_operations.append(migration_operation)
 
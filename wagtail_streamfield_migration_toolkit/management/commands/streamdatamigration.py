@@ -9,7 +9,9 @@ from django.db.migrations.writer import MigrationWriter
 from django.apps import apps
 from wagtail.blocks import StreamBlock, StructBlock
 
-from wagtail_streamfield_migration_toolkit.migrate_operation import MigrateStreamData
+from wagtail_streamfield_migration_toolkit.migrate_operation import (
+    make_stream_data_migration,
+)
 from wagtail_streamfield_migration_toolkit.operations import (
     RemoveStreamChildrenOperation,
     RenameStreamChildrenOperation,
@@ -78,9 +80,9 @@ class Command(BaseCommand):
         loader.build_graph()
         self.project_state = loader.project_state()
 
-        # Since a single `MigrateStreamData` operation is defined for a specific streamfield,
-        # we will keep the intra field operations for each specific streamfield here.
-        operations_and_block_paths_by_model_field = {}
+        # Since a single operation migrates all the streamfields of a model, we will keep the
+        # intra field operations for each streamfield of each model here.
+        fields_operations_and_block_paths_by_model = {}
 
         for path in self.paths:
             model_name, field_name, block_path = self.parse_path(path)
@@ -90,30 +92,24 @@ class Command(BaseCommand):
                 field_name=field_name,
                 **options
             )
-            key = (model_name, field_name)
-            if key in operations_and_block_paths_by_model_field:
-                operations_and_block_paths_by_model_field[key].append(
-                    operation_and_block_path
-                )
-            else:
-                operations_and_block_paths_by_model_field[key] = [
-                    operation_and_block_path
-                ]
+            fields_operations_and_block_paths = (
+                fields_operations_and_block_paths_by_model.setdefault(model_name, {})
+            )
+            fields_operations_and_block_paths.setdefault(field_name, []).append(
+                operation_and_block_path
+            )
 
         migration = Migration(self.migration_name, self.app_label)
         migration.operations = []
         for (
             model_name,
-            field_name,
-        ), operations_and_block_paths in (
-            operations_and_block_paths_by_model_field.items()
-        ):
+            fields_operations_and_block_paths,
+        ) in fields_operations_and_block_paths_by_model.items():
             migration.operations.append(
-                MigrateStreamData(
+                make_stream_data_migration(
                     app_name=self.app_label,
                     model_name=model_name,
-                    field_name=field_name,
-                    operations_and_block_paths=operations_and_block_paths,
+                    fields_operations_and_block_paths=fields_operations_and_block_paths,
                 )
             )
 
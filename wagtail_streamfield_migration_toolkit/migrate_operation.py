@@ -1,13 +1,50 @@
+import bisect
+import contextlib
+import hashlib
 import json
 import logging
-from collections import OrderedDict
-from django.db.models import JSONField, F, Q, Subquery, OuterRef
-from django.db.models.functions import Cast
+from array import array
+from collections import OrderedDict, deque
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import (
+    JSONField,
+    TextField,
+    F,
+    Q,
+    Subquery,
+    OuterRef,
+    Window,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast, RowNumber
 from django.db.migrations import RunPython
+from django.db.migrations.serializer import serializer_factory
 from django.utils.functional import cached_property
 from wagtail.blocks import StreamValue
 
 from wagtail_streamfield_migration_toolkit import utils
+from wagtail_streamfield_migration_toolkit.coalesce import stream_data_queue
+from wagtail_streamfield_migration_toolkit.deferred import (
+    registry as deferred_migration_registry,
+)
+from wagtail_streamfield_migration_toolkit.executors import (
+    ProcessPoolPlanExecutor,
+    SerialPlanExecutor,
+)
+from wagtail_streamfield_migration_toolkit.json_backends import get_json_backend
+from wagtail_streamfield_migration_toolkit.optimizer import (
+    optimize_operations_and_block_paths,
+)
+from wagtail_streamfield_migration_toolkit.pending_migrations import (
+    pending_migrations,
+)
+from wagtail_streamfield_migration_toolkit.row_sources import QuerysetIteratorRowSource
+from wagtail_streamfield_migration_toolkit.writers import (
+    BulkUpdateWriter,
+    ValuesUpdateWriter,
+    supports_json_key_writes,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +52,12 @@ logger = logging.getLogger(__name__)
 class MigrateStreamData(RunPython):
     """Subclass of RunPython for streamfield data migration operations"""
 
+    # The number of chunks which are read and sent to the plan executor before the results of a
+    # chunk are written, so that worker processes can apply the operations to them in the meantime.
+    # Only used with `workers`, since the serial executor applies the operations to each chunk as
+    # soon as it is submitted.
+    read_ahead_chunks = 1
+
     def __init__(
         self,
         app_name,
@@ -23,6 +66,18 @@ class MigrateStreamData(RunPython):
         operations_and_block_paths,
         revisions_from=None,
         chunk_size=1024,
+        row_source=None,
+        resumable=False,
+        workers=None,
+        writer=None,
+        raw=False,
+        json_backend=None,
+        revision_fields=(),
+        interleave_revisions=False,
+        revisions_keep_recent=None,
+        defer_revisions=False,
+        coalesce=False,
+        revision_cache_bytes=None,
         **kwargs
     ):
         """MigrateStreamData constructor
@@ -37,8 +92,59 @@ class MigrateStreamData(RunPython):
                 onwards will be updated. Passing `None` updates all revisions. Defaults to `None`.
                 Note that live and latest revisions will be updated regardless of what value this
                 takes.
-            chunk_size (:obj:`int`, optional): chunk size for queryset.iterator and bulk_update.
+            chunk_size (:obj:`int`, optional): chunk size for fetching and writing rows.
                 Defaults to 1024.
+            row_source (:obj:`object`, optional): Fetches instances and revisions from the database
+                in chunks, e.g. `row_sources.KeysetRowSource()` to fetch each chunk with a separate
+                query in primary key order. Defaults to `row_sources.QuerysetIteratorRowSource()`.
+            resumable (:obj:`bool`, optional): Commit each chunk separately and keep a checkpoint
+                of the last instance and revision processed, so that running the migration again
+                after a failure continues from where it stopped. The migration must have
+                `atomic = False` and depend on the `wagtail_streamfield_migration_toolkit`
+                migrations. Defaults to `False`.
+            workers (:obj:`int`, optional): Number of worker processes to apply the operations to
+                the stream data of each chunk in. Operations must be picklable. Passing `None`
+                applies the operations in the migration process. Defaults to `None`.
+            writer (:obj:`object`, optional): Writes back changed instances and revisions to the
+                database, e.g. `writers.ValuesUpdateWriter()` to avoid the `CASE` expressions of
+                `bulk_update`. Defaults to `writers.BulkUpdateWriter()`, or to
+                `writers.ValuesUpdateWriter()` if `raw` is `True`.
+            raw (:obj:`bool`, optional): Fetch only the primary key and the stream data of each
+                instance, and write back the stream data without creating model instances.
+                Defaults to `False`.
+            json_backend (:obj:`str`, optional): Name of the JSON library to decode and encode
+                revision content with, one of `"orjson"`, `"ujson"` or `"json"`. Passing `None`
+                uses the `json` module of the standard library. Defaults to `None`.
+            revision_fields (:obj:`list` of :obj:`str`, optional): Names of revision fields to
+                load besides those needed for the migration. Only the id, the object id, the
+                creation date and the stream data of the field in the content of revisions are
+                loaded on databases where the stream data can be written on its own (PostgreSQL,
+                SQLite and MySQL). Defaults to `()`.
+            interleave_revisions (:obj:`bool`, optional): Migrate the revisions of each chunk of
+                instances right after the chunk, instead of migrating all revisions after all
+                instances. Instances are then not filtered by the types of blocks they contain, as
+                their revisions may still need to be migrated. Defaults to `False`.
+            revisions_keep_recent (:obj:`int`, optional): Only migrate this number of most recent
+                revisions of each instance, along with the live and latest revisions and the
+                revisions created from `revisions_from` onwards if it is given. Passing `None`
+                doesn't limit the number of revisions. Defaults to `None`.
+            defer_revisions (:obj:`bool`, optional): Record the revisions which are not migrated
+                because of `revisions_from` or `revisions_keep_recent` as unmigrated, so that they
+                can be migrated later. The migration must depend on the
+                `wagtail_streamfield_migration_toolkit` migrations. Defaults to `False`.
+            coalesce (:obj:`bool`, optional): When the next stream data operation on the model
+                to be applied also has `coalesce=True` and the same options, leave this
+                operation pending and run both in a single pass, as long as no operation in
+                between changes the table of the model. The next operation must be in the same
+                migration, unless the migration is atomic and depends on the
+                `wagtail_streamfield_migration_toolkit` migrations. Can't be used with
+                `resumable` or `defer_revisions`. Defaults to `False`.
+            revision_cache_bytes (:obj:`int`, optional): Keep the results of the operations for
+                the stream data of revisions in a cache of up to this many bytes, by a hash of
+                the stream data, so that revisions with the same stream data as an earlier
+                revision aren't decoded and transformed again. With `workers`, each worker keeps
+                its own cache of up to this size. Passing `None` doesn't cache any results.
+                Defaults to `None`.
             **kwargs: atomic, elidable, hints for superclass RunPython can be given
 
         Example:
@@ -60,6 +166,27 @@ class MigrateStreamData(RunPython):
         self.operations_and_block_paths = operations_and_block_paths
         self.revisions_from = revisions_from
         self.chunk_size = chunk_size
+        self.row_source = row_source
+        self.resumable = resumable
+        self.workers = workers
+        self.writer = writer
+        self.raw = raw
+        self.json_backend = json_backend
+        self.revision_fields = revision_fields
+        self.interleave_revisions = interleave_revisions
+        self.revisions_keep_recent = revisions_keep_recent
+        self.defer_revisions = defer_revisions
+        self.coalesce = coalesce
+        self.revision_cache_bytes = revision_cache_bytes
+
+        if defer_revisions and revisions_from is None and revisions_keep_recent is None:
+            raise ValueError(
+                "defer_revisions=True needs revisions_from or revisions_keep_recent to be given"
+            )
+        if coalesce and (resumable or defer_revisions):
+            raise ValueError(
+                "coalesce=True can't be used with resumable or defer_revisions"
+            )
 
         # TODO add reverse code when needed, will probably need another input (reversible?)
         # super class kwargs - atomic,elidable,hints
@@ -77,6 +204,30 @@ class MigrateStreamData(RunPython):
         kwargs["operations_and_block_paths"] = self.operations_and_block_paths
         kwargs["revisions_from"] = self.revisions_from
         kwargs["chunk_size"] = self.chunk_size
+        if self.row_source is not None:
+            kwargs["row_source"] = self.row_source
+        if self.resumable:
+            kwargs["resumable"] = self.resumable
+        if self.workers is not None:
+            kwargs["workers"] = self.workers
+        if self.writer is not None:
+            kwargs["writer"] = self.writer
+        if self.raw:
+            kwargs["raw"] = self.raw
+        if self.json_backend is not None:
+            kwargs["json_backend"] = self.json_backend
+        if self.revision_fields:
+            kwargs["revision_fields"] = self.revision_fields
+        if self.interleave_revisions:
+            kwargs["interleave_revisions"] = self.interleave_revisions
+        if self.revisions_keep_recent is not None:
+            kwargs["revisions_keep_recent"] = self.revisions_keep_recent
+        if self.defer_revisions:
+            kwargs["defer_revisions"] = self.defer_revisions
+        if self.coalesce:
+            kwargs["coalesce"] = self.coalesce
+        if self.revision_cache_bytes is not None:
+            kwargs["revision_cache_bytes"] = self.revision_cache_bytes
 
         return (self.__class__.__qualname__, args, kwargs)
 
@@ -85,125 +236,1469 @@ class MigrateStreamData(RunPython):
         # We are using an OrderedDict here to essentially get the functionality of an ordered set
         # so that names generated will be consistent.
         fragments = OrderedDict(
-            (op.operation_name_fragment, None) for op, _ in self.operations_and_block_paths
+            (op.operation_name_fragment, None)
+            for _, operations_and_block_paths in self.get_fields_operations_and_block_paths()
+            for op, _ in operations_and_block_paths
         )
         return "_".join(fragments.keys())
 
-    def migrate_stream_data_forward(self, apps, schema_editor):
-        model = apps.get_model(self.app_name, self.model_name)
+    def get_fields_operations_and_block_paths(self):
+        """Returns a list with the name of each streamfield migrated by this operation, along with
+        its operations and block paths."""
+        return [(self.field_name, self.operations_and_block_paths)]
+
+    def get_field_names(self):
+        return [
+            field_name for field_name, _ in self.get_fields_operations_and_block_paths()
+        ]
+
+    def get_top_level_block_types(self, operations_and_block_paths=None):
+        """Returns the types of top level blocks which the operations can change, or `None` if any
+        top level block may be changed. Defaults to the operations of all streamfields.
+
+        Operations on the top level stream block itself can change the blocks of the types given by
+        `get_changed_child_types`."""
+
+        if operations_and_block_paths is None:
+            operations_and_block_paths = [
+                operation_and_block_path
+                for _, field_operations_and_block_paths in (
+                    self.get_fields_operations_and_block_paths()
+                )
+                for operation_and_block_path in field_operations_and_block_paths
+            ]
+
+        block_types = set()
+        for operation, block_path_str in operations_and_block_paths:
+            block_path = utils.parse_block_path(block_path_str)
+            if len(block_path) == 0:
+                # The operation is applied on the top level stream block itself.
+                changed_child_types = operation.get_changed_child_types()
+                if changed_child_types is None:
+                    return None
+                block_types.update(changed_child_types)
+            else:
+                block_types.add(block_path[0])
+        return block_types
+
+    def filter_by_block_types(self, queryset, get_expression, vendor):
+        """Filters a queryset to the rows in which any of the streamfields may contain blocks that
+        the operations apply to, see `filter_by_block_types_of_fields`.
+
+        Args:
+            queryset: The queryset to filter.
+            get_expression (callable): Returns the expression for the stream data of a field,
+                given the name of the field.
+            vendor (str): The vendor of the database connection.
+        """
+
+        return filter_by_block_types_of_fields(
+            queryset, self.get_expressions_and_block_types(get_expression), vendor
+        )
+
+    def get_expressions_and_block_types(self, get_expression):
+        """Returns the expression for the stream data of each streamfield, given by
+        `get_expression`, along with the types of top level blocks which the operations on the
+        field can change."""
+
+        return [
+            (
+                get_expression(field_name),
+                self.get_top_level_block_types(operations_and_block_paths),
+            )
+            for field_name, operations_and_block_paths in (
+                self.get_fields_operations_and_block_paths()
+            )
+        ]
+
+    @property
+    def checkpoint_key(self):
+        """Identifies the checkpoint of this operation. Operations on the same fields with the
+        same operations (including all of their arguments) and block paths share a checkpoint,
+        see `get_deferred_migration_key` for deferred migrations."""
+
+        fields_operations_and_block_paths = self.get_fields_operations_and_block_paths()
+        operations_str = "|".join(
+            ";".join(
+                "{}@{}".format(serialize_block_operation(operation), block_path_str)
+                for operation, block_path_str in operations_and_block_paths
+            )
+            for _, operations_and_block_paths in fields_operations_and_block_paths
+        )
+        return "{}.{}.{}:{}".format(
+            self.app_name,
+            self.model_name,
+            ",".join(self.get_field_names()),
+            hashlib.sha1(operations_str.encode()).hexdigest(),
+        )
+
+    def make_deferred_migration_key(self, app_label, migration_name):
+        """Returns the key of the deferred migration of this operation in the given migration.
+        The migration is part of the key, so that identical operations in different migrations
+        (e.g. removing a block again after it was added back) have separate deferred
+        migrations."""
+
+        prefix, operations_hash = self.checkpoint_key.rsplit(":", 1)
+        return "{}:{}".format(
+            prefix,
+            hashlib.sha1(
+                "{}.{}:{}".format(app_label, migration_name, operations_hash).encode()
+            ).hexdigest(),
+        )
+
+    def get_deferred_migration_key(self, connection):
+        """Returns the key of the deferred migration of this operation, as it is being applied.
+        Operations which aren't in a migration file are identified by their checkpoint key."""
+
+        found = pending_migrations.find(self, connection)
+        if found is None:
+            return self.checkpoint_key
+        migration, _ = found
+        return self.make_deferred_migration_key(migration.app_label, migration.name)
+
+    def get_toolkit_model(self, apps, model_name, option_name):
+        try:
+            return apps.get_model("wagtail_streamfield_migration_toolkit", model_name)
+        except LookupError:
+            raise LookupError(
+                "Migrations using MigrateStreamData with {}=True must depend on the "
+                "wagtail_streamfield_migration_toolkit migrations".format(option_name)
+            )
+
+    def get_checkpoint(self, apps, schema_editor):
+        Checkpoint = self.get_toolkit_model(
+            apps, "StreamDataMigrationCheckpoint", "resumable"
+        )
+
+        if schema_editor.connection.in_atomic_block:
+            logger.warning(
+                "MigrateStreamData with resumable=True is running inside a transaction, so chunks "
+                "will not be committed separately. Set `atomic = False` on the migration."
+            )
+
+        checkpoint, _ = Checkpoint.objects.get_or_create(key=self.checkpoint_key)
+        return checkpoint
+
+    def chunk_transaction(self, schema_editor):
+        if not self.resumable:
+            return contextlib.nullcontext()
+        return transaction.atomic(using=schema_editor.connection.alias)
+
+    def get_plan_executor(self, plan):
+        if self.workers is None:
+            return SerialPlanExecutor(plan)
+        return ProcessPoolPlanExecutor(plan, workers=self.workers)
+
+    def make_plan(self, model):
+        """Resolves the block paths of all operations once, instead of doing it again for every
+        instance and revision."""
+
+        plan = utils.StreamFieldsMigrationPlan(
+            [
+                utils.StreamDataMigrationPlan(
+                    stream_block=getattr(model, field_name).field.stream_block,
+                    operations_and_block_paths=operations_and_block_paths,
+                )
+                for field_name, operations_and_block_paths in (
+                    self.get_fields_operations_and_block_paths()
+                )
+            ]
+        )
+        # So that unmigrated revisions can be migrated when they are read in this process. Any
+        # operation may leave revisions unmigrated, see `get_pending_revision_ids`.
+        deferred_migration_registry.register(self, plan)
+        return plan
+
+    def get_cached_plan(self, plan):
+        """Returns the plan with the plan of each field keeping its results for the stream data of
+        revisions in a cache of `revision_cache_bytes`, shared by all of the fields."""
+
+        if self.revision_cache_bytes is None:
+            return plan
+        cache = utils.ResultCache(self.revision_cache_bytes)
+        return utils.StreamFieldsMigrationPlan(
+            [
+                utils.CachedMigrationPlan(field_plan, cache, key_prefix=bytes([i]))
+                for i, field_plan in enumerate(plan.plans)
+            ]
+        )
 
+    def log_cache_stats(self, plan):
+        if not isinstance(plan.plans[0], utils.CachedMigrationPlan):
+            return
+        # With worker processes, the statistics of the caches of the workers are added to the
+        # cache of the plan, see `ProcessPoolPlanExecutor`
+        cache = plan.plans[0].cache
+        if cache.hits or cache.misses:
+            logger.info(
+                "Revision cache of %s.%s: %d hits, %d misses, %d bytes",
+                self.app_name,
+                self.model_name,
+                cache.hits,
+                cache.misses,
+                cache.size,
+            )
+
+    def get_revision_query_maker(self, apps, schema_editor, model):
         # Here we can't directly check the wagtail version, rather we need to check the wagtail
         # version at the project state when the migration is being applied
         try:
             apps.get_model("wagtailcore", "Revision")
-            revision_query_maker = DefaultRevisionQueryMaker(
-                apps, model, self.revisions_from
+            revision_query_maker_class = DefaultRevisionQueryMaker
+        except LookupError:
+            revision_query_maker_class = Wagtail3RevisionQueryMaker
+        return revision_query_maker_class(
+            apps,
+            model,
+            self.revisions_from,
+            connection=schema_editor.connection,
+            revisions_keep_recent=self.revisions_keep_recent,
+            pending_revision_ids=self.get_pending_revision_ids(
+                apps, schema_editor.connection
+            ),
+        )
+
+    def get_pending_revision_ids(self, apps, connection):
+        """Returns a subquery for the ids of the revisions which haven't been migrated by an
+        earlier deferred migration of any of the fields of this operation yet, or `None` if there
+        are none.
+
+        These revisions must not be migrated by this operation before the earlier deferred
+        migration, so they are left unmigrated and recorded as unmigrated revisions of this
+        operation as well.
+        """
+
+        try:
+            DeferredStreamDataMigration = apps.get_model(
+                "wagtail_streamfield_migration_toolkit", "DeferredStreamDataMigration"
+            )
+            UnmigratedRevision = apps.get_model(
+                "wagtail_streamfield_migration_toolkit", "UnmigratedRevision"
             )
         except LookupError:
-            revision_query_maker = Wagtail3RevisionQueryMaker(
-                apps, model, self.revisions_from
+            # No revisions can have been deferred before the toolkit models were created
+            return None
+
+        field_names = set(self.get_field_names())
+        deferred_migrations = [
+            deferred_migration
+            for deferred_migration in DeferredStreamDataMigration.objects.using(
+                connection.alias
+            ).filter(app_name=self.app_name, model_name__iexact=self.model_name)
+            if field_names & set(deferred_migration.field_name.split(","))
+        ]
+        if not deferred_migrations:
+            return None
+        # The revisions recorded by a previous run of this operation are recorded again
+        deferred_migration_key = self.get_deferred_migration_key(connection)
+        deferred_migration_ids = [
+            deferred_migration.pk
+            for deferred_migration in deferred_migrations
+            if deferred_migration.key != deferred_migration_key
+        ]
+        if not deferred_migration_ids:
+            return None
+        pending_revisions = UnmigratedRevision.objects.using(connection.alias).filter(
+            deferred_migration_id__in=deferred_migration_ids
+        )
+        if not pending_revisions.exists():
+            return None
+        return pending_revisions.values("revision_id")
+
+    def has_unmigrated_revisions_to_record(self, revision_query_maker):
+        """Whether this operation leaves any revisions unmigrated, see `defer_skipped_revisions`"""
+
+        return (
+            self.defer_revisions or revision_query_maker.pending_revision_ids is not None
+        )
+
+    def migrate_stream_data_forward(self, apps, schema_editor):
+        if self.coalesce:
+            stream_data_queue.add(self, apps, schema_editor)
+        else:
+            self.migrate_stream_data(apps, schema_editor)
+
+    def migrate_stream_data(self, apps, schema_editor, plan=None):
+        """Migrates the instances and revisions of the model, with the given plan or the plan of
+        this operation."""
+
+        model = apps.get_model(self.app_name, self.model_name)
+        if plan is None:
+            plan = self.make_plan(model)
+        plan = self.get_cached_plan(plan)
+        with self.get_plan_executor(plan) as plan_executor:
+            self.migrate_stream_data_with_executor(
+                apps, schema_editor, model, plan_executor
             )
+        self.log_cache_stats(plan)
+
+    def migrate_stream_data_with_executor(
+        self, apps, schema_editor, model, plan_executor, migrate_revisions=True
+    ):
+        """Migrates the instances of the model, and their revisions unless `migrate_revisions` is
+        `False` (in which case they are left to a `MigrateStreamDataBatch` operation)."""
+
+        revision_query_maker = self.get_revision_query_maker(apps, schema_editor, model)
 
+        # The raw stream data of each field, as `raw_content_<field name>`
+        raw_content_names = [
+            "raw_content_" + field_name for field_name in self.get_field_names()
+        ]
         model_queryset = model.objects.annotate(
-            raw_content=Cast(F(self.field_name), JSONField())
+            **{
+                raw_content_name: Cast(F(field_name), JSONField())
+                for raw_content_name, field_name in zip(
+                    raw_content_names, self.get_field_names()
+                )
+            }
         ).all()
 
-        updated_model_instances_buffer = []
-        for instance in model_queryset.iterator(chunk_size=self.chunk_size):
+        checkpoint = None
+        if self.resumable:
+            checkpoint = self.get_checkpoint(apps, schema_editor)
+            # The checkpoint keeps the last primary key processed, so rows must be processed in
+            # primary key order.
+            model_queryset = model_queryset.order_by("pk")
 
-            revision_query_maker.append_instance_data_for_revision_query(instance)
+        interleave_revisions = (
+            self.interleave_revisions and revision_query_maker.has_revisions
+        )
+        if not interleave_revisions:
+            # Only fetch the instances which may contain blocks that the operations apply to.
+            # When interleaving revisions all instances are needed, as the revisions of an
+            # instance may contain such blocks even if the instance doesn't.
+            filtered_model_queryset = self.filter_by_block_types(
+                model_queryset, F, schema_editor.connection.vendor
+            )
+            if filtered_model_queryset is not None:
+                model_queryset = filtered_model_queryset
 
-            raw_data = instance.raw_content
-            for operation, block_path_str in self.operations_and_block_paths:
-                try:
-                    raw_data = utils.apply_changes_to_raw_data(
-                        raw_data=raw_data,
-                        block_path_str=block_path_str,
-                        operation=operation,
-                        streamfield=getattr(model, self.field_name),
-                    )
-                    # - TODO add a return value to util to know if changes were made
-                    # - TODO save changed only
-                except utils.InvalidBlockDefError as e:
-                    raise utils.InvalidBlockDefError(instance=instance) from e
-
-            stream_block = getattr(instance, self.field_name).stream_block
-            setattr(
-                instance,
-                self.field_name,
-                StreamValue(stream_block, raw_data, is_lazy=True),
-            )
-            updated_model_instances_buffer.append(instance)
-
-            if len(updated_model_instances_buffer) == self.chunk_size:
-                model.objects.bulk_update(
-                    updated_model_instances_buffer, [self.field_name]
+        if self.raw:
+            # Rows are named tuples with only the `pk` and raw stream data attributes, along with
+            # the live and latest revision ids when interleaving revisions
+            model_queryset = model_queryset.values_list(
+                "pk",
+                *raw_content_names,
+                *(
+                    revision_query_maker.get_instance_revision_attnames()
+                    if interleave_revisions
+                    else []
+                ),
+                named=True
+            )
+
+        row_source = self.row_source or QuerysetIteratorRowSource()
+        writer = self.writer or (ValuesUpdateWriter() if self.raw else BulkUpdateWriter())
+        using = schema_editor.connection.alias
+
+        revision_content_codec = None
+        if revision_query_maker.has_revisions:
+            revision_field_names = None
+            if supports_json_key_writes(schema_editor.connection):
+                # Only the stream data of the field is written back, so the rest of the revision
+                # content is not needed.
+                revision_field_names = (
+                    revision_query_maker.get_revision_field_names()
+                    + list(self.revision_fields)
                 )
-                updated_model_instances_buffer = []
+            revision_content_codec = RevisionContentCodec(
+                self.get_field_names(),
+                get_json_backend(self.json_backend),
+                revision_field_names,
+            )
+
+        if checkpoint is None or not checkpoint.instances_done:
+            for instances, results in self.iter_chunk_results(
+                plan_executor,
+                row_source.iter_chunks(
+                    model_queryset,
+                    self.chunk_size,
+                    start_after=checkpoint and checkpoint.instances_last_pk,
+                ),
+                lambda instance: tuple(
+                    getattr(instance, raw_content_name)
+                    for raw_content_name in raw_content_names
+                ),
+            ):
+                with self.chunk_transaction(schema_editor):
+                    self.migrate_instances(model, instances, results, writer, using)
+                    if interleave_revisions:
+                        self.migrate_revisions_of_instances(
+                            schema_editor,
+                            plan_executor,
+                            row_source,
+                            revision_query_maker,
+                            revision_content_codec,
+                            instances,
+                            writer,
+                        )
+                    if checkpoint is not None:
+                        checkpoint.instances_last_pk = str(instances[-1].pk)
+                        checkpoint.save()
 
-        if len(updated_model_instances_buffer) > 0:
-            # For any remaining chunks
-            model.objects.bulk_update(updated_model_instances_buffer, [self.field_name])
+            if checkpoint is not None:
+                checkpoint.instances_done = True
+                checkpoint.save()
 
         # For models without revisions
-        if not revision_query_maker.has_revisions:
+        if not revision_query_maker.has_revisions or not migrate_revisions:
+            if checkpoint is not None:
+                checkpoint.delete()
             return
 
-        revision_queryset = revision_query_maker.get_revision_queryset()
+        if self.has_unmigrated_revisions_to_record(revision_query_maker):
+            DeferredStreamDataMigration = self.get_toolkit_model(
+                apps, "DeferredStreamDataMigration", "defer_revisions"
+            )
+            UnmigratedRevision = self.get_toolkit_model(
+                apps, "UnmigratedRevision", "defer_revisions"
+            )
+
+        # If the revisions have been migrated along with the instances
+        if interleave_revisions:
+            if self.has_unmigrated_revisions_to_record(revision_query_maker):
+                self.defer_skipped_revisions(
+                    schema_editor,
+                    revision_query_maker,
+                    DeferredStreamDataMigration,
+                    UnmigratedRevision,
+                )
+            if checkpoint is not None:
+                checkpoint.delete()
+            return
+
+        revision_queryset = self.prepare_revision_queryset(
+            schema_editor,
+            revision_content_codec,
+            revision_query_maker.get_revision_queryset(),
+        )
+        if checkpoint is not None:
+            revision_queryset = revision_queryset.order_by("pk")
+
+        for revisions, results in self.iter_chunk_results(
+            plan_executor,
+            row_source.iter_chunks(
+                revision_queryset,
+                self.chunk_size,
+                start_after=checkpoint and checkpoint.revisions_last_pk,
+            ),
+            revision_content_codec.get_stream_data,
+            json_backend=revision_content_codec.json_backend,
+        ):
+            with self.chunk_transaction(schema_editor):
+                self.migrate_revisions(
+                    revision_query_maker,
+                    revision_content_codec,
+                    revisions,
+                    results,
+                    writer,
+                    using,
+                )
+                if checkpoint is not None:
+                    checkpoint.revisions_last_pk = str(revisions[-1].pk)
+                    checkpoint.save()
+
+        if self.has_unmigrated_revisions_to_record(revision_query_maker):
+            self.defer_skipped_revisions(
+                schema_editor,
+                revision_query_maker,
+                DeferredStreamDataMigration,
+                UnmigratedRevision,
+            )
+        if checkpoint is not None:
+            checkpoint.delete()
+
+    def defer_skipped_revisions(
+        self,
+        schema_editor,
+        revision_query_maker,
+        DeferredStreamDataMigration,
+        UnmigratedRevision,
+    ):
+        """Records the revisions which are not migrated because of the revision retention policy
+        (with `defer_revisions=True`), or because an earlier deferred migration hasn't migrated
+        them yet, as unmigrated revisions of a deferred migration, so that they can be migrated
+        later.
+
+        The revisions are recorded with an `INSERT ... SELECT` query, without fetching them.
+        Revisions skipped by the retention policy which can't contain the blocks that the
+        operations apply to are not recorded. Revisions of an earlier deferred migration are
+        always recorded, as the earlier migration may add such blocks.
+        """
+
+        connection = schema_editor.connection
+        deferred_migration_key = self.get_deferred_migration_key(connection)
+        # So that the revisions can be migrated when they are read in this process
+        deferred_migration_registry.add_key(deferred_migration_key, self)
+        with transaction.atomic(using=connection.alias):
+            deferred_migration, created = DeferredStreamDataMigration.objects.get_or_create(
+                key=deferred_migration_key,
+                defaults={
+                    "app_name": self.app_name,
+                    "model_name": self.model_name,
+                    "field_name": ",".join(self.get_field_names()),
+                },
+            )
+            if not created:
+                # Revisions recorded by a previous run of the operation
+                UnmigratedRevision.objects.filter(
+                    deferred_migration=deferred_migration
+                ).delete()
+
+            skipped_revision_querysets = []
+            if self.defer_revisions:
+                skipped_revision_queryset = (
+                    revision_query_maker.get_skipped_revision_queryset()
+                )
+                filtered_revision_queryset = self.filter_by_block_types(
+                    skipped_revision_queryset,
+                    lambda field_name: KeyTextTransform(field_name, "content"),
+                    connection.vendor,
+                )
+                if filtered_revision_queryset is not None:
+                    skipped_revision_queryset = filtered_revision_queryset
+                skipped_revision_querysets.append(skipped_revision_queryset)
+            if revision_query_maker.pending_revision_ids is not None:
+                skipped_revision_querysets.append(
+                    revision_query_maker.get_pending_revision_queryset()
+                )
+
+            for skipped_revision_queryset in skipped_revision_querysets:
+                self.insert_unmigrated_revisions(
+                    connection,
+                    UnmigratedRevision,
+                    deferred_migration,
+                    skipped_revision_queryset,
+                )
+
+    def insert_unmigrated_revisions(
+        self, connection, UnmigratedRevision, deferred_migration, revision_queryset
+    ):
+        sql, params = (
+            revision_queryset.values("id")
+            .query.get_compiler(connection=connection)
+            .as_sql()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO {table} ({deferred_migration_id}, {revision_id}) "
+                "SELECT %s, {id} FROM ({sql}) skipped_revisions".format(
+                    table=connection.ops.quote_name(UnmigratedRevision._meta.db_table),
+                    deferred_migration_id=connection.ops.quote_name(
+                        UnmigratedRevision._meta.get_field(
+                            "deferred_migration"
+                        ).column
+                    ),
+                    revision_id=connection.ops.quote_name(
+                        UnmigratedRevision._meta.get_field("revision_id").column
+                    ),
+                    id=connection.ops.quote_name("id"),
+                    sql=sql,
+                ),
+                (deferred_migration.pk,) + tuple(params),
+            )
+
+    def prepare_revision_queryset(
+        self, schema_editor, revision_content_codec, revision_queryset
+    ):
+        """Filters a revision queryset to the revisions which may contain blocks that the
+        operations apply to, and prepares it for loading their stream data."""
+
+        filtered_revision_queryset = self.filter_by_block_types(
+            revision_queryset,
+            # The stream data is stored as a JSON string inside the revision content
+            lambda field_name: KeyTextTransform(field_name, "content"),
+            schema_editor.connection.vendor,
+        )
+        if filtered_revision_queryset is not None:
+            revision_queryset = filtered_revision_queryset
+        return revision_content_codec.prepare_queryset(revision_queryset)
+
+    def migrate_revisions_of_instances(
+        self,
+        schema_editor,
+        plan_executor,
+        row_source,
+        revision_query_maker,
+        revision_content_codec,
+        instances,
+        writer,
+    ):
+        """Migrates the revisions of a chunk of instances. The live and latest revisions of the
+        instances are found from the chunk, so they don't need to be looked up for each revision
+        with invalid stream data."""
+
+        live_or_latest_revision_ids = (
+            revision_query_maker.get_live_or_latest_revision_ids(instances)
+        )
+        revision_queryset = self.prepare_revision_queryset(
+            schema_editor,
+            revision_content_codec,
+            revision_query_maker.get_revision_queryset_for_instances(
+                instances, live_or_latest_revision_ids
+            ),
+        )
+        for revisions, results in self.iter_chunk_results(
+            plan_executor,
+            row_source.iter_chunks(revision_queryset, self.chunk_size),
+            revision_content_codec.get_stream_data,
+            json_backend=revision_content_codec.json_backend,
+        ):
+            self.migrate_revisions(
+                revision_query_maker,
+                revision_content_codec,
+                revisions,
+                results,
+                writer,
+                schema_editor.connection.alias,
+                live_or_latest_revision_ids=live_or_latest_revision_ids,
+            )
+
+    def iter_chunk_results(
+        self, plan_executor, chunks, get_raw_data, json_backend=None
+    ):
+        """See `iter_chunk_results`"""
+
+        return iter_chunk_results(
+            plan_executor,
+            chunks,
+            get_raw_data,
+            json_backend=json_backend,
+            read_ahead_chunks=self.read_ahead_chunks if self.workers is not None else 0,
+        )
+
+    def migrate_instances(self, model, instances, results, writer, using):
+        """Writes back the instances of a chunk which were changed, given the results of applying
+        the plan to their stream data. In raw mode, the instances are named tuples of their primary
+        key and stream data.
+
+        Each field is written separately, for the instances in which it was changed.
+        """
+
+        field_names = self.get_field_names()
+        stream_blocks = [
+            model._meta.get_field(field_name).stream_block for field_name in field_names
+        ]
+        updated_model_instances_by_field = [[] for field_name in field_names]
+        for instance, (raw_data_tuple, error) in zip(instances, results):
+            if error is not None:
+                if self.raw:
+                    # Get the model instance to report the error for
+                    instance = model.objects.get(pk=instance.pk)
+                raise utils.InvalidBlockDefError(instance=instance) from error
+
+            # Only write back the instances which were changed
+            if raw_data_tuple is None:
+                continue
+
+            for field_name, stream_block, raw_data, updated_model_instances in zip(
+                field_names,
+                stream_blocks,
+                raw_data_tuple,
+                updated_model_instances_by_field,
+            ):
+                if raw_data is None:
+                    continue
 
-        updated_revisions_buffer = []
-        for revision in revision_queryset.iterator(chunk_size=self.chunk_size):
+                value = StreamValue(stream_block, raw_data, is_lazy=True)
+                if self.raw:
+                    updated_model_instances.append((instance.pk, value))
+                else:
+                    setattr(instance, field_name, value)
+                    updated_model_instances.append(instance)
 
-            raw_data = json.loads(revision.content[self.field_name])
-            for operation, block_path_str in self.operations_and_block_paths:
-                try:
-                    raw_data = utils.apply_changes_to_raw_data(
-                        raw_data=raw_data,
-                        block_path_str=block_path_str,
-                        operation=operation,
-                        streamfield=getattr(model, self.field_name),
+        for field_name, updated_model_instances in zip(
+            field_names, updated_model_instances_by_field
+        ):
+            if not updated_model_instances:
+                continue
+            if self.raw:
+                writer.write_values(model, field_name, updated_model_instances, using)
+            else:
+                writer.write(model, updated_model_instances, field_name, using)
+
+    def migrate_revisions(
+        self,
+        revision_query_maker,
+        revision_content_codec,
+        revisions,
+        results,
+        writer,
+        using,
+        live_or_latest_revision_ids=None,
+    ):
+        """Writes back the revisions of a chunk which were changed, given the results of applying
+        the plan to their stream data. If the ids of the live and latest revisions of the
+        instances are given, they are used instead of looking them up."""
+
+        field_names = self.get_field_names()
+        updated_revisions_by_field = [[] for field_name in field_names]
+        for revision, (raw_data_tuple, error) in zip(revisions, results):
+            if error is not None:
+                instance = revision_query_maker.get_instance_for_revision(revision)
+                if live_or_latest_revision_ids is not None:
+                    is_live_or_latest_revision = revision.id in live_or_latest_revision_ids
+                else:
+                    is_live_or_latest_revision = (
+                        revision_query_maker.get_is_live_or_latest_revision(revision)
                     )
-                except utils.InvalidBlockDefError as e:
-                    if not revision_query_maker.get_is_live_or_latest_revision(
-                        revision
-                    ):
-                        logger.exception(
-                            utils.InvalidBlockDefError(
-                                revision=revision, instance=instance
-                            )
+                if not is_live_or_latest_revision:
+                    logger.error(
+                        utils.InvalidBlockDefError(revision=revision, instance=instance),
+                        exc_info=error,
+                    )
+                    continue
+                else:
+                    raise utils.InvalidBlockDefError(
+                        revision=revision, instance=instance
+                    ) from error
+
+            if raw_data_tuple is None:
+                continue
+
+            revision_content_codec.set_stream_data(revision, raw_data_tuple)
+            for raw_data, updated_revisions in zip(
+                raw_data_tuple, updated_revisions_by_field
+            ):
+                if raw_data is not None:
+                    updated_revisions.append(revision)
+
+        for field_name, updated_revisions in zip(
+            field_names, updated_revisions_by_field
+        ):
+            if updated_revisions:
+                revision_query_maker.bulk_update(
+                    updated_revisions, field_name, writer, using
+                )
+
+
+class MigrateStreamFields(MigrateStreamData):
+    """Subclass of MigrateStreamData which migrates several streamfields of a model at once.
+
+    Each instance and revision is fetched, migrated and written back once for all of the fields,
+    instead of once for each field with a separate `MigrateStreamData` operation.
+    """
+
+    def __init__(
+        self,
+        app_name,
+        model_name,
+        fields_operations_and_block_paths,
+        revisions_from=None,
+        chunk_size=1024,
+        row_source=None,
+        resumable=False,
+        workers=None,
+        writer=None,
+        raw=False,
+        json_backend=None,
+        revision_fields=(),
+        interleave_revisions=False,
+        revisions_keep_recent=None,
+        defer_revisions=False,
+        coalesce=False,
+        revision_cache_bytes=None,
+        **kwargs
+    ):
+        """MigrateStreamFields constructor
+
+        The options are listed explicitly rather than passed through `**kwargs`, as only the
+        arguments in the signature are written to migration files.
+
+        Args:
+            app_name (str): Name of the app.
+            model_name (str): Name of the model.
+            fields_operations_and_block_paths (:obj:`dict`): The operations and corresponding
+                block paths to apply to each streamfield, by the name of the field.
+            revisions_from, chunk_size, row_source, resumable, workers, writer, raw,
+                json_backend, revision_fields, interleave_revisions, revisions_keep_recent,
+                defer_revisions, coalesce, revision_cache_bytes: See `MigrateStreamData`.
+            **kwargs: atomic, elidable, hints for superclass RunPython can be given
+
+        Example:
+            Renaming a block named `field1` to `block1` in two fields::
+                MigrateStreamFields(
+                    app_name="blog",
+                    model_name="BlogPage",
+                    fields_operations_and_block_paths={
+                        "content": [
+                            (RenameStreamChildrenOperation(old_name="field1", new_name="block1"), ""),
+                        ],
+                        "sidebar": [
+                            (RenameStreamChildrenOperation(old_name="field1", new_name="block1"), ""),
+                        ],
+                    },
+                    revisions_from=datetime.date(2022, 7, 25)
+                ),
+        """
+
+        self.fields_operations_and_block_paths = fields_operations_and_block_paths
+        super().__init__(
+            app_name=app_name,
+            model_name=model_name,
+            field_name=None,
+            operations_and_block_paths=None,
+            revisions_from=revisions_from,
+            chunk_size=chunk_size,
+            row_source=row_source,
+            resumable=resumable,
+            workers=workers,
+            writer=writer,
+            raw=raw,
+            json_backend=json_backend,
+            revision_fields=revision_fields,
+            interleave_revisions=interleave_revisions,
+            revisions_keep_recent=revisions_keep_recent,
+            defer_revisions=defer_revisions,
+            coalesce=coalesce,
+            revision_cache_bytes=revision_cache_bytes,
+            **kwargs
+        )
+
+    def deconstruct(self):
+        name, args, kwargs = super().deconstruct()
+        del kwargs["field_name"]
+        del kwargs["operations_and_block_paths"]
+        kwargs["fields_operations_and_block_paths"] = (
+            self.fields_operations_and_block_paths
+        )
+        return (name, args, kwargs)
+
+    def get_fields_operations_and_block_paths(self):
+        return list(self.fields_operations_and_block_paths.items())
+
+
+def serialize_block_operation(operation):
+    """Returns a string with the class and all of the arguments of an operation, as it would be
+    written to a migration file."""
+
+    try:
+        return serializer_factory(operation).serialize()[0]
+    except ValueError:
+        # Operations which aren't deconstructible are identified by their attributes
+        attributes = vars(operation)
+        try:
+            attributes_str = serializer_factory(attributes).serialize()[0]
+        except ValueError:
+            attributes_str = repr(sorted(attributes.items()))
+        return "{}.{}({})".format(
+            type(operation).__module__, type(operation).__qualname__, attributes_str
+        )
+
+
+def make_stream_data_migration(
+    app_name, model_name, fields_operations_and_block_paths, **kwargs
+):
+    """Returns a `MigrateStreamData` operation if there are operations for a single streamfield,
+    or a `MigrateStreamFields` operation for several streamfields of the model.
+
+    The operations of each streamfield are reduced with `optimizer.OperationOptimizer`.
+    """
+
+    fields_operations_and_block_paths = {
+        field_name: optimize_operations_and_block_paths(operations_and_block_paths)
+        for field_name, operations_and_block_paths in (
+            fields_operations_and_block_paths.items()
+        )
+    }
+    if len(fields_operations_and_block_paths) == 1:
+        [(field_name, operations_and_block_paths)] = (
+            fields_operations_and_block_paths.items()
+        )
+        return MigrateStreamData(
+            app_name=app_name,
+            model_name=model_name,
+            field_name=field_name,
+            operations_and_block_paths=operations_and_block_paths,
+            **kwargs
+        )
+    return MigrateStreamFields(
+        app_name=app_name,
+        model_name=model_name,
+        fields_operations_and_block_paths=fields_operations_and_block_paths,
+        **kwargs
+    )
+
+
+class MigrateStreamDataBatch(RunPython):
+    """Runs several `MigrateStreamData` operations on different models, migrating the revisions of
+    all of the models in a single pass over the revision table.
+
+    From Wagtail 4, the revisions of all models are stored in the same table, so running each
+    operation on its own scans the revision table once for each model. Here the instances of each
+    model are migrated by its operation, and then the revisions of all of the models are fetched
+    together, with each revision migrated by the operation for its content type.
+
+    The revisions of operations with `resumable`, `interleave_revisions` or `coalesce`, and all
+    revisions on Wagtail 3, are migrated by their operation on its own.
+    """
+
+    # See `MigrateStreamData.read_ahead_chunks`
+    read_ahead_chunks = 1
+
+    def __init__(
+        self,
+        operations,
+        chunk_size=1024,
+        row_source=None,
+        workers=None,
+        writer=None,
+        json_backend=None,
+        **kwargs
+    ):
+        """MigrateStreamDataBatch constructor
+
+        Args:
+            operations (:obj:`list` of :obj:`MigrateStreamData`): The operations to run, each on
+                a different model.
+            chunk_size (:obj:`int`, optional): chunk size for fetching and writing revisions.
+                Defaults to 1024.
+            row_source (:obj:`object`, optional): Fetches revisions from the database in chunks,
+                see `MigrateStreamData`. Defaults to `row_sources.QuerysetIteratorRowSource()`.
+            workers (:obj:`int`, optional): Number of worker processes to apply the operations to
+                the stream data of each chunk of revisions in, see `MigrateStreamData`. Defaults
+                to `None`.
+            writer (:obj:`object`, optional): Writes back changed revisions to the database, see
+                `MigrateStreamData`. Defaults to `writers.BulkUpdateWriter()`.
+            json_backend (:obj:`str`, optional): Name of the JSON library to decode and encode
+                revision content with, see `MigrateStreamData`. Defaults to `None`.
+            **kwargs: atomic, elidable, hints for superclass RunPython can be given
+
+        Example:
+            Renaming a block named `field1` to `block1` in two models::
+                MigrateStreamDataBatch(
+                    operations=[
+                        MigrateStreamData(
+                            app_name="blog",
+                            model_name="BlogPage",
+                            field_name="content",
+                            operations_and_block_paths=[
+                                (RenameStreamChildrenOperation(old_name="field1", new_name="block1"), ""),
+                            ],
+                        ),
+                        MigrateStreamData(
+                            app_name="blog",
+                            model_name="EventPage",
+                            field_name="body",
+                            operations_and_block_paths=[
+                                (RenameStreamChildrenOperation(old_name="field1", new_name="block1"), ""),
+                            ],
+                        ),
+                    ],
+                ),
+        """
+
+        self.operations = operations
+        self.chunk_size = chunk_size
+        self.row_source = row_source
+        self.workers = workers
+        self.writer = writer
+        self.json_backend = json_backend
+
+        models = [
+            (operation.app_name, operation.model_name.lower()) for operation in operations
+        ]
+        if len(set(models)) < len(models):
+            raise ValueError(
+                "MigrateStreamDataBatch can't run several operations on the same model, use "
+                "MigrateStreamFields to migrate several streamfields of a model"
+            )
+
+        super().__init__(
+            code=self.migrate_stream_data_forward,
+            reverse_code=lambda *args: None,
+            **kwargs
+        )
+
+    def deconstruct(self):
+        _, args, kwargs = super().deconstruct()
+        kwargs["operations"] = self.operations
+        kwargs["chunk_size"] = self.chunk_size
+        if self.row_source is not None:
+            kwargs["row_source"] = self.row_source
+        if self.workers is not None:
+            kwargs["workers"] = self.workers
+        if self.writer is not None:
+            kwargs["writer"] = self.writer
+        if self.json_backend is not None:
+            kwargs["json_backend"] = self.json_backend
+
+        return (self.__class__.__qualname__, args, kwargs)
+
+    @property
+    def migration_name_fragment(self):
+        fragments = OrderedDict(
+            (op.operation_name_fragment, None)
+            for operation in self.operations
+            for _, operations_and_block_paths in (
+                operation.get_fields_operations_and_block_paths()
+            )
+            for op, _ in operations_and_block_paths
+        )
+        return "_".join(fragments.keys())
+
+    def get_plan_executor(self, plan):
+        if self.workers is None:
+            return SerialPlanExecutor(plan)
+        return ProcessPoolPlanExecutor(plan, workers=self.workers)
+
+    def migrate_stream_data_forward(self, apps, schema_editor):
+        # The operations of which the revisions are migrated together, along with their revision
+        # query makers and plans
+        batched_operations = []
+        for operation in self.operations:
+            model = apps.get_model(operation.app_name, operation.model_name)
+            revision_query_maker = operation.get_revision_query_maker(
+                apps, schema_editor, model
+            )
+            if (
+                not isinstance(revision_query_maker, DefaultRevisionQueryMaker)
+                or not revision_query_maker.has_revisions
+                or operation.resumable
+                or operation.interleave_revisions
+                or operation.coalesce
+            ):
+                operation.migrate_stream_data_forward(apps, schema_editor)
+                continue
+
+            if operation.defer_revisions:
+                # Fail before any rows are migrated if the toolkit models are missing
+                operation.get_toolkit_model(
+                    apps, "DeferredStreamDataMigration", "defer_revisions"
+                )
+            plan = operation.get_cached_plan(operation.make_plan(model))
+            with operation.get_plan_executor(plan) as plan_executor:
+                operation.migrate_stream_data_with_executor(
+                    apps, schema_editor, model, plan_executor, migrate_revisions=False
+                )
+            batched_operations.append((operation, revision_query_maker, plan))
+
+        if not batched_operations:
+            return
+
+        self.migrate_revisions(schema_editor, batched_operations)
+        for operation, _, plan in batched_operations:
+            operation.log_cache_stats(plan)
+
+        for operation, revision_query_maker, _ in batched_operations:
+            if operation.has_unmigrated_revisions_to_record(revision_query_maker):
+                operation.defer_skipped_revisions(
+                    schema_editor,
+                    revision_query_maker,
+                    operation.get_toolkit_model(
+                        apps, "DeferredStreamDataMigration", "defer_revisions"
+                    ),
+                    operation.get_toolkit_model(
+                        apps, "UnmigratedRevision", "defer_revisions"
+                    ),
+                )
+
+    def migrate_revisions(self, schema_editor, batched_operations):
+        """Migrates the revisions of all of the batched operations in a single pass, with each
+        revision dispatched to the operation for its content type."""
+
+        connection = schema_editor.connection
+        json_backend = get_json_backend(self.json_backend)
+        RevisionModel = batched_operations[0][1].RevisionModel
+
+        revision_field_names = None
+        if supports_json_key_writes(connection):
+            # Only the stream data of the fields is written back, see `MigrateStreamData`
+            revision_field_names = list(
+                OrderedDict.fromkeys(
+                    ["id", "object_id", "created_at", "content_type"]
+                    + [
+                        field_name
+                        for operation, _, _ in batched_operations
+                        for field_name in operation.revision_fields
+                    ]
+                )
+            )
+
+        revision_queryset = RevisionModel.objects.all()
+        revision_query = Q()
+        # The operation, revision query maker and codec for each content type. Each codec loads
+        # the stream data of the fields of its operation from revisions fetched with the codec
+        # for the fields of all of the operations.
+        operations_by_content_type_id = {}
+        plans_by_content_type_id = {}
+        for i, (operation, revision_query_maker, plan) in enumerate(batched_operations):
+            content_type_id = revision_query_maker.content_type_id
+            operations_by_content_type_id[content_type_id] = (
+                operation,
+                revision_query_maker,
+                RevisionContentCodec(
+                    operation.get_field_names(), json_backend, revision_field_names
+                ),
+            )
+            plans_by_content_type_id[content_type_id] = plan
+
+            operation_revision_query = revision_query_maker.get_revision_query()
+            block_types_filter = make_block_types_filter(
+                revision_queryset,
+                operation.get_expressions_and_block_types(
+                    lambda field_name: KeyTextTransform(field_name, "content")
+                ),
+                connection.vendor,
+                alias_prefix="stream_data_{}_".format(i),
+            )
+            if block_types_filter is not None:
+                revision_queryset, block_types_query = block_types_filter
+                operation_revision_query &= block_types_query
+            revision_query |= operation_revision_query
+
+        revision_content_codec = RevisionContentCodec(
+            list(
+                OrderedDict.fromkeys(
+                    field_name
+                    for operation, _, _ in batched_operations
+                    for field_name in operation.get_field_names()
+                )
+            ),
+            json_backend,
+            revision_field_names,
+        )
+        revision_queryset = revision_content_codec.prepare_queryset(
+            revision_queryset.filter(revision_query)
+        )
+
+        def get_raw_data(revision):
+            _, _, codec = operations_by_content_type_id[revision.content_type_id]
+            return revision.content_type_id, codec.get_stream_data(revision)
+
+        row_source = self.row_source or QuerysetIteratorRowSource()
+        writer = self.writer or BulkUpdateWriter()
+        plan = utils.ContentTypesMigrationPlan(plans_by_content_type_id)
+        with self.get_plan_executor(plan) as plan_executor:
+            for revisions, results in iter_chunk_results(
+                plan_executor,
+                row_source.iter_chunks(revision_queryset, self.chunk_size),
+                get_raw_data,
+                json_backend=json_backend,
+                read_ahead_chunks=(
+                    self.read_ahead_chunks if self.workers is not None else 0
+                ),
+            ):
+                revisions_and_results_by_content_type_id = OrderedDict()
+                for revision, result in zip(revisions, results):
+                    revisions_and_results = (
+                        revisions_and_results_by_content_type_id.setdefault(
+                            revision.content_type_id, ([], [])
+                        )
+                    )
+                    revisions_and_results[0].append(revision)
+                    revisions_and_results[1].append(result)
+
+                for content_type_id, (
+                    content_type_revisions,
+                    content_type_results,
+                ) in revisions_and_results_by_content_type_id.items():
+                    operation, revision_query_maker, codec = operations_by_content_type_id[
+                        content_type_id
+                    ]
+                    operation.migrate_revisions(
+                        revision_query_maker,
+                        codec,
+                        content_type_revisions,
+                        content_type_results,
+                        writer,
+                        connection.alias,
+                    )
+
+
+def iter_chunk_results(
+    plan_executor, chunks, get_raw_data, json_backend=None, read_ahead_chunks=1
+):
+    """Sends each chunk of rows to the plan executor, and yields each chunk along with the
+    results of applying the plan to it, in order.
+
+    Up to `read_ahead_chunks` more chunks are read and sent to the plan executor before the
+    results of a chunk are yielded, so that the database is not idle while the plan is applied
+    in worker processes, and the worker processes are not idle while rows are read and written.
+    This only helps with an executor which applies the plan in the background, so callers pass 0
+    for the serial executor, which would only keep another chunk in memory.
+
+    Rows are read and written in the calling thread rather than in separate reader and writer
+    threads, since they have to use the connection of the migration, within its transaction.
+    """
+
+    pending_chunks = deque()
+    for chunk in chunks:
+        future = plan_executor.submit([get_raw_data(row) for row in chunk], json_backend)
+        pending_chunks.append((chunk, future))
+        if len(pending_chunks) > read_ahead_chunks:
+            chunk, future = pending_chunks.popleft()
+            yield chunk, future.result()
+
+    while pending_chunks:
+        chunk, future = pending_chunks.popleft()
+        yield chunk, future.result()
+
+
+def filter_by_block_types(queryset, expression, block_types, vendor):
+    """Filters a queryset to rows with stream data containing a top level block of the given types.
+
+    The filter may also keep rows which do not contain such blocks (for example when a nested block
+    has the same type), but never excludes rows which do.
+
+    Args:
+        queryset: The queryset to filter.
+        expression: An expression for the stream data, stored either as JSON or as JSON text.
+        block_types (:obj:`set` of :obj:`str`): The block types to look for. Passing `None` means
+            that rows containing any block type should be kept.
+        vendor (str): The vendor of the database connection.
+
+    Returns:
+        The filtered queryset, or `None` if the rows can't be filtered.
+    """
+
+    return filter_by_block_types_of_fields(queryset, [(expression, block_types)], vendor)
+
+
+def filter_by_block_types_of_fields(queryset, expressions_and_block_types, vendor):
+    """Filters a queryset to rows where the stream data of any of several fields contains a top
+    level block of the given types for that field, see `filter_by_block_types`.
+
+    Args:
+        queryset: The queryset to filter.
+        expressions_and_block_types (:obj:`list` of :obj:`tuple` of (expression, :obj:`set`)):
+            An expression for the stream data of each field, along with the block types to look
+            for in it (or `None`).
+        vendor (str): The vendor of the database connection.
+
+    Returns:
+        The filtered queryset, or `None` if the rows can't be filtered.
+    """
+
+    block_types_filter = make_block_types_filter(
+        queryset, expressions_and_block_types, vendor
+    )
+    if block_types_filter is None:
+        return None
+    queryset, query = block_types_filter
+    return queryset.filter(query)
+
+
+def make_block_types_filter(
+    queryset, expressions_and_block_types, vendor, alias_prefix="stream_data_"
+):
+    """Makes the filter of `filter_by_block_types_of_fields` without applying it, so that it can
+    be combined with other filters.
+
+    Args:
+        queryset: The queryset to filter.
+        expressions_and_block_types (:obj:`list` of :obj:`tuple` of (expression, :obj:`set`)):
+            See `filter_by_block_types_of_fields`.
+        vendor (str): The vendor of the database connection.
+        alias_prefix (:obj:`str`, optional): Prefix of the names of the aliases added to the
+            queryset for the stream data, which must be unique within the queryset.
+
+    Returns:
+        A tuple of the queryset with the aliases used by the filter, and a Q object for the
+        filter, or `None` if the rows can't be filtered.
+    """
+
+    if vendor not in ("postgresql", "sqlite", "mysql"):
+        return None
+
+    query = Q()
+    for i, (expression, block_types) in enumerate(expressions_and_block_types):
+        if block_types is None:
+            return None
+
+        alias = "{}{}".format(alias_prefix, i)
+        # Sorted so that the same query is made each time
+        block_types = sorted(block_types)
+        if vendor == "postgresql":
+            # JSON containment
+            queryset = queryset.alias(**{alias: Cast(expression, JSONField())})
+            for block_type in block_types:
+                query |= Q(**{alias + "__contains": [{"type": block_type}]})
+
+        else:
+            # Pattern matching on the JSON text. Both the default `json.dumps` formatting and
+            # compact JSON (as encoded by other JSON backends) are matched, with non ASCII
+            # characters either escaped or not.
+            queryset = queryset.alias(**{alias: Cast(expression, TextField())})
+            for block_type in block_types:
+                encoded_block_types = {
+                    json.dumps(block_type),
+                    json.dumps(block_type, ensure_ascii=False),
+                }
+                for encoded_block_type in sorted(encoded_block_types):
+                    for pattern in ('"type": {}', '"type":{}'):
+                        query |= Q(
+                            **{
+                                alias
+                                + "__contains": pattern.format(encoded_block_type)
+                            }
                         )
-                        continue
-                    else:
-                        raise utils.InvalidBlockDefError(
-                            revision=revision, instance=instance
-                        ) from e
-                # - TODO add a return value to util to know if changes were made
-                # - TODO save changed only
 
-            revision.content[self.field_name] = json.dumps(raw_data)
-            updated_revisions_buffer.append(revision)
+    return queryset, query
+
+
+def sorted_array_contains(sorted_array, value):
+    """Checks whether a value is in a sorted array with a binary search"""
+
+    index = bisect.bisect_left(sorted_array, value)
+    return index < len(sorted_array) and sorted_array[index] == value
 
-            if len(updated_revisions_buffer) == self.chunk_size:
-                revision_query_maker.bulk_update(updated_revisions_buffer)
-                updated_revisions_buffer = []
 
-        if len(updated_revisions_buffer) > 0:
-            revision_query_maker.bulk_update(updated_revisions_buffer)
+def get_recent_revision_ids(revision_queryset, object_id_field, connection, count=1):
+    """Returns a subquery for the ids of the most recent revisions of each object in a revision
+    queryset.
+
+    Revisions are ordered by `created_at`, and by id for revisions created at the same time. For
+    the latest revision of each object, `DISTINCT ON` is used on PostgreSQL. Otherwise, on
+    databases which support window functions, revisions are numbered with `ROW_NUMBER()`, so that
+    the revisions are only scanned once. On other databases, each revision is checked against the
+    others of its object with a correlated subquery.
+
+    Args:
+        revision_queryset: The revisions to select the most recent revisions from.
+        object_id_field (str): The name of the field of the object which revisions belong to.
+        connection: The database connection which the subquery is for.
+        count (:obj:`int`, optional): The number of revisions to select for each object.
+            Defaults to 1.
+    """
+
+    ordering = [F("created_at").desc(), F("id").desc()]
+    if connection.vendor == "postgresql" and count == 1:
+        return (
+            revision_queryset.order_by(object_id_field, *ordering)
+            .distinct(object_id_field)
+            .values("id")
+        )
+
+    if connection.features.supports_over_clause:
+        # Window functions can't be filtered on in a queryset, so the ranked revisions are
+        # selected from in raw SQL.
+        ranked_revisions = revision_queryset.annotate(
+            row_number=Window(
+                RowNumber(), partition_by=[F(object_id_field)], order_by=ordering
+            )
+        ).values("id", "row_number")
+        sql, params = ranked_revisions.query.get_compiler(
+            connection=connection
+        ).as_sql()
+        return RawSQL(
+            "SELECT {id} FROM ({sql}) ranked_revisions WHERE {row_number} <= %s".format(
+                id=connection.ops.quote_name("id"),
+                sql=sql,
+                row_number=connection.ops.quote_name("row_number"),
+            ),
+            params + (count,),
+        )
+
+    return revision_queryset.filter(
+        id__in=Subquery(
+            revision_queryset.model.objects.filter(
+                **{object_id_field: OuterRef(object_id_field)}
+            )
+            .order_by(*ordering)
+            .values_list("id", flat=True)[:count]
+        )
+    ).values("id")
+
+
+class RevisionContentCodec:
+    """Loads the stream data of one or more streamfields from the content of revisions, and sets
+    it back.
+
+    If `field_names` is given, only those fields and the stream data of the streamfields in the
+    content are loaded, so only the stream data can be written back. Otherwise, the whole content
+    of each revision is fetched as text and decoded once with the JSON backend, instead of with the
+    `json` module by the JSONField of the revision model.
+
+    Either way, the stream data inside the content is a JSON string itself, which is kept encoded
+    until the plan is applied to it, where it is decoded and (if changed) encoded again with the
+    JSON backend.
+
+    Args:
+        stream_field_names (:obj:`list` of :obj:`str`): Names of the streamfields.
+        json_backend: The JSON backend, see `json_backends.get_json_backend`.
+        field_names (:obj:`list` of :obj:`str`, optional): Names of the revision fields to load.
+            Passing `None` loads all fields.
+    """
+
+    def __init__(self, stream_field_names, json_backend, field_names=None):
+        self.stream_field_names = stream_field_names
+        self.json_backend = json_backend
+        self.field_names = field_names
+
+    def get_stream_data_text_name(self, stream_field_name):
+        return "stream_data_text_" + stream_field_name
+
+    def prepare_queryset(self, revision_queryset):
+        if self.field_names is None:
+            return revision_queryset.defer("content").annotate(
+                raw_content_text=Cast("content", TextField())
+            )
+        return revision_queryset.only(*self.field_names).annotate(
+            **{
+                # The output field of `KeyTextTransform` is not always a text field in older
+                # Django versions, so the stream data could otherwise be decoded by the JSONField.
+                self.get_stream_data_text_name(stream_field_name): Cast(
+                    KeyTextTransform(stream_field_name, "content"), TextField()
+                )
+                for stream_field_name in self.stream_field_names
+            }
+        )
+
+    def get_stream_data(self, revision):
+        """Returns a tuple with the stream data of each streamfield in a revision fetched with the
+        prepared queryset, as JSON strings (or `None` if the content has no stream data for the
+        field)."""
+
+        if self.field_names is None:
+            revision.content = self.json_backend.loads(revision.raw_content_text)
+            return tuple(
+                revision.content.get(stream_field_name)
+                for stream_field_name in self.stream_field_names
+            )
+        return tuple(
+            getattr(revision, self.get_stream_data_text_name(stream_field_name))
+            for stream_field_name in self.stream_field_names
+        )
+
+    def set_stream_data(self, revision, stream_data_tuple):
+        """Sets the stream data of each streamfield in a revision, except where it is `None`"""
+
+        if self.field_names is not None:
+            # The content is not loaded, so it is set to only the stream data of the fields,
+            # which is all that is written back.
+            revision.content = {}
+        for stream_field_name, stream_data in zip(
+            self.stream_field_names, stream_data_tuple
+        ):
+            if stream_data is not None:
+                revision.content[stream_field_name] = stream_data
 
 
 class AbstractRevisionQueryMaker:
     """Helper class for making the revision query needed for the data migration"""
 
-    def __init__(self, apps, model, revisions_from):
+    # The name of the field of revisions which identifies the instance they belong to
+    object_id_field = None
+
+    def __init__(
+        self,
+        apps,
+        model,
+        revisions_from,
+        connection=None,
+        revisions_keep_recent=None,
+        pending_revision_ids=None,
+    ):
         self.apps = apps
         self.model = model
         self.revisions_from = revisions_from
+        self.revisions_keep_recent = revisions_keep_recent
+        # Subquery for the ids of revisions which an earlier deferred migration hasn't migrated yet
+        self.pending_revision_ids = pending_revision_ids
+        self.connection = connection or connections[DEFAULT_DB_ALIAS]
         self.RevisionModel = self.get_revision_model()
         self.has_revisions = self.get_has_revisions()
-        if self.has_revisions:
-            # latest or live revision ids may be available directly from the instance. In that case
-            # we can keep track of them here.
-            self.instance_field_revision_ids = set()
 
     def get_revision_model(self):
         raise NotImplementedError
@@ -211,30 +1706,136 @@ class AbstractRevisionQueryMaker:
     def get_has_revisions(self):
         raise NotImplementedError
 
-    def append_instance_data_for_revision_query(self, instance):
+    def get_revision_field_names(self):
+        """Names of the revision fields which are needed for the migration, apart from the
+        content"""
         raise NotImplementedError
 
-    def _make_revision_query(self):
+    def get_instance_revision_attnames(self):
+        """Attribute names of the live and latest revision ids of instances"""
+        raise NotImplementedError
+
+    @property
+    def has_retention_policy(self):
+        """Whether only some of the revisions of each instance are migrated"""
+        return self.revisions_from is not None or self.revisions_keep_recent is not None
+
+    def _make_all_revisions_query(self):
+        """Returns a Q object for all revisions of all instances of the model"""
+        raise NotImplementedError
+
+    def _make_live_or_latest_revisions_query(self):
+        """Returns a Q object for the live and latest revisions of all instances of the model"""
+        raise NotImplementedError
+
+    def _make_kept_revisions_query(self, revision_query, live_or_latest_revisions_query):
+        """Returns a Q object for the revisions which are migrated by the retention policy, from
+        the revisions of `revision_query`."""
+
+        # Live and latest revisions are always migrated
+        kept_revisions_query = live_or_latest_revisions_query
+        if self.revisions_from is not None:
+            # All revisions created after the given date.
+            kept_revisions_query |= Q(created_at__gte=self.revisions_from)
+        if self.revisions_keep_recent:
+            # The given number of most recent revisions of each instance.
+            kept_revisions_query |= Q(
+                id__in=get_recent_revision_ids(
+                    self.RevisionModel.objects.filter(revision_query),
+                    self.object_id_field,
+                    self.connection,
+                    count=self.revisions_keep_recent,
+                )
+            )
+        return kept_revisions_query
+
+    def _make_migrated_revisions_query(self):
+        """Returns a Q object for the revisions which are migrated by the retention policy"""
+
+        revision_query = self._make_all_revisions_query()
+        if not self.has_retention_policy:
+            return revision_query
+
+        return revision_query & self._make_kept_revisions_query(
+            revision_query, self._make_live_or_latest_revisions_query()
+        )
+
+    def _exclude_pending_revisions(self, revision_query):
+        if self.pending_revision_ids is None:
+            return revision_query
+        return revision_query & ~Q(id__in=self.pending_revision_ids)
+
+    def get_revision_query(self):
+        """Returns a Q object for the revisions which need to be migrated"""
+
+        return self._exclude_pending_revisions(self._make_migrated_revisions_query())
+
+    def _make_instances_revision_query(self, pks):
+        """Returns a Q object for all revisions of the instances with the given primary keys"""
         raise NotImplementedError
 
     def get_revision_queryset(self):
-        revision_query = self._make_revision_query()
-        return self.RevisionModel.objects.filter(revision_query)
+        return self.RevisionModel.objects.filter(self.get_revision_query())
 
-    def bulk_update(self, data):
-        self.RevisionModel.objects.bulk_update(data, ["content"])
+    def get_skipped_revision_queryset(self):
+        """Returns the revisions which are not migrated because of the retention policy, apart
+        from the pending revisions of earlier deferred migrations"""
+
+        return self.RevisionModel.objects.filter(
+            self._exclude_pending_revisions(self._make_all_revisions_query())
+        ).exclude(
+            id__in=self.RevisionModel.objects.filter(
+                self._make_migrated_revisions_query()
+            ).values("id")
+        )
+
+    def get_pending_revision_queryset(self):
+        """Returns the revisions which are not migrated because an earlier deferred migration
+        hasn't migrated them yet"""
+
+        return self.RevisionModel.objects.filter(
+            self._make_all_revisions_query() & Q(id__in=self.pending_revision_ids)
+        )
+
+    def get_live_or_latest_revision_ids(self, instances):
+        """Returns the set of ids of the live and latest revisions of a chunk of instances"""
+        return {
+            getattr(instance, attname)
+            for instance in instances
+            for attname in self.get_instance_revision_attnames()
+            if getattr(instance, attname) is not None
+        }
+
+    def get_revision_queryset_for_instances(self, instances, live_or_latest_revision_ids):
+        """Returns the revisions of a chunk of instances which need to be migrated, given the ids
+        of their live and latest revisions."""
+
+        revision_query = self._make_instances_revision_query(
+            [instance.pk for instance in instances]
+        )
+        if self.has_retention_policy:
+            revision_query &= self._make_kept_revisions_query(
+                revision_query, Q(id__in=live_or_latest_revision_ids)
+            )
+        return self.RevisionModel.objects.filter(
+            self._exclude_pending_revisions(revision_query)
+        )
+
+    def bulk_update(self, data, field_name, writer, using):
+        # Only the stream data of the field in the revision content is written, where possible
+        writer.write_json_key(self.RevisionModel, data, "content", field_name, using)
 
     def get_is_live_or_latest_revision(self, revision):
         raise NotImplementedError
 
+    def get_instance_for_revision(self, revision):
+        raise NotImplementedError
+
 
 class Wagtail3RevisionQueryMaker(AbstractRevisionQueryMaker):
     """Revision Query maker to support Wagtail 3"""
 
-    def __init__(self, apps, model, revisions_from):
-        self.page_ids = []
-
-        super().__init__(apps, model, revisions_from)
+    object_id_field = "page_id"
 
     def get_revision_model(self):
         return self.apps.get_model("wagtailcore", "PageRevision")
@@ -242,61 +1843,103 @@ class Wagtail3RevisionQueryMaker(AbstractRevisionQueryMaker):
     def get_has_revisions(self):
         return issubclass(self.model, self.apps.get_model("wagtailcore", "Page"))
 
-    def append_instance_data_for_revision_query(self, instance):
-        if self.has_revisions:
-            self.page_ids.append(instance.id)
-            self.instance_field_revision_ids.add(instance.live_revision_id)
+    def get_revision_field_names(self):
+        return ["id", "page", "created_at"]
 
-    def _make_revision_query(self):
-        if self.revisions_from is not None:
-            # All revisions created after the given date.
-            revision_query = Q(
-                created_at__gte=self.revisions_from,
-                page_id__in=self.page_ids,
-            )
-            # All live revisions.
-            revision_query = revision_query | Q(id__in=self.instance_field_revision_ids)
-            # All latest revisions. For each revision, we check if it is the revision with the
-            # last `created_at` from all revisions with its `page_id`.
-            revision_query = revision_query | Q(
-                id__in=Subquery(
-                    self.RevisionModel.objects.filter(page_id=OuterRef("page_id"))
-                    .order_by("-created_at", "-id")
-                    .values_list("id", flat=True)[:1]
-                ),
-                page_id__in=self.page_ids,
+    def get_instance_revision_attnames(self):
+        # Pages don't have a field for the latest revision in Wagtail 3
+        return ["live_revision_id"]
+
+    def get_page_ids(self):
+        """A subquery for the ids of all pages of the model"""
+        return self.model.objects.values("pk")
+
+    def get_latest_revisions_query(self, page_ids):
+        """Returns a Q object for the latest revisions of the given pages"""
+
+        return Q(
+            id__in=get_recent_revision_ids(
+                self.RevisionModel.objects.filter(page_id__in=page_ids),
+                "page_id",
+                self.connection,
             )
-            return revision_query
+        )
 
-        # otherwise query all revisions for the page
-        else:
-            return Q(page_id__in=self.page_ids)
+    def _make_all_revisions_query(self):
+        return Q(page_id__in=self.get_page_ids())
+
+    def _make_live_or_latest_revisions_query(self):
+        # All live revisions.
+        live_revisions_query = Q(
+            id__in=self.model.objects.filter(live_revision__isnull=False).values(
+                "live_revision"
+            )
+        )
+        # All latest revisions.
+        return live_revisions_query | self.get_latest_revisions_query(
+            self.get_page_ids()
+        )
+
+    def _make_instances_revision_query(self, pks):
+        return Q(page_id__in=pks)
+
+    def get_live_or_latest_revision_ids(self, instances):
+        live_revision_ids = super().get_live_or_latest_revision_ids(instances)
+        latest_revision_ids = self.RevisionModel.objects.filter(
+            self.get_latest_revisions_query([instance.pk for instance in instances])
+        ).values_list("id", flat=True)
+        return live_revision_ids | set(latest_revision_ids)
 
     def get_is_live_or_latest_revision(self, revision):
-        if revision.id in self.instance_field_revision_ids:
+        # This is only needed for revisions with invalid stream data, so the live revisions are
+        # looked up for each revision.
+        if self.model.objects.filter(live_revision=revision.id).exists():
             return True
-        return revision.id in self._latest_revision_ids
+        return sorted_array_contains(self._latest_revision_ids, revision.id)
+
+    def get_instance_for_revision(self, revision):
+        return self.model.objects.filter(pk=revision.page_id).first()
 
     @cached_property
     def _latest_revision_ids(self):
-        return self.RevisionModel.objects.filter(
-            id__in=Subquery(
-                self.RevisionModel.objects.filter(page_id=OuterRef("page_id"))
-                .order_by("-created_at", "-id")
-                .values_list("id", flat=True)[:1]
-            ),
-            page_id__in=self.page_ids,
-        ).values_list("id", flat=True)
+        # Only loaded once a revision with invalid stream data is found. The ids are kept in a
+        # sorted array of integers, which takes far less memory than a set for many revisions.
+        return array(
+            "q",
+            self.RevisionModel.objects.filter(
+                self.get_latest_revisions_query(self.get_page_ids())
+            )
+            .order_by("id")
+            .values_list("id", flat=True)
+            .iterator(),
+        )
 
 
 class DefaultRevisionQueryMaker(AbstractRevisionQueryMaker):
     """Revision Query Maker for Wagtail 4+"""
 
-    def __init__(self, apps, model, revisions_from):
+    object_id_field = "object_id"
+
+    def __init__(
+        self,
+        apps,
+        model,
+        revisions_from,
+        connection=None,
+        revisions_keep_recent=None,
+        pending_revision_ids=None,
+    ):
         self.has_live_revisions = False
         self.has_latest_revisions = False
 
-        super().__init__(apps, model, revisions_from)
+        super().__init__(
+            apps,
+            model,
+            revisions_from,
+            connection=connection,
+            revisions_keep_recent=revisions_keep_recent,
+            pending_revision_ids=pending_revision_ids,
+        )
 
     def get_revision_model(self):
         return self.apps.get_model("wagtailcore", "Revision")
@@ -316,35 +1959,53 @@ class DefaultRevisionQueryMaker(AbstractRevisionQueryMaker):
         )
         return self.has_latest_revisions or self.has_live_revisions
 
-    def append_instance_data_for_revision_query(self, instance):
-        if self.has_revisions:
-            # From wagtail 4 onwards, there can be non page models which may have live or latest
-            # revisions, but not necessarily having both at the same time.
-            if self.has_latest_revisions:
-                self.instance_field_revision_ids.add(instance.latest_revision_id)
+    def get_revision_field_names(self):
+        return ["id", "object_id", "created_at"]
 
-            if self.has_live_revisions:
-                self.instance_field_revision_ids.add(instance.live_revision_id)
+    def get_instance_revision_attnames(self):
+        attnames = []
+        if self.has_latest_revisions:
+            attnames.append("latest_revision_id")
+        if self.has_live_revisions:
+            attnames.append("live_revision_id")
+        return attnames
 
-    def _make_revision_query(self):
+    @cached_property
+    def content_type_id(self):
         ContentType = self.apps.get_model("contenttypes", "ContentType")
-        contenttype_id = ContentType.objects.get_for_model(self.model).id
+        return ContentType.objects.get_for_model(self.model).id
 
-        # if revisions_from is given, then query only the revisions created after that
-        # datetime (and the latest and live revisions if they are not after revisions_from)
-        if self.revisions_from is not None:
-            # All revisions created after the given date.
-            revision_query = Q(
-                created_at__gte=self.revisions_from,
-                content_type_id=contenttype_id,
+    def _make_all_revisions_query(self):
+        return Q(content_type_id=self.content_type_id)
+
+    def _make_live_or_latest_revisions_query(self):
+        # From wagtail 4 onwards, there can be non page models which may have live or latest
+        # revisions, but not necessarily having both at the same time.
+        query = Q()
+        for field_name in self.get_instance_revision_attnames():
+            query |= Q(
+                id__in=self.model.objects.filter(
+                    **{field_name + "__isnull": False}
+                ).values(field_name)
             )
-            # All live and latest revisions
-            revision_query = revision_query | Q(id__in=self.instance_field_revision_ids)
-            return revision_query
+        return query
 
-        # otherwise query all revisions for the model
-        else:
-            return Q(content_type_id=contenttype_id)
+    def _make_instances_revision_query(self, pks):
+        # The object id of revisions is stored as a string
+        return Q(
+            content_type_id=self.content_type_id,
+            object_id__in=[str(pk) for pk in pks],
+        )
 
     def get_is_live_or_latest_revision(self, revision):
-        return revision.id in self.instance_field_revision_ids
+        # This is only needed for revisions with invalid stream data, so the live and latest
+        # revisions are looked up for each revision.
+        query = Q()
+        if self.has_latest_revisions:
+            query |= Q(latest_revision=revision.id)
+        if self.has_live_revisions:
+            query |= Q(live_revision=revision.id)
+        return self.model.objects.filter(query).exists()
+
+    def get_instance_for_revision(self, revision):
+        return self.model.objects.filter(pk=revision.object_id).first()
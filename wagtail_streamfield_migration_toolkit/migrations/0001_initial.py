@@ -0,0 +1,25 @@
+# Generated by Django 4.1.13 on 2026-10-18 06:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StreamDataMigrationCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('instances_last_pk', models.CharField(blank=True, max_length=255, null=True)),
+                ('instances_done', models.BooleanField(default=False)),
+                ('revisions_last_pk', models.CharField(blank=True, max_length=255, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.1.13 on 2026-10-18 06:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtail_streamfield_migration_toolkit', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeferredStreamDataMigration',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('app_name', models.CharField(max_length=255)),
+                ('model_name', models.CharField(max_length=255)),
+                ('field_name', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UnmigratedRevision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision_id', models.BigIntegerField(db_index=True)),
+                ('deferred_migration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unmigrated_revisions', to='wagtail_streamfield_migration_toolkit.deferredstreamdatamigration')),
+            ],
+            options={
+                'unique_together': {('deferred_migration', 'revision_id')},
+            },
+        ),
+    ]
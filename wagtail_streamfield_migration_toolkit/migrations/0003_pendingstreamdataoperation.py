@@ -0,0 +1,23 @@
+# Generated by Django 4.1.13 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtail_streamfield_migration_toolkit', '0002_deferredstreamdatamigration_unmigratedrevision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingStreamDataOperation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('app_label', models.CharField(max_length=255)),
+                ('migration_name', models.CharField(max_length=255)),
+                ('operation_index', models.PositiveIntegerField()),
+                ('key', models.CharField(max_length=255)),
+            ],
+        ),
+    ]
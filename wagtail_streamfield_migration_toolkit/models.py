@@ -0,0 +1,59 @@
+from django.db import models
+
+
+class StreamDataMigrationCheckpoint(models.Model):
+    """Progress of a resumable `MigrateStreamData` operation which has not finished yet
+
+    The primary keys of the last instance and revision processed are kept, so that running the
+    operation again continues from where it stopped. The checkpoint is deleted once the operation
+    has finished.
+    """
+
+    key = models.CharField(max_length=255, unique=True)
+    instances_last_pk = models.CharField(max_length=255, null=True, blank=True)
+    instances_done = models.BooleanField(default=False)
+    revisions_last_pk = models.CharField(max_length=255, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class DeferredStreamDataMigration(models.Model):
+    """A `MigrateStreamData` operation which left some revisions unmigrated
+
+    Revisions which are not migrated because of the revision retention policy of an operation with
+    `defer_revisions=True` are kept as `UnmigratedRevision`s of it, so that they can be migrated
+    later.
+    """
+
+    key = models.CharField(max_length=255, unique=True)
+    app_name = models.CharField(max_length=255)
+    model_name = models.CharField(max_length=255)
+    field_name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class UnmigratedRevision(models.Model):
+    """A revision which has not been migrated by a deferred `MigrateStreamData` operation"""
+
+    deferred_migration = models.ForeignKey(
+        DeferredStreamDataMigration,
+        on_delete=models.CASCADE,
+        related_name="unmigrated_revisions",
+    )
+    revision_id = models.BigIntegerField(db_index=True)
+
+    class Meta:
+        unique_together = [("deferred_migration", "revision_id")]
+
+
+class PendingStreamDataOperation(models.Model):
+    """A `MigrateStreamData` operation with `coalesce=True` which was left pending for an
+    operation of a later migration
+
+    It is recorded in the transaction of its migration, so that it is run by the next `migrate` if
+    the process stops before the operation is run. It is deleted once the operation has run.
+    """
+
+    app_label = models.CharField(max_length=255)
+    migration_name = models.CharField(max_length=255)
+    operation_index = models.PositiveIntegerField()
+    key = models.CharField(max_length=255)
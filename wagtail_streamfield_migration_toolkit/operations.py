@@ -4,6 +4,12 @@ from django.utils.deconstruct import deconstructible
 
 
 class BaseBlockOperation(ABC):
+    # Set this to True if `apply` never alters the `block_value` passed to it in place and returns
+    # that same object when there is nothing to change. This allows `MigrateStreamData` to skip
+    # writing back data which has not changed. Otherwise the value returned by `apply` is always
+    # treated as changed.
+    returns_same_value_if_unchanged = False
+
     def __init__(self):
         pass
 
@@ -16,6 +22,64 @@ class BaseBlockOperation(ABC):
     def operation_name_fragment(self):
         pass
 
+    def references_child(self, name):
+        """Whether the operation may alter the children of the given name (or their descendants) of
+        the block it is applied to. Operations which can't tell should return True."""
+        return True
+
+    def get_changed_child_types(self):
+        """Returns the types of the children of the StreamBlock the operation is applied to which
+        the operation may change, or `None` if it may change children of any type. Used to only
+        fetch the rows which contain such blocks for operations on the top level StreamBlock."""
+        return None
+
+    def reduce(self, operation, assume_new_names_unused=False):
+        """Reduces this operation followed by another operation on the same block, see
+        `optimizer.OperationOptimizer`.
+
+        Args:
+            operation: The operation which follows this operation.
+            assume_new_names_unused (:obj:`bool`, optional): Whether the block is known to have no
+                children with the new names of any renames, so that renamed children are never
+                merged with existing ones. Defaults to `False`.
+
+        Returns:
+            A list of operations with the same effect as both operations, `True` if the
+            operations don't affect each other, or `False` otherwise.
+        """
+        return False
+
+
+def _reduce_rename(rename, operation, remove_class, assume_new_names_unused):
+    if rename.old_name == rename.new_name:
+        return [operation]
+    if isinstance(operation, type(rename)):
+        if operation.old_name == rename.old_name:
+            # There are no children left to rename
+            return [rename]
+        if operation.old_name == rename.new_name and assume_new_names_unused:
+            if operation.new_name == rename.old_name:
+                return []
+            return [type(rename)(rename.old_name, operation.new_name)]
+    elif isinstance(operation, remove_class):
+        if operation.name == rename.old_name:
+            return [rename]
+        if operation.name == rename.new_name and assume_new_names_unused:
+            return [remove_class(rename.old_name)]
+    return not (
+        operation.references_child(rename.old_name)
+        or operation.references_child(rename.new_name)
+    )
+
+
+def _reduce_remove(remove, operation, rename_class):
+    if isinstance(operation, type(remove)) and operation.name == remove.name:
+        return [remove]
+    if isinstance(operation, rename_class) and operation.old_name == remove.name:
+        # There are no children left to rename
+        return [remove]
+    return not operation.references_child(remove.name)
+
 
 @deconstructible
 class RenameStreamChildrenOperation(BaseBlockOperation):
@@ -35,19 +99,34 @@ class RenameStreamChildrenOperation(BaseBlockOperation):
         self.old_name = old_name
         self.new_name = new_name
 
+    returns_same_value_if_unchanged = True
+
     def apply(self, block_value):
         mapped_block_value = []
+        is_changed = False
         for child_block in block_value:
             if child_block["type"] == self.old_name:
                 mapped_block_value.append({**child_block, "type": self.new_name})
+                is_changed = True
             else:
                 mapped_block_value.append(child_block)
-        return mapped_block_value
+        return mapped_block_value if is_changed else block_value
 
     @property
     def operation_name_fragment(self):
         return "rename_{}_to_{}".format(self.old_name, self.new_name)
 
+    def references_child(self, name):
+        return name in (self.old_name, self.new_name)
+
+    def get_changed_child_types(self):
+        return {self.old_name}
+
+    def reduce(self, operation, assume_new_names_unused=False):
+        return _reduce_rename(
+            self, operation, RemoveStreamChildrenOperation, assume_new_names_unused
+        )
+
 
 @deconstructible
 class RenameStructChildrenOperation(BaseBlockOperation):
@@ -67,7 +146,11 @@ class RenameStructChildrenOperation(BaseBlockOperation):
         self.old_name = old_name
         self.new_name = new_name
 
+    returns_same_value_if_unchanged = True
+
     def apply(self, block_value):
+        if self.old_name not in block_value:
+            return block_value
         mapped_block_value = {}
         for child_key, child_value in block_value.items():
             if child_key == self.old_name:
@@ -80,6 +163,14 @@ class RenameStructChildrenOperation(BaseBlockOperation):
     def operation_name_fragment(self):
         return "rename_{}_to_{}".format(self.old_name, self.new_name)
 
+    def references_child(self, name):
+        return name in (self.old_name, self.new_name)
+
+    def reduce(self, operation, assume_new_names_unused=False):
+        return _reduce_rename(
+            self, operation, RemoveStructChildrenOperation, assume_new_names_unused
+        )
+
 
 @deconstructible
 class RemoveStreamChildrenOperation(BaseBlockOperation):
@@ -97,17 +188,31 @@ class RemoveStreamChildrenOperation(BaseBlockOperation):
         super().__init__()
         self.name = name
 
+    returns_same_value_if_unchanged = True
+
     def apply(self, block_value):
-        return [
+        mapped_block_value = [
             child_block
             for child_block in block_value
             if child_block["type"] != self.name
         ]
+        if len(mapped_block_value) == len(block_value):
+            return block_value
+        return mapped_block_value
 
     @property
     def operation_name_fragment(self):
         return "remove_{}".format(self.name)
 
+    def references_child(self, name):
+        return name == self.name
+
+    def get_changed_child_types(self):
+        return {self.name}
+
+    def reduce(self, operation, assume_new_names_unused=False):
+        return _reduce_remove(self, operation, RenameStreamChildrenOperation)
+
 
 @deconstructible
 class RemoveStructChildrenOperation(BaseBlockOperation):
@@ -125,7 +230,11 @@ class RemoveStructChildrenOperation(BaseBlockOperation):
         super().__init__()
         self.name = name
 
+    returns_same_value_if_unchanged = True
+
     def apply(self, block_value):
+        if self.name not in block_value:
+            return block_value
         return {
             child_key: child_value
             for child_key, child_value in block_value.items()
@@ -136,6 +245,12 @@ class RemoveStructChildrenOperation(BaseBlockOperation):
     def operation_name_fragment(self):
         return "remove_{}".format(self.name)
 
+    def references_child(self, name):
+        return name == self.name
+
+    def reduce(self, operation, assume_new_names_unused=False):
+        return _reduce_remove(self, operation, RenameStructChildrenOperation)
+
 
 class StreamChildrenToListBlockOperation(BaseBlockOperation):
     """Combines StreamBlock children of the given type into a new ListBlock
@@ -149,38 +264,48 @@ class StreamChildrenToListBlockOperation(BaseBlockOperation):
         list_block_name (str): name of the new ListBlock type
     """
 
+    returns_same_value_if_unchanged = True
+
     def __init__(self, block_name, list_block_name):
         super().__init__()
         self.block_name = block_name
         self.list_block_name = list_block_name
-        self.temp_blocks = []
 
     def apply(self, block_value):
         mapped_block_value = []
+        # The matching blocks are kept for this block value only, so that they do not carry over
+        # to the next value the operation is applied to.
+        temp_blocks = []
         for child_block in block_value:
             if child_block["type"] == self.block_name:
-                self.temp_blocks.append(child_block)
+                temp_blocks.append(child_block)
             else:
                 mapped_block_value.append(child_block)
 
-        self.map_temp_blocks_to_list_items()
+        if not temp_blocks:
+            return block_value
 
-        if self.temp_blocks:
-            new_list_block = {"type": self.list_block_name, "value": self.temp_blocks}
-            mapped_block_value.append(new_list_block)
+        new_list_block = {
+            "type": self.list_block_name,
+            "value": self.map_temp_blocks_to_list_items(temp_blocks),
+        }
+        mapped_block_value.append(new_list_block)
 
         return mapped_block_value
 
-    def map_temp_blocks_to_list_items(self):
+    def map_temp_blocks_to_list_items(self, temp_blocks):
         new_temp_blocks = []
-        for block in self.temp_blocks:
+        for block in temp_blocks:
             new_temp_blocks.append({**block, "type": "item"})
-        self.temp_blocks = new_temp_blocks
+        return new_temp_blocks
 
     @property
     def operation_name_fragment(self):
         return "{}_to_list_block_{}".format(self.block_name, self.list_block_name)
 
+    def get_changed_child_types(self):
+        return {self.block_name}
+
 
 class StreamChildrenToStreamBlockOperation(BaseBlockOperation):
     """Combines StreamBlock children of the given types into a new StreamBlock
@@ -199,6 +324,8 @@ class StreamChildrenToStreamBlockOperation(BaseBlockOperation):
         self.block_names = block_names
         self.stream_block_name = stream_block_name
 
+    returns_same_value_if_unchanged = True
+
     def apply(self, block_value):
         mapped_block_value = []
         stream_value = []
@@ -210,9 +337,11 @@ class StreamChildrenToStreamBlockOperation(BaseBlockOperation):
                 mapped_block_value.append(child_block)
 
         # Append the new stream block only if it's not empty
-        if stream_value:
-            new_stream_block = {"type": self.stream_block_name, "value": stream_value}
-            mapped_block_value.append(new_stream_block)
+        if not stream_value:
+            return block_value
+
+        new_stream_block = {"type": self.stream_block_name, "value": stream_value}
+        mapped_block_value.append(new_stream_block)
 
         return mapped_block_value
 
@@ -220,6 +349,9 @@ class StreamChildrenToStreamBlockOperation(BaseBlockOperation):
     def operation_name_fragment(self):
         return "{}_to_stream_block".format("_".join(self.block_names))
 
+    def get_changed_child_types(self):
+        return set(self.block_names)
+
 
 class AlterBlockValueOperation(BaseBlockOperation):
     """Alters the value of each block to the given value
@@ -232,7 +364,11 @@ class AlterBlockValueOperation(BaseBlockOperation):
         super().__init__()
         self.new_value = new_value
 
+    returns_same_value_if_unchanged = True
+
     def apply(self, block_value):
+        if block_value == self.new_value:
+            return block_value
         return self.new_value
 
     @property
@@ -292,8 +428,11 @@ class StreamChildrenToStructBlockOperation(BaseBlockOperation):
         self.block_name = block_name
         self.struct_block_name = struct_block_name
 
+    returns_same_value_if_unchanged = True
+
     def apply(self, block_value):
         mapped_block_value = []
+        is_changed = False
         for child_block in block_value:
             if child_block["type"] == self.block_name:
                 mapped_block_value.append(
@@ -303,21 +442,30 @@ class StreamChildrenToStructBlockOperation(BaseBlockOperation):
                         "value": {self.block_name: child_block["value"]},
                     }
                 )
+                is_changed = True
             else:
                 mapped_block_value.append(child_block)
-        return mapped_block_value
+        return mapped_block_value if is_changed else block_value
 
     @property
     def operation_name_fragment(self):
         return "{}_to_struct_block_{}".format(self.block_name, self.struct_block_name)
 
+    def get_changed_child_types(self):
+        return {self.block_name}
+
 
 class ListChildrenToStructBlockOperation(BaseBlockOperation):
     def __init__(self, block_name):
         super().__init__()
         self.block_name = block_name
 
+    returns_same_value_if_unchanged = True
+
     def apply(self, block_value):
+        if not block_value:
+            return block_value
+
         mapped_block_value = []
 
         # In case there is data from the old list format (wagtail < 2.16), we use the generator
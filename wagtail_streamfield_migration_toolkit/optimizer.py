@@ -0,0 +1,107 @@
+from wagtail_streamfield_migration_toolkit.block_paths import parse_block_path
+
+
+class OperationOptimizer:
+    """Reduces a list of operations and block paths to a shorter list with the same effect, in the
+    same way as Django's `MigrationOptimizer` does for migration operations.
+
+    Each operation is compared with the operations after it. When an operation on the same block
+    can be combined with it (see `BaseBlockOperation.reduce`), both are replaced by the result,
+    which is placed after the operations in between. The operations in between must not affect the
+    first operation, that is they must be on other blocks, or on children of the block which the
+    operation doesn't reference, or be reported as unaffected by `reduce`. For example, renaming
+    `a` to `b` and then `a` to `c` is reduced to renaming `a` to `b`, since there are no children
+    named `a` left for the second rename.
+
+    Renaming `a` to `b` and then `b` to `c` is only reduced to renaming `a` to `c`, and renaming
+    `a` to `b` and then removing `b` to removing `a`, with `assume_new_names_unused`, since
+    otherwise children which were named `b` before the first rename would be left as they are.
+    This holds for operations generated by comparing block definitions, where blocks are only
+    renamed to names which weren't used before.
+
+    This is repeated until the list can't be reduced any further.
+
+    Args:
+        assume_new_names_unused (:obj:`bool`, optional): Whether the blocks are known to have no
+            children with the new names of any renames. Defaults to `False`.
+    """
+
+    def __init__(self, assume_new_names_unused=False):
+        self.assume_new_names_unused = assume_new_names_unused
+
+    def optimize(self, operations_and_block_paths):
+        """Returns the reduced list of operations and block paths.
+
+        Args:
+            operations_and_block_paths (:obj:`list` of :obj:`tuple` of (:obj:`operation`, :obj:`str`)):
+                List of operations and corresponding block paths.
+        """
+
+        operations_and_block_paths = list(operations_and_block_paths)
+        while True:
+            result = self.optimize_inner(operations_and_block_paths)
+            if result == operations_and_block_paths:
+                return result
+            operations_and_block_paths = result
+
+    def optimize_inner(self, operations_and_block_paths):
+        """Reduces the first pair of operations which can be reduced"""
+
+        new_operations_and_block_paths = []
+        for i, (operation, block_path_str) in enumerate(operations_and_block_paths):
+            block_path = parse_block_path(block_path_str)
+            for j in range(i + 1, len(operations_and_block_paths)):
+                other_operation, other_block_path_str = operations_and_block_paths[j]
+                other_block_path = parse_block_path(other_block_path_str)
+                if other_block_path == block_path:
+                    result = operation.reduce(
+                        other_operation,
+                        assume_new_names_unused=self.assume_new_names_unused,
+                    )
+                    if isinstance(result, list):
+                        new_operations_and_block_paths.extend(
+                            operations_and_block_paths[i + 1:j]
+                        )
+                        new_operations_and_block_paths.extend(
+                            (reduced_operation, block_path_str)
+                            for reduced_operation in result
+                        )
+                        new_operations_and_block_paths.extend(
+                            operations_and_block_paths[j + 1:]
+                        )
+                        return new_operations_and_block_paths
+                    if not result:
+                        break
+                elif not are_independent(
+                    operation, block_path, other_operation, other_block_path
+                ):
+                    break
+            new_operations_and_block_paths.append((operation, block_path_str))
+        return new_operations_and_block_paths
+
+
+def are_independent(operation, block_path, other_operation, other_block_path):
+    """Whether two operations on different blocks can be applied in either order"""
+
+    if len(block_path) > len(other_block_path):
+        operation, block_path, other_operation, other_block_path = (
+            other_operation,
+            other_block_path,
+            operation,
+            block_path,
+        )
+    if other_block_path[: len(block_path)] != block_path:
+        # Neither block contains the other
+        return True
+    # The other block is a descendant of the block of the operation
+    return not operation.references_child(other_block_path[len(block_path)])
+
+
+def optimize_operations_and_block_paths(
+    operations_and_block_paths, assume_new_names_unused=False
+):
+    """Returns a reduced list of operations and block paths, see `OperationOptimizer`"""
+
+    return OperationOptimizer(
+        assume_new_names_unused=assume_new_names_unused
+    ).optimize(operations_and_block_paths)
@@ -0,0 +1,96 @@
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.migrations.state import ProjectState
+
+
+def iter_stream_data_operations(migration):
+    """Yields the index of each `MigrateStreamData` operation of a migration, along with the
+    operation. Operations of a `MigrateStreamDataBatch` are yielded with the index of the batch."""
+
+    from wagtail_streamfield_migration_toolkit.migrate_operation import (
+        MigrateStreamData,
+        MigrateStreamDataBatch,
+    )
+
+    for i, operation in enumerate(migration.operations):
+        if isinstance(operation, MigrateStreamDataBatch):
+            for batched_operation in operation.operations:
+                yield i, batched_operation
+        elif isinstance(operation, MigrateStreamData):
+            yield i, operation
+
+
+class PendingMigrations:
+    """Finds the migrations which have not been applied to a database yet, in the order they are
+    applied by `migrate`.
+
+    The migration which is being applied is included, since it is only recorded as applied once
+    all of its operations have run. The migration files are only loaded once for each database,
+    until `clear` is called at the start of `migrate`.
+    """
+
+    def __init__(self):
+        self.loaders = {}
+
+    def clear(self):
+        self.loaders = {}
+
+    def get_loader(self, connection):
+        loader = self.loaders.get(connection.alias)
+        if loader is None:
+            loader = MigrationLoader(connection, ignore_no_migrations=True)
+            self.loaders[connection.alias] = loader
+        return loader
+
+    def get_plan(self, loader):
+        """Yields the key of each migration, in the order they are applied by `migrate`"""
+
+        seen = set()
+        for target in loader.graph.leaf_nodes():
+            for key in loader.graph.forwards_plan(target):
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def get(self, connection):
+        loader = self.get_loader(connection)
+        applied = MigrationRecorder(connection).applied_migrations()
+        return [
+            loader.graph.nodes[key]
+            for key in self.get_plan(loader)
+            if key not in applied
+        ]
+
+    def get_state(self, migration, index, connection):
+        """Returns the state of the project before the operation at the given index of a
+        migration, after the migrations which `migrate` applies before it."""
+
+        loader = self.get_loader(connection)
+        state = ProjectState(real_apps=loader.unmigrated_apps)
+        for key in self.get_plan(loader):
+            if key == (migration.app_label, migration.name):
+                break
+            state = loader.graph.nodes[key].mutate_state(state, preserve=False)
+        for operation in migration.operations[:index]:
+            operation.state_forwards(migration.app_label, state)
+        return state
+
+    def find(self, operation, connection):
+        """Returns the first pending migration with a `MigrateStreamData` operation with the same
+        checkpoint key as the given operation, along with the index of the operation, or `None`
+        if the operation isn't in a migration file."""
+
+        for migration in self.get(connection):
+            for i, migration_operation in iter_stream_data_operations(migration):
+                if migration_operation.checkpoint_key == operation.checkpoint_key:
+                    return migration, i
+        return None
+
+
+pending_migrations = PendingMigrations()
+
+
+def clear_pending_migrations(sender, **kwargs):
+    """`pre_migrate` handler which reloads the migration files for each run of `migrate`"""
+
+    pending_migrations.clear()
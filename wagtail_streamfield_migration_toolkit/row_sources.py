@@ -0,0 +1,69 @@
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class QuerysetIteratorRowSource:
+    """Fetches rows with `QuerySet.iterator`, using a single query for the whole queryset.
+
+    On PostgreSQL this keeps a server side cursor open until all rows have been fetched, and on
+    backends without server side cursors all rows are fetched at once by the database driver.
+    """
+
+    def iter_chunks(self, queryset, chunk_size, start_after=None):
+        """Yields lists of at most `chunk_size` rows from the queryset
+
+        Args:
+            queryset: The queryset to fetch rows from.
+            chunk_size (int): The maximum number of rows in each chunk.
+            start_after (optional): Only rows with a primary key greater than this are fetched.
+                Passing `None` fetches all rows.
+        """
+
+        if start_after is not None:
+            queryset = queryset.filter(pk__gt=start_after).order_by("pk")
+
+        chunk = []
+        for row in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+
+@deconstructible
+class KeysetRowSource:
+    """Fetches rows in primary key order, with a separate query for each chunk of rows.
+
+    Each query only fetches the rows with primary keys greater than the last row of the previous
+    chunk (keyset pagination), so no cursor is held open between chunks, memory use is bounded by
+    the chunk size, and the primary key of the last row processed is enough to resume from.
+    """
+
+    def iter_chunks(self, queryset, chunk_size, start_after=None):
+        """Yields lists of at most `chunk_size` rows from the queryset, in primary key order
+
+        Args:
+            queryset: The queryset to fetch rows from. Any ordering is replaced.
+            chunk_size (int): The maximum number of rows in each chunk.
+            start_after (optional): Only rows with a primary key greater than this are fetched.
+                Passing `None` fetches all rows.
+        """
+
+        queryset = queryset.order_by("pk")
+        last_pk = start_after
+        while True:
+            if last_pk is None:
+                chunk = list(queryset[:chunk_size])
+            else:
+                chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+
+            if not chunk:
+                return
+            yield chunk
+
+            if len(chunk) < chunk_size:
+                return
+            last_pk = chunk[-1].pk
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import wagtail.blocks
+import wagtail.fields
+from wagtail import VERSION as WAGTAIL_VERSION
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    # The revisions are migrated with the revision model of the installed version of Wagtail
+    dependencies = [
+        ('wagtailcore', '0070_rename_pagerevision_revision')
+        if WAGTAIL_VERSION >= (4, 0, 0)
+        else ('wagtailcore', '0069_log_entry_jsonfield'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SamplePage',
+            fields=[
+                ('page_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='wagtailcore.page')),
+                ('content', wagtail.fields.StreamField([('char1', wagtail.blocks.CharBlock()), ('char2', wagtail.blocks.CharBlock())], use_json_field=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+            bases=('wagtailcore.page',),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from wagtail_streamfield_migration_toolkit.migrate_operation import MigrateStreamData
+from wagtail_streamfield_migration_toolkit.operations import (
+    RenameStreamChildrenOperation,
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toolkit_test', '0001_initial'),
+        ('wagtail_streamfield_migration_toolkit', '0003_pendingstreamdataoperation'),
+    ]
+
+    operations = [
+        MigrateStreamData(
+            app_name='toolkit_test',
+            model_name='SamplePage',
+            field_name='content',
+            operations_and_block_paths=[
+                (RenameStreamChildrenOperation(old_name='char1', new_name='renamed1'), ''),
+            ],
+            coalesce=True,
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import wagtail.blocks
+import wagtail.fields
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('wagtailcore', '0069_log_entry_jsonfield'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SamplePage',
+            fields=[
+                ('page_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='wagtailcore.page')),
+                ('content', wagtail.fields.StreamField([('char1', wagtail.blocks.CharBlock()), ('char2', wagtail.blocks.CharBlock())], use_json_field=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+            bases=('wagtailcore.page',),
+        ),
+    ]
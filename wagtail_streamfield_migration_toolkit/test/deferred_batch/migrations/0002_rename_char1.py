@@ -0,0 +1,34 @@
+from django.db import migrations
+
+from wagtail_streamfield_migration_toolkit.migrate_operation import (
+    MigrateStreamData,
+    MigrateStreamDataBatch,
+)
+from wagtail_streamfield_migration_toolkit.operations import (
+    RenameStreamChildrenOperation,
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toolkit_test', '0001_initial'),
+        ('wagtail_streamfield_migration_toolkit', '0002_deferredstreamdatamigration_unmigratedrevision'),
+    ]
+
+    operations = [
+        MigrateStreamDataBatch(
+            operations=[
+                MigrateStreamData(
+                    app_name='toolkit_test',
+                    model_name='SamplePage',
+                    field_name='content',
+                    operations_and_block_paths=[
+                        (RenameStreamChildrenOperation(old_name='char1', new_name='renamed1'), ''),
+                    ],
+                    revisions_keep_recent=1,
+                    defer_revisions=True,
+                ),
+            ],
+        ),
+    ]
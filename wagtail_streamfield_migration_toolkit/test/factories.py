@@ -68,3 +68,11 @@ class SamplePageFactory(wagtail_factories.PageFactory):
 
     class Meta:
         model = models.SamplePage
+
+
+class SampleMultipleFieldsPageFactory(wagtail_factories.PageFactory):
+    content = wagtail_factories.StreamFieldFactory(BaseStreamBlockFactory)
+    sidebar = wagtail_factories.StreamFieldFactory(SimpleStreamBlockFactory)
+
+    class Meta:
+        model = models.SampleMultipleFieldsPage
@@ -47,3 +47,8 @@ class SampleModel(models.Model):
 
 class SamplePage(Page):
     content = StreamField(BaseStreamBlock(), use_json_field=True)
+
+
+class SampleMultipleFieldsPage(Page):
+    content = StreamField(BaseStreamBlock(), use_json_field=True)
+    sidebar = StreamField(SimpleStreamBlock(), use_json_field=True)
@@ -0,0 +1,201 @@
+import datetime
+import json
+from django.db import connection
+from django.db.migrations import Migration
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import JSONField, F
+from django.db.models.functions import Cast
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .. import factories
+from wagtail_streamfield_migration_toolkit.migrate_operation import (
+    MigrateStreamData,
+    MigrateStreamDataBatch,
+    MigrateStreamFields,
+)
+from wagtail_streamfield_migration_toolkit.models import UnmigratedRevision
+from wagtail_streamfield_migration_toolkit.operations import (
+    RenameStreamChildrenOperation,
+)
+
+
+class MigrateStreamDataBatchTest(TestCase):
+    """Tests for migrating the revisions of several models in a single pass with
+    `MigrateStreamDataBatch`"""
+
+    def setUp(self):
+        self.page = factories.SamplePageFactory(content__0__char1__value="Char Block 1")
+        self.page_revision = self.page.save_revision()
+        self.multiple_fields_page = factories.SampleMultipleFieldsPageFactory(
+            content__0__char1__value="Char Block 1",
+            sidebar__0__char1__value="Char Block 1",
+        )
+        self.multiple_fields_page_revision = self.multiple_fields_page.save_revision()
+
+    def make_operation(self, page_kwargs=None, **kwargs):
+        return MigrateStreamDataBatch(
+            operations=[
+                MigrateStreamData(
+                    app_name="toolkit_test",
+                    model_name="SamplePage",
+                    field_name="content",
+                    operations_and_block_paths=[
+                        (
+                            RenameStreamChildrenOperation(
+                                old_name="char1", new_name="renamed1"
+                            ),
+                            "",
+                        )
+                    ],
+                    **(page_kwargs or {})
+                ),
+                MigrateStreamFields(
+                    app_name="toolkit_test",
+                    model_name="SampleMultipleFieldsPage",
+                    fields_operations_and_block_paths={
+                        "content": [
+                            (
+                                RenameStreamChildrenOperation(
+                                    old_name="char1", new_name="renamed1"
+                                ),
+                                "",
+                            )
+                        ],
+                        "sidebar": [
+                            (
+                                RenameStreamChildrenOperation(
+                                    old_name="char1", new_name="renamed2"
+                                ),
+                                "",
+                            )
+                        ],
+                    },
+                ),
+            ],
+            **kwargs
+        )
+
+    def apply_operation(self, operation):
+        migration = Migration(
+            "test_migration", "wagtail_streamfield_migration_toolkit_test"
+        )
+        migration.operations = [operation]
+
+        loader = MigrationLoader(connection=connection)
+        loader.build_graph()
+        project_state = loader.project_state()
+        schema_editor = connection.schema_editor(atomic=migration.atomic)
+        migration.apply(project_state, schema_editor)
+
+    def get_raw_block_type(self, instance, field_name):
+        return (
+            type(instance)
+            .objects.annotate(raw_data=Cast(F(field_name), JSONField()))
+            .get(pk=instance.pk)
+            .raw_data[0]["type"]
+        )
+
+    def get_revision_block_type(self, revision, field_name):
+        revision.refresh_from_db()
+        return json.loads(revision.content[field_name])[0]["type"]
+
+    def assertMigrated(self):
+        self.assertEqual(self.get_raw_block_type(self.page, "content"), "renamed1")
+        self.assertEqual(
+            self.get_raw_block_type(self.multiple_fields_page, "content"), "renamed1"
+        )
+        self.assertEqual(
+            self.get_raw_block_type(self.multiple_fields_page, "sidebar"), "renamed2"
+        )
+        self.assertEqual(
+            self.get_revision_block_type(self.page_revision, "content"), "renamed1"
+        )
+        self.assertEqual(
+            self.get_revision_block_type(self.multiple_fields_page_revision, "content"),
+            "renamed1",
+        )
+        self.assertEqual(
+            self.get_revision_block_type(self.multiple_fields_page_revision, "sidebar"),
+            "renamed2",
+        )
+
+    def test_migrate(self):
+        self.apply_operation(self.make_operation())
+
+        self.assertMigrated()
+        self.assertEqual(self.page_revision.content["title"], self.page.title)
+
+    def test_single_revision_pass(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.apply_operation(self.make_operation())
+
+        revision_queries = [
+            query["sql"]
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT")
+            and "stream_data_text_content" in query["sql"]
+        ]
+        self.assertEqual(len(revision_queries), 1)
+        self.assertIn("stream_data_text_sidebar", revision_queries[0])
+
+    def test_chunks(self):
+        self.apply_operation(self.make_operation(chunk_size=1))
+
+        self.assertMigrated()
+
+    def test_interleaved_revisions_migrated_separately(self):
+        self.apply_operation(
+            self.make_operation(page_kwargs={"interleave_revisions": True})
+        )
+
+        self.assertMigrated()
+
+    def test_defer_revisions(self):
+        old_revision = self.page_revision
+        old_revision.created_at = timezone.now() - datetime.timedelta(days=5)
+        old_revision.save()
+        self.page_revision = self.page.save_revision()
+
+        self.apply_operation(
+            self.make_operation(
+                page_kwargs={"revisions_keep_recent": 1, "defer_revisions": True}
+            )
+        )
+
+        self.assertMigrated()
+        self.assertEqual(self.get_revision_block_type(old_revision, "content"), "char1")
+        self.assertEqual(
+            list(UnmigratedRevision.objects.values_list("revision_id", flat=True)),
+            [old_revision.id],
+        )
+
+    def test_same_model(self):
+        operation = MigrateStreamData(
+            app_name="toolkit_test",
+            model_name="SamplePage",
+            field_name="content",
+            operations_and_block_paths=[
+                (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")
+            ],
+        )
+
+        with self.assertRaises(ValueError):
+            MigrateStreamDataBatch(operations=[operation, operation])
+
+    def test_deconstruct(self):
+        operation = self.make_operation(workers=2)
+
+        name, args, kwargs = operation.deconstruct()
+
+        self.assertEqual(name, "MigrateStreamDataBatch")
+        self.assertEqual(kwargs["operations"], operation.operations)
+        self.assertEqual(kwargs["workers"], 2)
+        self.assertNotIn("writer", kwargs)
+
+    def test_migration_name_fragment(self):
+        self.assertEqual(
+            self.make_operation().migration_name_fragment,
+            "rename_char1_to_renamed1_rename_char1_to_renamed2",
+        )
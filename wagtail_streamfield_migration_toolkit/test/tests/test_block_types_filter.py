@@ -0,0 +1,150 @@
+import datetime
+import json
+from django.db import connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from wagtail.blocks import StreamValue
+
+from .. import factories, models
+from ..testutils import MigrationTestMixin
+from wagtail_streamfield_migration_toolkit.migrate_operation import (
+    MigrateStreamData,
+    filter_by_block_types,
+)
+from wagtail_streamfield_migration_toolkit.operations import (
+    AlterBlockValueOperation,
+    RemoveStreamChildrenOperation,
+    RenameStreamChildrenOperation,
+    StreamChildrenToStreamBlockOperation,
+)
+
+
+class FilterByBlockTypesTest(TestCase):
+    """Tests for filtering rows by the top level block types in their stream data"""
+
+    def setUp(self):
+        self.instance_with_stream = factories.SampleModelFactory(
+            content__0__char1__value="Char Block 1",
+            content__1="simplestream",
+            content__1__simplestream__0__char1__value="Char Block 1",
+        )
+        self.instance_with_struct = factories.SampleModelFactory(
+            content__0="simplestruct",
+        )
+        self.instance_without = factories.SampleModelFactory(
+            content__0__char2__value="Char Block 2",
+        )
+
+    def filter_by_block_types(self, block_types):
+        return filter_by_block_types(
+            models.SampleModel.objects.all(),
+            F("content"),
+            block_types,
+            connection.vendor,
+        )
+
+    def test_filter(self):
+        queryset = self.filter_by_block_types({"simplestream", "simplestruct"})
+
+        self.assertQuerysetEqual(
+            queryset.order_by("pk"),
+            [self.instance_with_stream, self.instance_with_struct],
+        )
+
+    def test_no_block_types(self):
+        """Passing `None` means that rows can't be filtered"""
+
+        self.assertIsNone(self.filter_by_block_types(None))
+
+
+class TopLevelBlockTypesTest(SimpleTestCase):
+    """Tests for finding the types of top level blocks which the operations can change"""
+
+    def get_top_level_block_types(self, operations_and_block_paths):
+        return MigrateStreamData(
+            app_name="toolkit_test",
+            model_name="SampleModel",
+            field_name="content",
+            operations_and_block_paths=operations_and_block_paths,
+        ).get_top_level_block_types()
+
+    def test_nested_block_paths(self):
+        self.assertEqual(
+            self.get_top_level_block_types(
+                [
+                    (AlterBlockValueOperation("foo"), "simplestruct.char1"),
+                    (RemoveStreamChildrenOperation("char1"), "simplestream"),
+                ]
+            ),
+            {"simplestruct", "simplestream"},
+        )
+
+    def test_top_level_operations(self):
+        """Operations on the top level stream block should give the types of the children they
+        change"""
+
+        self.assertEqual(
+            self.get_top_level_block_types(
+                [
+                    (RenameStreamChildrenOperation("char1", "renamed1"), ""),
+                    (RemoveStreamChildrenOperation("char2"), ""),
+                    (
+                        StreamChildrenToStreamBlockOperation(
+                            ["simplestruct", "simplelist"], "stream1"
+                        ),
+                        "",
+                    ),
+                    (AlterBlockValueOperation("foo"), "simplestream.char1"),
+                ]
+            ),
+            {"char1", "char2", "simplestruct", "simplelist", "simplestream"},
+        )
+
+    def test_top_level_operation_without_child_types(self):
+        self.assertIsNone(
+            self.get_top_level_block_types(
+                [
+                    (RenameStreamChildrenOperation("char1", "renamed1"), ""),
+                    (AlterBlockValueOperation([]), ""),
+                ]
+            )
+        )
+
+
+class FilteredMigrationTest(TestCase, MigrationTestMixin):
+    """Test that live revisions are still migrated for instances which are filtered out because
+    their current stream data does not contain the blocks being changed"""
+
+    model = models.SamplePage
+    app_name = "toolkit_test"
+    default_operation_and_block_path = [
+        (
+            RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"),
+            "simplestream",
+        )
+    ]
+
+    def setUp(self):
+        self.instance = factories.SamplePageFactory(
+            content__0="simplestream",
+            content__0__simplestream__0__char1__value="Char Block 1",
+        )
+        self.live_revision = self.instance.save_revision()
+        self.instance.live_revision = self.live_revision
+
+        # remove the `simplestream` block from the current stream data
+        self.instance.content = StreamValue(
+            self.instance.content.stream_block,
+            [{"type": "char1", "value": "Char Block 1", "id": "0001"}],
+            is_lazy=True,
+        )
+        self.instance.save()
+        self.instance.save_revision()
+
+    def test_migrate(self):
+        self.apply_migration(revisions_from=timezone.now() + datetime.timedelta(days=2))
+
+        self.live_revision.refresh_from_db()
+        content = json.loads(self.live_revision.content["content"])
+        self.assertEqual(content[0]["value"][0]["type"], "renamed1")
@@ -0,0 +1,134 @@
+import json
+from django.db.models import JSONField, F
+from django.db.models.functions import Cast
+from django.test import TestCase
+from wagtail.blocks import StreamValue
+
+from .. import factories, models
+from ..testutils import MigrationTestMixin
+from .test_bad_data import disable_reference_index_auto_update
+from wagtail_streamfield_migration_toolkit.models import StreamDataMigrationCheckpoint
+from wagtail_streamfield_migration_toolkit.operations import (
+    RenameStreamChildrenOperation,
+)
+from wagtail_streamfield_migration_toolkit.utils import InvalidBlockDefError
+
+
+class ResumableMigrationTest(TestCase, MigrationTestMixin):
+    """Tests for `MigrateStreamData` with `resumable=True`
+
+    Since the tests run inside a transaction, chunks are committed as savepoints here.
+    """
+
+    model = models.SamplePage
+    app_name = "toolkit_test"
+    default_operation_and_block_path = [
+        (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")
+    ]
+    migration_kwargs = {"resumable": True, "chunk_size": 1}
+
+    def setUp(self):
+        self.instances = [
+            factories.SamplePageFactory(content__0__char1__value="Char Block 1")
+            for i in range(3)
+        ]
+        self.revisions = [instance.save_revision() for instance in self.instances]
+        self.checkpoint_key = self.init_migration().operations[0].checkpoint_key
+
+    def get_raw_content(self, instance):
+        return (
+            self.model.objects.annotate(raw_content=Cast(F("content"), JSONField()))
+            .get(pk=instance.pk)
+            .raw_content
+        )
+
+    def get_revision_raw_content(self, revision):
+        revision.refresh_from_db()
+        return json.loads(revision.content["content"])
+
+    def apply_migration(self, *args, **kwargs):
+        with self.assertLogs(level="WARNING"):
+            super().apply_migration(*args, **kwargs)
+
+    def test_migrate(self):
+        self.apply_migration()
+
+        for instance, revision in zip(self.instances, self.revisions):
+            self.assertEqual(self.get_raw_content(instance)[0]["type"], "renamed1")
+            self.assertEqual(
+                self.get_revision_raw_content(revision)[0]["type"], "renamed1"
+            )
+
+        # the checkpoint is deleted once the migration has finished
+        self.assertFalse(
+            StreamDataMigrationCheckpoint.objects.filter(
+                key=self.checkpoint_key
+            ).exists()
+        )
+
+    def test_resume_instances(self):
+        StreamDataMigrationCheckpoint.objects.create(
+            key=self.checkpoint_key, instances_last_pk=str(self.instances[1].pk)
+        )
+
+        self.apply_migration()
+
+        # instances up to the checkpoint have already been processed
+        self.assertEqual(self.get_raw_content(self.instances[0])[0]["type"], "char1")
+        self.assertEqual(self.get_raw_content(self.instances[1])[0]["type"], "char1")
+        self.assertEqual(self.get_raw_content(self.instances[2])[0]["type"], "renamed1")
+        for revision in self.revisions:
+            self.assertEqual(
+                self.get_revision_raw_content(revision)[0]["type"], "renamed1"
+            )
+
+    def test_resume_revisions(self):
+        StreamDataMigrationCheckpoint.objects.create(
+            key=self.checkpoint_key,
+            instances_done=True,
+            revisions_last_pk=str(self.revisions[0].pk),
+        )
+
+        self.apply_migration()
+
+        for instance in self.instances:
+            self.assertEqual(self.get_raw_content(instance)[0]["type"], "char1")
+        self.assertEqual(
+            self.get_revision_raw_content(self.revisions[0])[0]["type"], "char1"
+        )
+        self.assertEqual(
+            self.get_revision_raw_content(self.revisions[1])[0]["type"], "renamed1"
+        )
+
+    def test_checkpoint_kept_on_failure(self):
+        """If the migration fails, the chunks before the failure should be kept along with the
+        checkpoint of the last of them"""
+
+        invalid_instance = self.instances[1]
+        invalid_instance.content = StreamValue(
+            invalid_instance.content.stream_block,
+            [{"type": "invalid_name1", "value": [], "id": "0001"}],
+            is_lazy=True,
+        )
+        with disable_reference_index_auto_update():
+            invalid_instance.save()
+
+        with self.assertRaises(InvalidBlockDefError):
+            self.apply_migration(
+                operations_and_block_path=[
+                    (
+                        RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"),
+                        "",
+                    ),
+                    (
+                        RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"),
+                        "invalid_name1",
+                    ),
+                ]
+            )
+
+        checkpoint = StreamDataMigrationCheckpoint.objects.get()
+        self.assertEqual(checkpoint.instances_last_pk, str(self.instances[0].pk))
+        self.assertFalse(checkpoint.instances_done)
+        self.assertEqual(self.get_raw_content(self.instances[0])[0]["type"], "renamed1")
+        self.assertEqual(self.get_raw_content(self.instances[2])[0]["type"], "char1")
@@ -0,0 +1,370 @@
+import json
+from unittest import mock
+from django.apps import apps
+from django.db import connection, migrations, models as django_models, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.migrations.state import ProjectState
+from django.db.models import JSONField, F
+from django.db.models.functions import Cast
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .. import factories, models
+from ..testutils import MigrationTestMixin
+from wagtail_streamfield_migration_toolkit.coalesce import (
+    can_combine_with_following,
+    can_leave_pending_for_later_migrations,
+    run_recorded_stream_data_operations,
+    stream_data_queue,
+)
+from wagtail_streamfield_migration_toolkit.migrate_operation import MigrateStreamData
+from wagtail_streamfield_migration_toolkit.models import PendingStreamDataOperation
+from wagtail_streamfield_migration_toolkit.operations import (
+    RenameStreamChildrenOperation,
+)
+from wagtail_streamfield_migration_toolkit.pending_migrations import (
+    pending_migrations,
+)
+
+
+def make_operation(
+    model_name="SamplePage", old_name="char1", new_name="renamed1", **kwargs
+):
+    return MigrateStreamData(
+        app_name="toolkit_test",
+        model_name=model_name,
+        field_name="content",
+        operations_and_block_paths=[
+            (RenameStreamChildrenOperation(old_name=old_name, new_name=new_name), "")
+        ],
+        **kwargs
+    )
+
+
+class CanCombineWithFollowingTest(TestCase):
+    """Tests for finding whether a `MigrateStreamData` operation with `coalesce=True` can be left
+    pending until the next one"""
+
+    def setUp(self):
+        self.operation = make_operation(coalesce=True)
+
+    def can_combine_with_following(self, *following_operations):
+        return can_combine_with_following(
+            self.operation,
+            [("toolkit_test", operation) for operation in following_operations],
+            apps,
+            connection,
+        )
+
+    def test_next_operation(self):
+        self.assertTrue(
+            self.can_combine_with_following(
+                make_operation(old_name="renamed1", new_name="renamed2", coalesce=True)
+            )
+        )
+
+    def test_next_operation_not_coalesced(self):
+        self.assertFalse(
+            self.can_combine_with_following(
+                make_operation(old_name="renamed1", new_name="renamed2")
+            )
+        )
+
+    def test_next_operation_with_other_options(self):
+        self.assertFalse(
+            self.can_combine_with_following(
+                make_operation(
+                    old_name="renamed1", new_name="renamed2", coalesce=True, chunk_size=10
+                )
+            )
+        )
+
+    def test_no_next_operation(self):
+        self.assertFalse(self.can_combine_with_following())
+
+    def test_operation_on_other_model(self):
+        self.assertTrue(
+            self.can_combine_with_following(
+                make_operation(model_name="SampleModel"),
+                make_operation(old_name="renamed1", new_name="renamed2", coalesce=True),
+            )
+        )
+
+    def test_block_definition_change(self):
+        self.assertTrue(
+            self.can_combine_with_following(
+                migrations.AlterField(
+                    model_name="samplepage",
+                    name="content",
+                    field=models.SamplePage._meta.get_field("content").clone(),
+                ),
+                make_operation(old_name="renamed1", new_name="renamed2", coalesce=True),
+            )
+        )
+
+    def test_schema_operation_on_model(self):
+        self.assertFalse(
+            self.can_combine_with_following(
+                migrations.AddField(
+                    model_name="samplepage",
+                    name="subtitle",
+                    field=django_models.CharField(max_length=255, default=""),
+                ),
+                make_operation(old_name="renamed1", new_name="renamed2", coalesce=True),
+            )
+        )
+
+    def test_run_python(self):
+        self.assertFalse(
+            self.can_combine_with_following(
+                migrations.RunPython(lambda apps, schema_editor: None),
+                make_operation(old_name="renamed1", new_name="renamed2", coalesce=True),
+            )
+        )
+
+
+class StreamDataQueueTest(TestCase, MigrationTestMixin):
+    """Tests for running consecutive `MigrateStreamData` operations with `coalesce=True` in a
+    single pass"""
+
+    model = models.SamplePage
+    app_name = "toolkit_test"
+    default_operation_and_block_path = [
+        (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")
+    ]
+    migration_kwargs = {"coalesce": True}
+
+    def setUp(self):
+        self.instance = factories.SamplePageFactory(
+            content__0__char1__value="Char Block 1"
+        )
+        self.revision = self.instance.save_revision()
+        self.addCleanup(stream_data_queue.clear)
+
+        self.operation = make_operation(coalesce=True)
+        self.next_operation = make_operation(
+            old_name="renamed1", new_name="renamed2", coalesce=True
+        )
+
+    def get_block_types(self):
+        instance = self.model.objects.annotate(
+            raw_content=Cast(F("content"), JSONField())
+        ).get(pk=self.instance.pk)
+        self.revision.refresh_from_db()
+        return (
+            instance.raw_content[0]["type"],
+            json.loads(self.revision.content["content"])[0]["type"],
+        )
+
+    def make_migration(self, name, *operations):
+        migration = migrations.Migration(name, "toolkit_test")
+        migration.operations = list(operations)
+        return migration
+
+    def apply(self, migration, atomic=True):
+        project_state = MigrationLoader(connection).project_state()
+        migration.apply(project_state, connection.schema_editor(atomic=atomic))
+
+    def mock_pending_migrations(self, *migrations):
+        return mock.patch.object(pending_migrations, "get", return_value=migrations)
+
+    def get_instance_queries(self, ctx):
+        return [
+            query["sql"]
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT")
+            and "raw_content_content" in query["sql"]
+        ]
+
+    def test_not_in_migration_file(self):
+        """Operations which aren't in a migration file should be run straight away"""
+
+        self.apply_migration()
+
+        self.assertEqual(self.get_block_types(), ("renamed1", "renamed1"))
+        self.assertEqual(stream_data_queue.pending, {})
+
+    def test_combined(self):
+        migration = self.make_migration(
+            "0003_rename", self.operation, self.next_operation
+        )
+
+        with self.mock_pending_migrations(migration), CaptureQueriesContext(
+            connection
+        ) as ctx:
+            self.apply(migration)
+
+        self.assertEqual(self.get_block_types(), ("renamed2", "renamed2"))
+        self.assertEqual(len(self.get_instance_queries(ctx)), 1)
+        self.assertEqual(stream_data_queue.pending, {})
+        self.assertFalse(PendingStreamDataOperation.objects.exists())
+
+    def test_combined_across_migrations(self):
+        migration = self.make_migration("0003_first", self.operation)
+        next_migration = self.make_migration("0004_second", self.next_operation)
+
+        with self.mock_pending_migrations(
+            migration, next_migration
+        ), CaptureQueriesContext(connection) as ctx:
+            self.apply(migration)
+            self.assertEqual(self.get_block_types(), ("char1", "char1"))
+            pending_operation = PendingStreamDataOperation.objects.get()
+            self.assertEqual(pending_operation.app_label, "toolkit_test")
+            self.assertEqual(pending_operation.migration_name, "0003_first")
+            self.assertEqual(pending_operation.operation_index, 0)
+            self.assertEqual(pending_operation.key, self.operation.checkpoint_key)
+
+            self.apply(next_migration)
+
+        self.assertEqual(self.get_block_types(), ("renamed2", "renamed2"))
+        self.assertEqual(len(self.get_instance_queries(ctx)), 1)
+        self.assertEqual(stream_data_queue.pending, {})
+        self.assertFalse(PendingStreamDataOperation.objects.exists())
+
+    def test_not_across_non_atomic_migrations(self):
+        migration = self.make_migration("0003_first", self.operation)
+        next_migration = self.make_migration("0004_second", self.next_operation)
+
+        with self.mock_pending_migrations(migration, next_migration):
+            self.apply(migration, atomic=False)
+
+        self.assertEqual(self.get_block_types(), ("renamed1", "renamed1"))
+        self.assertEqual(stream_data_queue.pending, {})
+        self.assertFalse(PendingStreamDataOperation.objects.exists())
+
+    def test_not_across_migrations_without_toolkit_migrations(self):
+        self.assertFalse(
+            can_leave_pending_for_later_migrations(
+                ProjectState().apps, connection.schema_editor(atomic=True)
+            )
+        )
+
+    def test_migration_run_again(self):
+        """Operations left pending by a failed run of a migration shouldn't be run again when the
+        migration is run again"""
+
+        migration = self.make_migration(
+            "0003_rename", self.operation, self.next_operation
+        )
+        project_state = MigrationLoader(connection).project_state()
+
+        with self.mock_pending_migrations(migration), mock.patch.object(
+            stream_data_queue, "run", wraps=stream_data_queue.run
+        ) as run:
+            # the migration fails after its first operation
+            stream_data_queue.add(
+                self.operation, project_state.apps, connection.schema_editor()
+            )
+            self.apply(migration)
+
+        [(pending, _), _] = run.call_args
+        self.assertEqual(
+            [operation for operation, _, _, _ in pending],
+            [self.operation, self.next_operation],
+        )
+        self.assertEqual(self.get_block_types(), ("renamed2", "renamed2"))
+
+    def test_migration_rolled_back(self):
+        """Operations left pending by a migration which was rolled back shouldn't be run"""
+
+        migration = self.make_migration("0003_first", self.operation)
+        next_migration = self.make_migration("0004_second", self.next_operation)
+
+        with self.mock_pending_migrations(migration, next_migration):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.apply(migration)
+                raise RuntimeError
+            self.apply(next_migration)
+
+        self.assertEqual(self.get_block_types(), ("char1", "char1"))
+        self.assertEqual(stream_data_queue.pending, {})
+
+    def test_flush(self):
+        migration = self.make_migration("0003_first", self.operation)
+        next_migration = self.make_migration("0004_second", self.next_operation)
+
+        with self.mock_pending_migrations(migration, next_migration):
+            self.apply(migration)
+        stream_data_queue.flush(connection)
+
+        self.assertEqual(self.get_block_types(), ("renamed1", "renamed1"))
+        self.assertEqual(stream_data_queue.pending, {})
+        self.assertFalse(PendingStreamDataOperation.objects.exists())
+
+
+@override_settings(
+    MIGRATION_MODULES={
+        "toolkit_test": "wagtail_streamfield_migration_toolkit.test.coalesced.migrations"
+    }
+)
+class RunRecordedTest(TestCase):
+    """Tests for running the operations left pending by a `migrate` which was stopped"""
+
+    def setUp(self):
+        self.instance = factories.SamplePageFactory(
+            content__0__char1__value="Char Block 1"
+        )
+        pending_migrations.clear()
+        self.addCleanup(pending_migrations.clear)
+
+    def get_block_type(self):
+        return (
+            models.SamplePage.objects.annotate(
+                raw_content=Cast(F("content"), JSONField())
+            )
+            .get(pk=self.instance.pk)
+            .raw_content[0]["type"]
+        )
+
+    def record_pending_operation(self, operation_index=0, applied=True):
+        if applied:
+            MigrationRecorder(connection).record_applied(
+                "toolkit_test", "0002_rename_char1"
+            )
+        PendingStreamDataOperation.objects.create(
+            app_label="toolkit_test",
+            migration_name="0002_rename_char1",
+            operation_index=operation_index,
+            key=make_operation(coalesce=True).checkpoint_key,
+        )
+
+    def test_run_recorded(self):
+        self.record_pending_operation()
+
+        run_recorded_stream_data_operations(sender=None, using=connection.alias)
+
+        self.assertEqual(self.get_block_type(), "renamed1")
+        self.assertFalse(PendingStreamDataOperation.objects.exists())
+
+    def test_migration_not_applied(self):
+        """The operations of a migration which wasn't recorded as applied are run when it is
+        applied again"""
+
+        self.record_pending_operation(applied=False)
+
+        stream_data_queue.run_recorded(connection)
+
+        self.assertEqual(self.get_block_type(), "char1")
+        self.assertFalse(PendingStreamDataOperation.objects.exists())
+
+    def test_unknown_operation(self):
+        self.record_pending_operation(operation_index=1)
+
+        with self.assertLogs(level="WARNING"):
+            stream_data_queue.run_recorded(connection)
+
+        self.assertEqual(self.get_block_type(), "char1")
+        self.assertFalse(PendingStreamDataOperation.objects.exists())
+
+
+class CoalesceOptionTest(TestCase):
+    def test_resumable(self):
+        with self.assertRaises(ValueError):
+            make_operation(coalesce=True, resumable=True)
+
+    def test_deconstruct(self):
+        _, _, kwargs = make_operation(coalesce=True).deconstruct()
+
+        self.assertIs(kwargs["coalesce"], True)
+        self.assertNotIn("coalesce", make_operation().deconstruct()[2])
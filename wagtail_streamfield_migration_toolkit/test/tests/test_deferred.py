@@ -0,0 +1,191 @@
+import datetime
+import json
+from unittest import mock
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from wagtail.models import Revision
+
+from .. import factories, models
+from ..testutils import MigrationTestMixin
+from wagtail_streamfield_migration_toolkit.deferred import (
+    DeferredMigrationRegistry,
+    disable_migrate_on_read,
+    enable_migrate_on_read,
+    has_unmigrated_revisions,
+    migrate_deferred_revision,
+    registry,
+)
+from wagtail_streamfield_migration_toolkit.json_backends import StdlibJSONBackend
+from wagtail_streamfield_migration_toolkit.migrate_operation import MigrateStreamData
+from wagtail_streamfield_migration_toolkit.models import (
+    DeferredStreamDataMigration,
+    UnmigratedRevision,
+)
+from wagtail_streamfield_migration_toolkit.operations import (
+    RenameStreamChildrenOperation,
+)
+
+
+class MigrateOnReadTest(TestCase, MigrationTestMixin):
+    """Tests for migrating unmigrated revisions when they are loaded"""
+
+    model = models.SamplePage
+    app_name = "toolkit_test"
+    default_operation_and_block_path = [
+        (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")
+    ]
+    migration_kwargs = {"revisions_keep_recent": 1, "defer_revisions": True}
+
+    def setUp(self):
+        self.instance = factories.SamplePageFactory(
+            content__0__char1__value="Char Block 1"
+        )
+        self.old_revision = self.instance.save_revision()
+        self.old_revision.created_at = timezone.now() - datetime.timedelta(days=5)
+        self.old_revision.save()
+        self.instance.save_revision()
+
+        self.apply_migration()
+
+        has_unmigrated_revisions.clear()
+        enable_migrate_on_read()
+        self.addCleanup(disable_migrate_on_read)
+        self.addCleanup(has_unmigrated_revisions.clear)
+
+    def get_stored_block_type(self, revision_id):
+        content = Revision.objects.filter(pk=revision_id).values_list(
+            "content", flat=True
+        )[0]
+        return json.loads(content["content"])[0]["type"]
+
+    def test_migrate_on_read(self):
+        revision = Revision.objects.get(pk=self.old_revision.id)
+        revision.as_object()
+
+        self.assertEqual(json.loads(revision.content["content"])[0]["type"], "renamed1")
+        # the stored revision is left to be migrated by migratedeferredrevisions
+        self.assertEqual(self.get_stored_block_type(self.old_revision.id), "char1")
+        self.assertTrue(UnmigratedRevision.objects.exists())
+
+    def test_migrated_once(self):
+        revision = Revision.objects.get(pk=self.old_revision.id)
+        revision.as_object()
+
+        with self.assertNumQueries(0):
+            self.assertFalse(migrate_deferred_revision(revision))
+        self.assertEqual(json.loads(revision.content["content"])[0]["type"], "renamed1")
+
+    def test_no_lookup_on_load(self):
+        with self.assertNumQueries(1):
+            revision = Revision.objects.get(pk=self.old_revision.id)
+
+        self.assertEqual(json.loads(revision.content["content"])[0]["type"], "char1")
+
+    def test_no_lookup_without_unmigrated_revisions(self):
+        UnmigratedRevision.objects.all().delete()
+        migrate_deferred_revision(Revision.objects.get(pk=self.old_revision.id))
+        revision = Revision.objects.get(pk=self.old_revision.id)
+
+        # whether there are unmigrated revisions is cached
+        with self.assertNumQueries(0):
+            self.assertFalse(migrate_deferred_revision(revision))
+
+    def test_preload_on_read(self):
+        with mock.patch.object(registry, "preloaded", False), mock.patch.object(
+            registry, "preload"
+        ) as preload:
+            Revision.objects.get(pk=self.old_revision.id).as_object()
+
+        [(keys,), _] = preload.call_args
+        self.assertEqual(list(keys), [DeferredStreamDataMigration.objects.get().key])
+
+    def test_no_preload_without_unmigrated_revisions(self):
+        UnmigratedRevision.objects.all().delete()
+        with mock.patch.object(registry, "preloaded", False), mock.patch.object(
+            registry, "preload"
+        ) as preload:
+            Revision.objects.get(pk=self.old_revision.id).as_object()
+
+        preload.assert_not_called()
+
+    def test_unknown_operation(self):
+        deferred_migration = DeferredStreamDataMigration.objects.create(
+            key="unknown",
+            app_name="toolkit_test",
+            model_name="SamplePage",
+            field_name="content",
+        )
+        UnmigratedRevision.objects.all().delete()
+        UnmigratedRevision.objects.create(
+            deferred_migration=deferred_migration, revision_id=self.old_revision.id
+        )
+
+        revision = Revision.objects.get(pk=self.old_revision.id)
+        with self.assertLogs(level="WARNING"):
+            revision.as_object()
+
+        self.assertEqual(json.loads(revision.content["content"])[0]["type"], "char1")
+
+
+@override_settings(
+    MIGRATION_MODULES={
+        "toolkit_test": "wagtail_streamfield_migration_toolkit.test.deferred_batch.migrations"
+    }
+)
+class DeferredMigrationRegistryTest(SimpleTestCase):
+    """Tests for finding the operations of deferred migrations in migration files"""
+
+    def get_operation(self):
+        return MigrateStreamData(
+            app_name="toolkit_test",
+            model_name="SamplePage",
+            field_name="content",
+            operations_and_block_paths=[
+                (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")
+            ],
+            revisions_keep_recent=1,
+            defer_revisions=True,
+        )
+
+    def get_key(self):
+        return self.get_operation().make_deferred_migration_key(
+            "toolkit_test", "0002_rename_char1"
+        )
+
+    def test_operation_in_batch(self):
+        field_names, plan = DeferredMigrationRegistry().get(self.get_key())
+
+        self.assertEqual(field_names, ["content"])
+        [(raw_data_tuple, error)] = plan.apply_to_chunk(
+            [(json.dumps([{"type": "char1", "value": "foo", "id": "1"}]),)],
+            json_backend=StdlibJSONBackend(),
+        )
+        self.assertIsNone(error)
+        self.assertEqual(json.loads(raw_data_tuple[0])[0]["type"], "renamed1")
+
+    def test_unknown_operation(self):
+        self.assertIsNone(DeferredMigrationRegistry().get("unknown"))
+
+    def test_operation_in_other_migration(self):
+        self.assertIsNone(
+            DeferredMigrationRegistry().get(
+                self.get_operation().make_deferred_migration_key(
+                    "toolkit_test", "0003_rename_char1_again"
+                )
+            )
+        )
+
+    def test_preload(self):
+        registry = DeferredMigrationRegistry()
+        registry.preload([self.get_key(), "unknown"])
+
+        self.assertTrue(registry.preloaded)
+        self.assertEqual(list(registry.plans), [self.get_key()])
+
+    def test_preload_nothing(self):
+        registry = DeferredMigrationRegistry()
+        registry.preload([])
+
+        self.assertTrue(registry.preloaded)
+        # the migration files aren't loaded
+        self.assertIsNone(registry.loader)
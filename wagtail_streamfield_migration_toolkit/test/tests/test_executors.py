@@ -0,0 +1,176 @@
+import json
+from django.test import TestCase
+
+from .. import factories, models
+from .test_migrations import BaseMigrationTest
+from wagtail_streamfield_migration_toolkit.executors import (
+    ProcessPoolPlanExecutor,
+    SerialPlanExecutor,
+)
+from wagtail_streamfield_migration_toolkit.json_backends import StdlibJSONBackend
+from wagtail_streamfield_migration_toolkit.migrate_operation import MigrateStreamData
+from wagtail_streamfield_migration_toolkit.operations import (
+    RemoveStreamChildrenOperation,
+)
+from wagtail_streamfield_migration_toolkit.utils import (
+    CachedMigrationPlan,
+    InvalidBlockDefError,
+    ResultCache,
+    StreamDataMigrationPlan,
+    StreamFieldsMigrationPlan,
+)
+
+
+class PlanExecutorTestMixin:
+    def get_executor(self, plan):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.plan = StreamDataMigrationPlan(
+            stream_block=models.SampleModel.content.field.stream_block,
+            operations_and_block_paths=[
+                (RemoveStreamChildrenOperation(name="char1"), ""),
+                (RemoveStreamChildrenOperation(name="char1"), "invalid_name1"),
+            ],
+        )
+        self.raw_data_list = [
+            [{"type": "char1", "id": "0001", "value": "Char Block 1"}],
+            [{"type": "char2", "id": "0002", "value": "Char Block 2"}],
+            [{"type": "invalid_name1", "id": "0003", "value": []}],
+        ]
+
+    def assertResults(self, results, expected_altered_raw_data_list):
+        self.assertEqual(
+            [altered_raw_data for altered_raw_data, _ in results],
+            expected_altered_raw_data_list,
+        )
+        self.assertEqual([error is None for _, error in results], [True, True, False])
+        self.assertIsInstance(results[2][1], InvalidBlockDefError)
+
+    def test_apply_to_chunk(self):
+        with self.get_executor(self.plan) as executor:
+            results = executor.apply_to_chunk(self.raw_data_list)
+
+        self.assertResults(results, [[], None, None])
+
+    def test_apply_to_chunk_json(self):
+        with self.get_executor(self.plan) as executor:
+            results = executor.apply_to_chunk(
+                [json.dumps(raw_data) for raw_data in self.raw_data_list],
+                json_backend=StdlibJSONBackend(),
+            )
+
+        self.assertResults(results, ["[]", None, None])
+
+    def test_submit(self):
+        with self.get_executor(self.plan) as executor:
+            futures = [executor.submit([raw_data]) for raw_data in self.raw_data_list]
+            results = [future.result()[0] for future in futures]
+
+        self.assertResults(results, [[], None, None])
+
+
+class SerialPlanExecutorTest(PlanExecutorTestMixin, TestCase):
+    def get_executor(self, plan):
+        return SerialPlanExecutor(plan)
+
+
+class ProcessPoolPlanExecutorTest(PlanExecutorTestMixin, TestCase):
+    def get_executor(self, plan):
+        return ProcessPoolPlanExecutor(plan, workers=2)
+
+    def test_cache_stats(self):
+        cache = ResultCache(max_bytes=1024 * 1024)
+        plan = StreamFieldsMigrationPlan([CachedMigrationPlan(self.plan, cache)])
+        executor = ProcessPoolPlanExecutor(plan, workers=2)
+
+        executor.add_cache_stats(1, [(2, 1, 100)])
+        executor.add_cache_stats(2, [(0, 1, 50)])
+        executor.add_cache_stats(1, [(1, 0, 100)])
+
+        self.assertEqual((cache.hits, cache.misses, cache.size), (3, 2, 150))
+
+
+class ChunkResultsTest(TestCase):
+    """Tests for sending chunks to the plan executor ahead of the chunk being written"""
+
+    def setUp(self):
+        self.plan = StreamDataMigrationPlan(
+            stream_block=models.SampleModel.content.field.stream_block,
+            operations_and_block_paths=[
+                (RemoveStreamChildrenOperation(name="char1"), ""),
+            ],
+        )
+        self.events = []
+
+    def iter_chunks(self):
+        for i in range(3):
+            self.events.append(("read", i))
+            yield [[{"type": "char1", "id": str(i), "value": "Char Block 1"}]]
+
+    def iter_chunk_results(self, workers=None):
+        migration_operation = MigrateStreamData(
+            app_name="toolkit_test",
+            model_name="SampleModel",
+            field_name="content",
+            operations_and_block_paths=[],
+            workers=workers,
+        )
+        chunk_results = migration_operation.iter_chunk_results(
+            SerialPlanExecutor(self.plan), self.iter_chunks(), lambda row: row
+        )
+        for chunk, results in chunk_results:
+            self.events.append(("write", chunk[0][0]["id"]))
+            self.assertEqual(results, [([], None)])
+
+    def test_read_ahead(self):
+        self.iter_chunk_results(workers=2)
+
+        self.assertEqual(
+            self.events,
+            [
+                ("read", 0),
+                ("read", 1),
+                ("write", "0"),
+                ("read", 2),
+                ("write", "1"),
+                ("write", "2"),
+            ],
+        )
+
+    def test_no_read_ahead_without_workers(self):
+        """Chunks shouldn't be read ahead when the operations are applied in the migration
+        process"""
+
+        self.iter_chunk_results()
+
+        self.assertEqual(
+            self.events,
+            [
+                ("read", 0),
+                ("write", "0"),
+                ("read", 1),
+                ("write", "1"),
+                ("read", 2),
+                ("write", "2"),
+            ],
+        )
+
+
+class TestPageWorkers(BaseMigrationTest):
+    """Migration tests for pages with the operations applied in worker processes"""
+
+    model = models.SamplePage
+    factory = factories.SamplePageFactory
+    has_revisions = True
+    app_name = "toolkit_test"
+    migration_kwargs = {"workers": 2, "chunk_size": 3}
+
+    def test_migrate_stream_data(self):
+        self._test_migrate_stream_data()
+
+    def test_migrate_revisions(self):
+        self._test_migrate_revisions()
+
+    def test_migrate_revisions_from_date(self):
+        self._test_migrate_revisions_from_date()
@@ -0,0 +1,88 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .. import factories, models
+from ..testutils import MigrationTestMixin
+from . import test_bad_data
+from .test_migrations import BaseMigrationTest
+from wagtail_streamfield_migration_toolkit.operations import (
+    RenameStreamChildrenOperation,
+)
+
+
+class TestPageInterleavedRevisions(BaseMigrationTest):
+    """Migration tests for pages with the revisions of each chunk migrated after the chunk"""
+
+    model = models.SamplePage
+    factory = factories.SamplePageFactory
+    has_revisions = True
+    app_name = "toolkit_test"
+    migration_kwargs = {"interleave_revisions": True, "chunk_size": 2}
+
+    def test_migrate_stream_data(self):
+        self._test_migrate_stream_data()
+
+    def test_migrate_revisions(self):
+        self._test_migrate_revisions()
+
+    def test_always_migrate_live_and_latest_revisions(self):
+        self._test_always_migrate_live_and_latest_revisions()
+
+    def test_migrate_revisions_from_date(self):
+        self._test_migrate_revisions_from_date()
+
+
+class TestPageInterleavedRevisionsRaw(TestPageInterleavedRevisions):
+    """Migration tests for pages in raw mode with the revisions of each chunk migrated after the
+    chunk"""
+
+    migration_kwargs = {"interleave_revisions": True, "chunk_size": 2, "raw": True}
+
+
+class InterleavedRevisionQueriesTest(TestCase, MigrationTestMixin):
+    model = models.SamplePage
+    app_name = "toolkit_test"
+    default_operation_and_block_path = [
+        (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")
+    ]
+    migration_kwargs = {"interleave_revisions": True, "chunk_size": 1}
+
+    def setUp(self):
+        for i in range(3):
+            instance = factories.SamplePageFactory(
+                content__0__char1__value="Char Block 1"
+            )
+            instance.save_revision()
+
+    def test_revisions_fetched_per_chunk(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.apply_migration()
+
+        revision_queries = [
+            query["sql"]
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT")
+            and (
+                "stream_data_text" in query["sql"] or "raw_content_text" in query["sql"]
+            )
+        ]
+        self.assertEqual(len(revision_queries), 3)
+
+
+class TestExceptionRaisedForLatestRevisionInterleaved(
+    test_bad_data.TestExceptionRaisedForLatestRevision
+):
+    migration_kwargs = {"interleave_revisions": True}
+
+
+class TestExceptionRaisedForLiveRevisionInterleaved(
+    test_bad_data.TestExceptionRaisedForLiveRevision
+):
+    migration_kwargs = {"interleave_revisions": True}
+
+
+class TestExceptionIgnoredForOtherRevisionsInterleaved(
+    test_bad_data.TestExceptionIgnoredForOtherRevisions
+):
+    migration_kwargs = {"interleave_revisions": True}
@@ -0,0 +1,112 @@
+import json
+from unittest import skipIf
+from django.test import TestCase
+
+from .. import factories, models
+from ..testutils import MigrationTestMixin
+from .test_migrations import BaseMigrationTest
+from wagtail_streamfield_migration_toolkit import json_backends
+from wagtail_streamfield_migration_toolkit.operations import (
+    AlterBlockValueOperation,
+    RenameStreamChildrenOperation,
+)
+
+
+class JSONBackendTestMixin:
+    backend_name = None
+
+    def setUp(self):
+        self.backend = json_backends.get_json_backend(self.backend_name)
+
+    def test_name(self):
+        self.assertEqual(self.backend.name, self.backend_name)
+
+    def test_round_trip(self):
+        raw_data = [{"type": "char1", "id": "0001", "value": "Chär Block 1"}]
+
+        encoded = self.backend.dumps(raw_data)
+
+        self.assertIsInstance(encoded, str)
+        self.assertEqual(json.loads(encoded), raw_data)
+        self.assertEqual(self.backend.loads(encoded), raw_data)
+        self.assertEqual(self.backend.loads(json.dumps(raw_data)), raw_data)
+
+
+class StdlibJSONBackendTest(JSONBackendTestMixin, TestCase):
+    backend_name = "json"
+
+
+@skipIf(json_backends.orjson is None, "orjson is not installed")
+class OrjsonBackendTest(JSONBackendTestMixin, TestCase):
+    backend_name = "orjson"
+
+    def test_stdlib_fallback(self):
+        """JSON which orjson can't decode should be decoded with the json module"""
+
+        self.assertEqual(self.backend.loads(json.dumps([float("inf")])), [float("inf")])
+
+
+@skipIf(json_backends.ujson is None, "ujson is not installed")
+class UjsonBackendTest(JSONBackendTestMixin, TestCase):
+    backend_name = "ujson"
+
+
+class GetJSONBackendTest(TestCase):
+    def test_default(self):
+        """The standard library should be used by default, even if other libraries are
+        installed"""
+
+        self.assertEqual(json_backends.get_json_backend().name, "json")
+
+    def test_unknown(self):
+        with self.assertRaisesMessage(ValueError, "Unknown JSON backend simplejson"):
+            json_backends.get_json_backend("simplejson")
+
+
+class TestPageStdlibJSONBackend(BaseMigrationTest):
+    """Migration tests for pages with revision content encoded with the `json` module"""
+
+    model = models.SamplePage
+    factory = factories.SamplePageFactory
+    has_revisions = True
+    app_name = "toolkit_test"
+    migration_kwargs = {"json_backend": "json"}
+
+    def test_migrate_revisions(self):
+        self._test_migrate_revisions()
+
+    def test_migrate_revisions_from_date(self):
+        self._test_migrate_revisions_from_date()
+
+
+@skipIf(json_backends.orjson is None, "orjson is not installed")
+class CompactRevisionContentTest(TestCase, MigrationTestMixin):
+    """Revisions with stream data encoded without whitespace by a previous migration should still
+    be found when filtering revisions by block types"""
+
+    model = models.SamplePage
+    app_name = "toolkit_test"
+    migration_kwargs = {"json_backend": "orjson"}
+
+    def setUp(self):
+        self.instance = factories.SamplePageFactory(
+            content__0__char1__value="Char Block 1"
+        )
+        self.revision = self.instance.save_revision()
+
+    def get_revision_raw_content(self):
+        self.revision.refresh_from_db()
+        return self.revision.content["content"]
+
+    def test_migrate_twice(self):
+        self.apply_migration(
+            operations_and_block_path=[
+                (RenameStreamChildrenOperation(old_name="char1", new_name="char2"), "")
+            ]
+        )
+        self.assertIn('"type":"char2"', self.get_revision_raw_content())
+
+        self.apply_migration(
+            operations_and_block_path=[(AlterBlockValueOperation(new_value="foo"), "char2")]
+        )
+        self.assertEqual(json.loads(self.get_revision_raw_content())[0]["value"], "foo")
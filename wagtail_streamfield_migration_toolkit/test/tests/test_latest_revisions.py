@@ -0,0 +1,69 @@
+import datetime
+from array import array
+from unittest import mock
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from wagtail.models import Revision
+
+from .. import factories
+from wagtail_streamfield_migration_toolkit.migrate_operation import (
+    get_recent_revision_ids,
+    sorted_array_contains,
+)
+
+
+class LatestRevisionIdsTest(TestCase):
+    """Tests for selecting the latest revision of each object"""
+
+    def setUp(self):
+        now = timezone.now()
+        self.latest_revision_ids = set()
+        self.recent_revision_ids = set()
+        for i in range(3):
+            instance = factories.SamplePageFactory()
+            revisions = [instance.save_revision() for j in range(3)]
+            # the first revision is the latest by creation date
+            revisions[0].created_at = now + datetime.timedelta(days=1)
+            revisions[0].save()
+            if i == 0:
+                # with the same creation date, the revision with the last id is the latest
+                revisions[1].created_at = revisions[0].created_at
+                revisions[1].save()
+                self.latest_revision_ids.add(revisions[1].id)
+                self.recent_revision_ids.update([revisions[0].id, revisions[1].id])
+            else:
+                self.latest_revision_ids.add(revisions[0].id)
+                self.recent_revision_ids.update([revisions[0].id, revisions[2].id])
+
+    def get_latest_revision_ids(self, count=1):
+        return set(
+            Revision.objects.filter(
+                id__in=get_recent_revision_ids(
+                    Revision.objects.all(), "object_id", connection, count=count
+                )
+            ).values_list("id", flat=True)
+        )
+
+    def test_latest_revision_ids(self):
+        self.assertEqual(self.get_latest_revision_ids(), self.latest_revision_ids)
+
+    def test_latest_revision_ids_without_window_functions(self):
+        with mock.patch.object(connection.features, "supports_over_clause", False):
+            self.assertEqual(self.get_latest_revision_ids(), self.latest_revision_ids)
+
+    def test_recent_revision_ids(self):
+        self.assertEqual(
+            self.get_latest_revision_ids(count=2), self.recent_revision_ids
+        )
+
+
+class SortedArrayContainsTest(SimpleTestCase):
+    def test_sorted_array_contains(self):
+        ids = array("q", [2, 3, 5, 8])
+
+        for value in ids:
+            self.assertTrue(sorted_array_contains(ids, value))
+        for value in [0, 1, 4, 9]:
+            self.assertFalse(sorted_array_contains(ids, value))
+        self.assertFalse(sorted_array_contains(array("q"), 1))
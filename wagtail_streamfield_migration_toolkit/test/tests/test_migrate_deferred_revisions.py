@@ -0,0 +1,137 @@
+import datetime
+import json
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from wagtail.models import Revision
+
+from .. import factories, models
+from ..testutils import MigrationTestMixin
+from wagtail_streamfield_migration_toolkit.models import (
+    DeferredStreamDataMigration,
+    UnmigratedRevision,
+)
+from wagtail_streamfield_migration_toolkit.operations import (
+    RenameStreamChildrenOperation,
+    RenameStructChildrenOperation,
+)
+
+
+class MigrateDeferredRevisionsTest(TestCase, MigrationTestMixin):
+    """Tests for the `migratedeferredrevisions` command"""
+
+    model = models.SamplePage
+    app_name = "toolkit_test"
+    default_operation_and_block_path = [
+        (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), ""),
+        (
+            RenameStructChildrenOperation(old_name="char1", new_name="renamed1"),
+            "invalid_name1",
+        ),
+    ]
+    # Only the live and latest revisions are migrated by the migration
+    migration_kwargs = {"revisions_keep_recent": 0, "defer_revisions": True}
+
+    def setUp(self):
+        self.old_revisions = []
+        for i in range(3):
+            instance = factories.SamplePageFactory(
+                content__0__char1__value="Char Block 1"
+            )
+            revision = instance.save_revision()
+            revision.created_at = timezone.now() - datetime.timedelta(days=5)
+            revision.save()
+            self.old_revisions.append(revision)
+            instance.save_revision()
+
+        self.apply_migration()
+
+    def get_stored_block_types(self):
+        return [
+            json.loads(content["content"])[0]["type"]
+            for content in Revision.objects.filter(
+                pk__in=[revision.pk for revision in self.old_revisions]
+            )
+            .order_by("pk")
+            .values_list("content", flat=True)
+        ]
+
+    def call_command(self, *args):
+        stdout = StringIO()
+        call_command("migratedeferredrevisions", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_migrate(self):
+        self.assertEqual(self.get_stored_block_types(), ["char1"] * 3)
+
+        self.call_command("--chunk-size", "2")
+
+        self.assertEqual(self.get_stored_block_types(), ["renamed1"] * 3)
+        self.assertFalse(UnmigratedRevision.objects.exists())
+        self.assertFalse(DeferredStreamDataMigration.objects.exists())
+
+    def test_later_operation(self):
+        """A later operation on the field shouldn't migrate the revisions which haven't been
+        migrated by the deferred migration yet, but defer them until after it"""
+
+        self.migration_kwargs = {}
+        self.apply_migration(
+            operations_and_block_path=[
+                (
+                    RenameStreamChildrenOperation(
+                        old_name="renamed1", new_name="renamed2"
+                    ),
+                    "",
+                )
+            ]
+        )
+
+        self.assertEqual(self.get_stored_block_types(), ["char1"] * 3)
+        later_deferred_migration = DeferredStreamDataMigration.objects.order_by(
+            "id"
+        ).last()
+        self.assertEqual(
+            set(
+                later_deferred_migration.unmigrated_revisions.values_list(
+                    "revision_id", flat=True
+                )
+            ),
+            {revision.id for revision in self.old_revisions},
+        )
+
+        self.call_command()
+
+        self.assertEqual(self.get_stored_block_types(), ["renamed2"] * 3)
+        self.assertFalse(UnmigratedRevision.objects.exists())
+
+    def test_sleep_between_chunks(self):
+        with mock.patch("time.sleep") as sleep:
+            self.call_command("--chunk-size", "1", "--sleep", "0.5")
+
+        self.assertEqual(sleep.call_count, 3)
+        sleep.assert_called_with(0.5)
+
+    def test_invalid_revision_left_unmigrated(self):
+        revision = self.old_revisions[1]
+        revision.content["content"] = json.dumps(
+            [
+                {"type": "char1", "value": "Char Block 1", "id": "0001"},
+                {"type": "invalid_name1", "value": {"char1": "foo"}, "id": "0002"},
+            ]
+        )
+        revision.save()
+
+        with self.assertLogs(level="ERROR"):
+            output = self.call_command()
+
+        self.assertIn("1 revisions could not be migrated", output)
+        self.assertEqual(
+            self.get_stored_block_types(), ["renamed1", "char1", "renamed1"]
+        )
+        self.assertEqual(
+            list(UnmigratedRevision.objects.values_list("revision_id", flat=True)),
+            [revision.id],
+        )
+        self.assertTrue(DeferredStreamDataMigration.objects.exists())
@@ -0,0 +1,244 @@
+from django.test import TestCase
+
+from .. import factories, models
+from wagtail_streamfield_migration_toolkit.utils import (
+    apply_changes_to_raw_data,
+    InvalidBlockDefError,
+    StreamDataMigrationPlan,
+    StreamChildrenMapper,
+)
+from wagtail_streamfield_migration_toolkit.operations import (
+    BaseBlockOperation,
+    RenameStreamChildrenOperation,
+    RenameStructChildrenOperation,
+    RemoveStreamChildrenOperation,
+    RemoveStructChildrenOperation,
+    AlterBlockValueOperation,
+)
+
+
+class StreamDataMigrationPlanTest(TestCase):
+    """Tests for applying operations through a compiled `StreamDataMigrationPlan`
+
+    The plan should give the same result as applying each operation in turn with
+    `apply_changes_to_raw_data`.
+    """
+
+    def setUp(self):
+        raw_data = factories.SampleModelFactory(
+            content__0__char1__value="Char Block 1",
+            content__1="nestedstruct",
+            content__1__nestedstruct__stream1__0__char1__value="Char Block 1",
+            content__1__nestedstruct__stream1__1__char2__value="Char Block 2",
+            content__2="nestedlist_struct",
+            content__2__nestedlist_struct__0__char1="Char Block 1",
+            content__2__nestedlist_struct__1__char1="Char Block 1",
+            content__3="nestedstream",
+            content__3__nestedstream__0__stream1__0__char1__value="Char Block 1",
+            content__4__char2__value="Char Block 2",
+        ).content.raw_data
+        self.raw_data = list(raw_data)
+
+    def assertPlanMatchesSequentialChanges(self, operations_and_block_paths):
+        plan = StreamDataMigrationPlan(
+            stream_block=models.SampleModel.content.field.stream_block,
+            operations_and_block_paths=operations_and_block_paths,
+        )
+        planned_raw_data, is_changed = plan.apply(self.raw_data)
+
+        expected_raw_data = self.raw_data
+        for operation, block_path_str in operations_and_block_paths:
+            expected_raw_data = apply_changes_to_raw_data(
+                raw_data=expected_raw_data,
+                block_path_str=block_path_str,
+                operation=operation,
+                streamfield=models.SampleModel.content,
+            )
+
+        self.assertEqual(planned_raw_data, expected_raw_data)
+        return planned_raw_data
+
+    def test_top_level(self):
+        altered_raw_data = self.assertPlanMatchesSequentialChanges(
+            [(RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")]
+        )
+        self.assertEqual(altered_raw_data[0]["type"], "renamed1")
+
+    def test_nested_stream_in_struct(self):
+        self.assertPlanMatchesSequentialChanges(
+            [
+                (
+                    RemoveStreamChildrenOperation(name="char1"),
+                    "nestedstruct.stream1",
+                )
+            ]
+        )
+
+    def test_list_children(self):
+        altered_raw_data = self.assertPlanMatchesSequentialChanges(
+            [
+                (
+                    RenameStructChildrenOperation(old_name="char1", new_name="renamed1"),
+                    "nestedlist_struct.item",
+                )
+            ]
+        )
+        for list_child in altered_raw_data[2]["value"]:
+            self.assertIn("renamed1", list_child["value"])
+
+    def test_multiple_operations(self):
+        """Operations later in the list should see the changes made by earlier operations"""
+
+        self.assertPlanMatchesSequentialChanges(
+            [
+                (
+                    RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"),
+                    "nestedstream.stream1",
+                ),
+                (
+                    RemoveStructChildrenOperation(name="char1"),
+                    "nestedstruct",
+                ),
+                (
+                    RenameStreamChildrenOperation(old_name="nestedstream", new_name="renamed2"),
+                    "",
+                ),
+                (
+                    AlterBlockValueOperation(new_value="foo"),
+                    "char2",
+                ),
+            ]
+        )
+
+    def test_operations_on_same_path(self):
+        """Operations on the same block path should be applied in order"""
+
+        altered_raw_data = self.assertPlanMatchesSequentialChanges(
+            [
+                (
+                    RenameStreamChildrenOperation(old_name="char1", new_name="char2"),
+                    "nestedstruct.stream1",
+                ),
+                (
+                    RemoveStreamChildrenOperation(name="char2"),
+                    "nestedstruct.stream1",
+                ),
+            ]
+        )
+        self.assertEqual(altered_raw_data[1]["value"]["stream1"], [])
+
+    def test_operations_on_children_share_traversal(self):
+        """Consecutive operations on children of the top level block should be merged into a
+        single pass over its children"""
+
+        plan = StreamDataMigrationPlan(
+            stream_block=models.SampleModel.content.field.stream_block,
+            operations_and_block_paths=[
+                (RemoveStreamChildrenOperation(name="char1"), "nestedstruct.stream1"),
+                (RemoveStructChildrenOperation(name="char1"), "nestedstruct"),
+                (RemoveStreamChildrenOperation(name="char1"), "nestedstream.stream1"),
+            ],
+        )
+
+        self.assertIsInstance(plan.mapper, StreamChildrenMapper)
+        self.assertEqual(
+            set(plan.mapper.child_mappers.keys()), {"nestedstruct", "nestedstream"}
+        )
+
+    def test_invalid_block_def_raised_only_for_matching_data(self):
+        """A block path with no matching block definition should only raise an error when a block
+        in the data matches it"""
+
+        plan = StreamDataMigrationPlan(
+            stream_block=models.SampleModel.content.field.stream_block,
+            operations_and_block_paths=[
+                (RemoveStreamChildrenOperation(name="char1"), "invalid_name1"),
+            ],
+        )
+        self.assertEqual(plan.apply(self.raw_data), (self.raw_data, False))
+
+        with self.assertRaisesMessage(
+            InvalidBlockDefError, "No current block def named invalid_name1"
+        ):
+            plan.apply(self.raw_data + [{"type": "invalid_name1", "value": []}])
+
+
+class UpperCaseOperation(BaseBlockOperation):
+    def apply(self, block_value):
+        return block_value.upper()
+
+    @property
+    def operation_name_fragment(self):
+        return "upper_case"
+
+
+class ChangeDetectionTest(TestCase):
+    """Tests for whether a `StreamDataMigrationPlan` reports changes to the raw data correctly"""
+
+    def setUp(self):
+        self.raw_data = [
+            {"type": "char1", "id": "0001", "value": "Char Block 1"},
+            {
+                "type": "nestedstruct",
+                "id": "0002",
+                "value": {
+                    "char1": "Char Block 1",
+                    "stream1": [{"type": "char2", "id": "0003", "value": "Char Block 2"}],
+                    "struct1": {"char1": "Char Block 1", "char2": "Char Block 2"},
+                    "list1": [{"type": "item", "id": "0004", "value": "Char Block 1"}],
+                },
+            },
+        ]
+
+    def apply_plan(self, operations_and_block_paths, raw_data=None):
+        plan = StreamDataMigrationPlan(
+            stream_block=models.SampleModel.content.field.stream_block,
+            operations_and_block_paths=operations_and_block_paths,
+        )
+        return plan.apply(raw_data or self.raw_data)
+
+    def test_unchanged(self):
+        """If no block matches, the raw data should be returned as is"""
+
+        altered_raw_data, is_changed = self.apply_plan(
+            [
+                (RenameStreamChildrenOperation(old_name="char2", new_name="renamed1"), ""),
+                (RemoveStreamChildrenOperation(name="char1"), "nestedstruct.stream1"),
+                (RemoveStructChildrenOperation(name="invalid1"), "nestedstruct.struct1"),
+                (AlterBlockValueOperation(new_value="Char Block 1"), "nestedstruct.list1.item"),
+            ]
+        )
+
+        self.assertFalse(is_changed)
+        self.assertIs(altered_raw_data, self.raw_data)
+
+    def test_changed(self):
+        altered_raw_data, is_changed = self.apply_plan(
+            [(RemoveStreamChildrenOperation(name="char2"), "nestedstruct.stream1")]
+        )
+
+        self.assertTrue(is_changed)
+        self.assertEqual(altered_raw_data[1]["value"]["stream1"], [])
+        # unchanged blocks are kept as they are
+        self.assertIs(altered_raw_data[0], self.raw_data[0])
+
+    def test_custom_operation_always_changed(self):
+        """Operations which don't set `returns_same_value_if_unchanged` are treated as changed"""
+
+        altered_raw_data, is_changed = self.apply_plan(
+            [(UpperCaseOperation(), "char1")],
+            raw_data=[{"type": "char1", "id": "0001", "value": "CHAR BLOCK 1"}],
+        )
+
+        self.assertTrue(is_changed)
+
+    def test_old_list_format_changed(self):
+        """ListBlock data in the old format is changed to the new format"""
+
+        altered_raw_data, is_changed = self.apply_plan(
+            [(AlterBlockValueOperation(new_value="foo"), "simplelist.item")],
+            raw_data=[{"type": "simplelist", "id": "0001", "value": ["foo", "foo"]}],
+        )
+
+        self.assertTrue(is_changed)
+        self.assertEqual(altered_raw_data[0]["value"][0]["type"], "item")
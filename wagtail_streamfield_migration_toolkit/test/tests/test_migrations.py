@@ -1,7 +1,9 @@
 import json
 import datetime
 from django.utils import timezone
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from django.db.models import JSONField, F
 from django.db.models.functions import Cast
@@ -11,6 +13,7 @@ from .. import factories, models
 from ..testutils import MigrationTestMixin
 from wagtail_streamfield_migration_toolkit.operations import (
     RenameStreamChildrenOperation,
+    RemoveStreamChildrenOperation,
 )
 
 
@@ -101,6 +104,24 @@ class BaseMigrationTest(TestCase, MigrationTestMixin):
                 old_content=prev_content, new_content=instance.raw_content
             )
 
+    def _test_unchanged_data_not_written(self):
+        """Test whether instances and revisions are only written back when they are changed
+
+        Apply a migration with an operation which does not match any block, so no updates
+        should be made.
+        """
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.apply_migration(
+                operations_and_block_path=[
+                    (RemoveStreamChildrenOperation(name="nestedstream"), "")
+                ]
+            )
+
+        self.assertFalse(
+            any(query["sql"].startswith("UPDATE") for query in ctx.captured_queries)
+        )
+
     # TODO test multiple operations applied in one migration
 
     def _test_migrate_revisions(self):
@@ -204,6 +225,9 @@ class TestNonPageModelWithoutRevisions(BaseMigrationTest):
     def test_migrate_stream_data(self):
         self._test_migrate_stream_data()
 
+    def test_unchanged_data_not_written(self):
+        self._test_unchanged_data_not_written()
+
 
 class TestPage(BaseMigrationTest):
     model = models.SamplePage
@@ -214,6 +238,9 @@ class TestPage(BaseMigrationTest):
     def test_migrate_stream_data(self):
         self._test_migrate_stream_data()
 
+    def test_unchanged_data_not_written(self):
+        self._test_unchanged_data_not_written()
+
     def test_migrate_revisions(self):
         self._test_migrate_revisions()
 
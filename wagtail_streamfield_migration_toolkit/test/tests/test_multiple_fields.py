@@ -0,0 +1,225 @@
+import json
+from unittest import mock
+from django.db import connection
+from django.db.migrations import Migration
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+from django.db.models import JSONField, F
+from django.db.models.functions import Cast
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .. import factories, models
+from wagtail_streamfield_migration_toolkit.migrate_operation import (
+    MigrateStreamData,
+    MigrateStreamFields,
+    make_stream_data_migration,
+)
+from wagtail_streamfield_migration_toolkit.operations import (
+    RenameStreamChildrenOperation,
+)
+
+
+class MigrateStreamFieldsTest(TestCase):
+    """Tests for migrating several streamfields of a model with `MigrateStreamFields`"""
+
+    def setUp(self):
+        self.instance = factories.SampleMultipleFieldsPageFactory(
+            content__0__char1__value="Char Block 1",
+            sidebar__0__char2__value="Char Block 2",
+        )
+        self.revision = self.instance.save_revision()
+
+    def make_operation(self, **kwargs):
+        return MigrateStreamFields(
+            app_name="toolkit_test",
+            model_name="SampleMultipleFieldsPage",
+            fields_operations_and_block_paths={
+                "content": [
+                    (
+                        RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"),
+                        "",
+                    )
+                ],
+                "sidebar": [
+                    (
+                        RenameStreamChildrenOperation(old_name="char2", new_name="renamed2"),
+                        "",
+                    )
+                ],
+            },
+            **kwargs
+        )
+
+    def apply_operation(self, operation):
+        migration = Migration(
+            "test_migration", "wagtail_streamfield_migration_toolkit_test"
+        )
+        migration.operations = [operation]
+
+        loader = MigrationLoader(connection=connection)
+        loader.build_graph()
+        project_state = loader.project_state()
+        schema_editor = connection.schema_editor(atomic=migration.atomic)
+        migration.apply(project_state, schema_editor)
+
+    def get_instance_block_types(self):
+        instance = models.SampleMultipleFieldsPage.objects.annotate(
+            raw_content=Cast(F("content"), JSONField()),
+            raw_sidebar=Cast(F("sidebar"), JSONField()),
+        ).get(pk=self.instance.pk)
+        return (
+            instance.raw_content[0]["type"],
+            instance.raw_sidebar[0]["type"],
+        )
+
+    def get_revision_block_types(self):
+        self.revision.refresh_from_db()
+        return (
+            json.loads(self.revision.content["content"])[0]["type"],
+            json.loads(self.revision.content["sidebar"])[0]["type"],
+        )
+
+    def test_migrate(self):
+        self.apply_operation(self.make_operation())
+
+        self.assertEqual(self.get_instance_block_types(), ("renamed1", "renamed2"))
+        self.assertEqual(self.get_revision_block_types(), ("renamed1", "renamed2"))
+        self.assertEqual(self.revision.content["title"], self.instance.title)
+
+    def test_single_scan(self):
+        """The instances and revisions should each be fetched with a single query for all of the
+        fields"""
+
+        table = connection.ops.quote_name(
+            models.SampleMultipleFieldsPage._meta.db_table
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            self.apply_operation(self.make_operation())
+
+        instance_queries = [
+            query["sql"]
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT")
+            and "raw_content_sidebar" in query["sql"]
+        ]
+        self.assertEqual(len(instance_queries), 1)
+        self.assertIn(table, instance_queries[0])
+        self.assertIn("raw_content_content", instance_queries[0])
+
+        revision_queries = [
+            query["sql"]
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT")
+            and "stream_data_text_sidebar" in query["sql"]
+        ]
+        self.assertEqual(len(revision_queries), 1)
+        self.assertIn("stream_data_text_content", revision_queries[0])
+
+    def test_unchanged_field_not_written(self):
+        """Only the fields which were changed should be written back"""
+
+        operation = self.make_operation()
+        operation.fields_operations_and_block_paths["sidebar"] = [
+            (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")
+        ]
+
+        with mock.patch(
+            "wagtail_streamfield_migration_toolkit.writers.BulkUpdateWriter.write"
+        ) as write:
+            self.apply_operation(operation)
+
+        self.assertEqual(
+            [call.args[2] for call in write.call_args_list],
+            ["content"],
+        )
+
+    def test_whole_content_loaded_if_key_not_writable(self):
+        with mock.patch(
+            "wagtail_streamfield_migration_toolkit.migrate_operation.supports_json_key_writes",
+            return_value=False,
+        ), mock.patch(
+            "wagtail_streamfield_migration_toolkit.writers.supports_json_key_writes",
+            return_value=False,
+        ):
+            self.apply_operation(self.make_operation())
+
+        self.assertEqual(self.get_revision_block_types(), ("renamed1", "renamed2"))
+        self.assertEqual(self.revision.content["title"], self.instance.title)
+
+    def test_deconstruct(self):
+        operation = self.make_operation(chunk_size=10)
+
+        name, args, kwargs = operation.deconstruct()
+
+        self.assertEqual(name, "MigrateStreamFields")
+        self.assertNotIn("field_name", kwargs)
+        self.assertNotIn("operations_and_block_paths", kwargs)
+        self.assertEqual(
+            kwargs["fields_operations_and_block_paths"],
+            operation.fields_operations_and_block_paths,
+        )
+        self.assertEqual(kwargs["chunk_size"], 10)
+
+    def test_migration_file(self):
+        """The options should be written to migration files"""
+
+        migration = Migration("test_migration", "toolkit_test")
+        migration.operations = [self.make_operation(chunk_size=10, resumable=True)]
+
+        migration_string = MigrationWriter(migration).as_string()
+
+        self.assertIn("fields_operations_and_block_paths=", migration_string)
+        self.assertIn("chunk_size=10", migration_string)
+        self.assertIn("resumable=True", migration_string)
+
+    def test_checkpoint_key(self):
+        operation = self.make_operation()
+
+        self.assertTrue(
+            operation.checkpoint_key.startswith(
+                "toolkit_test.SampleMultipleFieldsPage.content,sidebar:"
+            )
+        )
+
+    def test_migration_name_fragment(self):
+        self.assertEqual(
+            self.make_operation().migration_name_fragment,
+            "rename_char1_to_renamed1_rename_char2_to_renamed2",
+        )
+
+
+class MakeStreamDataMigrationTest(TestCase):
+    def test_single_field(self):
+        operations_and_block_paths = [
+            (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")
+        ]
+
+        operation = make_stream_data_migration(
+            "toolkit_test", "SamplePage", {"content": operations_and_block_paths}
+        )
+
+        self.assertIs(type(operation), MigrateStreamData)
+        self.assertEqual(operation.field_name, "content")
+        self.assertEqual(
+            operation.operations_and_block_paths, operations_and_block_paths
+        )
+
+    def test_several_fields(self):
+        fields_operations_and_block_paths = {
+            "content": [
+                (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")
+            ],
+            "sidebar": [
+                (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")
+            ],
+        }
+
+        operation = make_stream_data_migration(
+            "toolkit_test",
+            "SampleMultipleFieldsPage",
+            fields_operations_and_block_paths,
+        )
+
+        self.assertIsInstance(operation, MigrateStreamFields)
+        self.assertEqual(operation.get_field_names(), ["content", "sidebar"])
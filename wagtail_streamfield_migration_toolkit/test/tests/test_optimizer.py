@@ -0,0 +1,192 @@
+from django.test import TestCase
+
+from .. import factories, models
+from wagtail_streamfield_migration_toolkit.migrate_operation import (
+    make_stream_data_migration,
+)
+from wagtail_streamfield_migration_toolkit.operations import (
+    AlterBlockValueOperation,
+    RemoveStreamChildrenOperation,
+    RemoveStructChildrenOperation,
+    RenameStreamChildrenOperation,
+    RenameStructChildrenOperation,
+)
+from wagtail_streamfield_migration_toolkit.optimizer import OperationOptimizer
+from wagtail_streamfield_migration_toolkit.utils import apply_changes_to_raw_data
+
+
+class OperationOptimizerTest(TestCase):
+    """Tests for reducing lists of operations and block paths with `OperationOptimizer`"""
+
+    def optimize(self, operations_and_block_paths, assume_new_names_unused=False):
+        return OperationOptimizer(
+            assume_new_names_unused=assume_new_names_unused
+        ).optimize(operations_and_block_paths)
+
+    def assertOptimizesTo(
+        self, operations_and_block_paths, expected, assume_new_names_unused=False
+    ):
+        result = self.optimize(
+            operations_and_block_paths, assume_new_names_unused=assume_new_names_unused
+        )
+        self.assertEqual(
+            [
+                (type(operation).__name__, vars(operation), block_path)
+                for operation, block_path in result
+            ],
+            [
+                (type(operation).__name__, vars(operation), block_path)
+                for operation, block_path in expected
+            ],
+        )
+
+    def test_repeated_rename(self):
+        """A rename of a name which has already been renamed should be left out"""
+
+        self.assertOptimizesTo(
+            [
+                (RenameStreamChildrenOperation("char1", "renamed1"), ""),
+                (RenameStreamChildrenOperation("char1", "renamed2"), ""),
+            ],
+            [(RenameStreamChildrenOperation("char1", "renamed1"), "")],
+        )
+
+    def test_remove_after_remove(self):
+        self.assertOptimizesTo(
+            [
+                (RemoveStructChildrenOperation("char1"), "nestedstruct"),
+                (RemoveStructChildrenOperation("char1"), "nestedstruct"),
+                (RenameStructChildrenOperation("char1", "renamed1"), "nestedstruct"),
+            ],
+            [(RemoveStructChildrenOperation("char1"), "nestedstruct")],
+        )
+
+    def test_chained_renames(self):
+        self.assertOptimizesTo(
+            [
+                (RenameStreamChildrenOperation("char1", "renamed1"), ""),
+                (RenameStreamChildrenOperation("renamed1", "renamed2"), ""),
+                (RenameStreamChildrenOperation("renamed2", "renamed3"), ""),
+            ],
+            [(RenameStreamChildrenOperation("char1", "renamed3"), "")],
+            assume_new_names_unused=True,
+        )
+
+    def test_rename_back(self):
+        self.assertOptimizesTo(
+            [
+                (RenameStructChildrenOperation("char1", "renamed1"), "nestedstruct"),
+                (RenameStructChildrenOperation("renamed1", "char1"), "nestedstruct"),
+            ],
+            [],
+            assume_new_names_unused=True,
+        )
+
+    def test_rename_then_remove(self):
+        self.assertOptimizesTo(
+            [
+                (RenameStreamChildrenOperation("char1", "renamed1"), ""),
+                (RemoveStreamChildrenOperation("renamed1"), ""),
+            ],
+            [(RemoveStreamChildrenOperation("char1"), "")],
+            assume_new_names_unused=True,
+        )
+
+    def test_new_names_may_be_used(self):
+        """Renames into a name which may be used already shouldn't be reduced by default"""
+
+        operations_and_block_paths = [
+            (RenameStreamChildrenOperation("char1", "char2"), ""),
+            (RenameStreamChildrenOperation("char2", "renamed2"), ""),
+            (RemoveStreamChildrenOperation("renamed2"), ""),
+        ]
+
+        self.assertOptimizesTo(operations_and_block_paths, operations_and_block_paths)
+
+    def test_through_independent_operations(self):
+        self.assertOptimizesTo(
+            [
+                (RenameStreamChildrenOperation("char1", "renamed1"), ""),
+                (RenameStreamChildrenOperation("char2", "renamed2"), ""),
+                (AlterBlockValueOperation("foo"), "nestedstruct.char1"),
+                (RemoveStreamChildrenOperation("char1"), "nestedstruct.stream1"),
+                (RenameStreamChildrenOperation("renamed1", "renamed3"), ""),
+            ],
+            [
+                (RenameStreamChildrenOperation("char2", "renamed2"), ""),
+                (AlterBlockValueOperation("foo"), "nestedstruct.char1"),
+                (RemoveStreamChildrenOperation("char1"), "nestedstruct.stream1"),
+                (RenameStreamChildrenOperation("char1", "renamed3"), ""),
+            ],
+            assume_new_names_unused=True,
+        )
+
+    def test_not_through_dependent_operations(self):
+        operations_and_block_paths = [
+            (RenameStreamChildrenOperation("char1", "renamed1"), ""),
+            (AlterBlockValueOperation("foo"), "renamed1"),
+            (RenameStreamChildrenOperation("renamed1", "renamed2"), ""),
+            (RenameStreamChildrenOperation("char2", "renamed3"), "nestedstruct.stream1"),
+            (AlterBlockValueOperation([]), "nestedstruct.stream1"),
+            (RemoveStreamChildrenOperation("renamed3"), "nestedstruct.stream1"),
+        ]
+
+        self.assertOptimizesTo(
+            operations_and_block_paths,
+            operations_and_block_paths,
+            assume_new_names_unused=True,
+        )
+
+    def test_same_result(self):
+        """The reduced operations should give the same result as the original ones"""
+
+        raw_data = list(
+            factories.SampleModelFactory(
+                content__0__char1__value="Char Block 1",
+                content__1="nestedstruct",
+                content__1__nestedstruct__stream1__0__char1__value="Char Block 1",
+                content__2__char2__value="Char Block 2",
+            ).content.raw_data
+        )
+        operations_and_block_paths = [
+            (RenameStreamChildrenOperation("char1", "renamed1"), ""),
+            (RenameStreamChildrenOperation("char1", "renamed2"), "nestedstruct.stream1"),
+            (RenameStreamChildrenOperation("char2", "renamed3"), ""),
+            (RenameStreamChildrenOperation("renamed1", "renamed4"), ""),
+            (RemoveStreamChildrenOperation("renamed2"), "nestedstruct.stream1"),
+            (RemoveStreamChildrenOperation("char1"), ""),
+        ]
+
+        def apply(operations_and_block_paths):
+            altered_raw_data = raw_data
+            for operation, block_path_str in operations_and_block_paths:
+                altered_raw_data = apply_changes_to_raw_data(
+                    raw_data=altered_raw_data,
+                    block_path_str=block_path_str,
+                    operation=operation,
+                    streamfield=models.SampleModel.content,
+                )
+            return altered_raw_data
+
+        optimized = self.optimize(
+            operations_and_block_paths, assume_new_names_unused=True
+        )
+
+        self.assertEqual(len(optimized), 3)
+        self.assertEqual(apply(optimized), apply(operations_and_block_paths))
+
+
+class MakeStreamDataMigrationOptimizeTest(TestCase):
+    def test_operations_optimized(self):
+        operation = make_stream_data_migration(
+            "toolkit_test",
+            "SamplePage",
+            {
+                "content": [
+                    (RenameStreamChildrenOperation("char1", "renamed1"), ""),
+                    (RemoveStreamChildrenOperation("char1"), ""),
+                ]
+            },
+        )
+
+        self.assertEqual(len(operation.operations_and_block_paths), 1)
@@ -0,0 +1,93 @@
+import datetime
+from django.utils import timezone
+
+from .. import factories, models
+from .test_bad_data import BadDataMigrationTestCase, disable_reference_index_auto_update
+from .test_migrations import BaseMigrationTest
+from wagtail_streamfield_migration_toolkit.row_sources import KeysetRowSource
+from wagtail_streamfield_migration_toolkit.utils import InvalidBlockDefError
+from wagtail_streamfield_migration_toolkit.writers import BulkUpdateWriter
+
+
+class TestNonPageModelRaw(BaseMigrationTest):
+    """Migration tests for a model without revisions in raw mode"""
+
+    model = models.SampleModel
+    factory = factories.SampleModelFactory
+    has_revisions = False
+    app_name = "toolkit_test"
+    migration_kwargs = {"raw": True}
+
+    def test_migrate_stream_data(self):
+        self._test_migrate_stream_data()
+
+    def test_unchanged_data_not_written(self):
+        self._test_unchanged_data_not_written()
+
+
+class TestPageRaw(BaseMigrationTest):
+    """Migration tests for pages in raw mode. The stream data of pages is in the table of the page
+    subclass, and instances are fetched with a join to the page table."""
+
+    model = models.SamplePage
+    factory = factories.SamplePageFactory
+    has_revisions = True
+    app_name = "toolkit_test"
+    migration_kwargs = {"raw": True}
+
+    def test_migrate_stream_data(self):
+        self._test_migrate_stream_data()
+
+    def test_migrate_revisions(self):
+        self._test_migrate_revisions()
+
+    def test_always_migrate_live_and_latest_revisions(self):
+        self._test_always_migrate_live_and_latest_revisions()
+
+    def test_migrate_revisions_from_date(self):
+        self._test_migrate_revisions_from_date()
+
+
+class TestPageRawKeysetBulkUpdate(BaseMigrationTest):
+    """Migration tests for pages in raw mode, fetched in chunks by primary key and written with
+    `bulk_update`"""
+
+    model = models.SamplePage
+    factory = factories.SamplePageFactory
+    has_revisions = True
+    app_name = "toolkit_test"
+    migration_kwargs = {
+        "raw": True,
+        "row_source": KeysetRowSource(),
+        "writer": BulkUpdateWriter(),
+        "chunk_size": 2,
+    }
+
+    def test_migrate_stream_data(self):
+        self._test_migrate_stream_data()
+
+    def test_migrate_revisions(self):
+        self._test_migrate_revisions()
+
+
+class TestExceptionRaisedForInstanceRaw(BadDataMigrationTestCase):
+    """The instance should still be given in the exception raised for invalid instance data in raw
+    mode"""
+
+    migration_kwargs = {"raw": True}
+
+    def setUp(self):
+        with disable_reference_index_auto_update():
+            self.create_instance()
+            self.append_invalid_instance_data()
+
+    def test_migrate(self):
+        with self.assertRaisesMessage(
+            InvalidBlockDefError,
+            "Invalid block def in {} object ({})".format(
+                self.instance.__class__.__name__, self.instance.id
+            ),
+        ):
+            self.apply_migration(
+                revisions_from=timezone.now() + datetime.timedelta(days=2),
+            )
@@ -0,0 +1,149 @@
+import json
+import re
+from django.test import TestCase
+
+from .. import factories, models
+from ..testutils import MigrationTestMixin
+from wagtail_streamfield_migration_toolkit.json_backends import StdlibJSONBackend
+from wagtail_streamfield_migration_toolkit.migrate_operation import MigrateStreamData
+from wagtail_streamfield_migration_toolkit.operations import (
+    RenameStreamChildrenOperation,
+)
+from wagtail_streamfield_migration_toolkit.utils import (
+    CachedMigrationPlan,
+    ResultCache,
+    StreamDataMigrationPlan,
+)
+
+
+class ResultCacheTest(TestCase):
+    def test_hits_and_misses(self):
+        cache = ResultCache(max_bytes=100)
+
+        self.assertIsNone(cache.get(b"key1"))
+        cache.set(b"key1", ("altered", None))
+
+        self.assertEqual(cache.get(b"key1"), ("altered", None))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(cache.size, len(b"key1") + len("altered"))
+
+    def test_size_in_bytes(self):
+        cache = ResultCache(max_bytes=100)
+
+        cache.set(b"key1", ("\u00e9\u4e2d", None))
+
+        self.assertEqual(cache.size, len(b"key1") + 5)
+
+    def test_least_recently_used_dropped(self):
+        cache = ResultCache(max_bytes=30)
+        cache.set(b"key1", ("a" * 10, None))
+        cache.set(b"key2", ("b" * 10, None))
+        cache.get(b"key1")
+
+        cache.set(b"key3", ("c" * 10, None))
+
+        self.assertIsNone(cache.get(b"key2"))
+        self.assertIsNotNone(cache.get(b"key1"))
+        self.assertIsNotNone(cache.get(b"key3"))
+        self.assertLessEqual(cache.size, 30)
+
+    def test_entry_too_large(self):
+        cache = ResultCache(max_bytes=10)
+
+        cache.set(b"key1", ("a" * 10, None))
+
+        self.assertIsNone(cache.get(b"key1"))
+        self.assertEqual(cache.size, 0)
+
+
+class CachedMigrationPlanTest(TestCase):
+    def setUp(self):
+        self.cache = ResultCache(max_bytes=1024 * 1024)
+        self.plan = CachedMigrationPlan(
+            StreamDataMigrationPlan(
+                stream_block=models.SampleModel.content.field.stream_block,
+                operations_and_block_paths=[
+                    (RenameStreamChildrenOperation("char1", "renamed1"), "")
+                ],
+            ),
+            self.cache,
+        )
+        self.raw_data = [{"type": "char1", "value": "Char Block 1", "id": "1"}]
+
+    def test_same_json(self):
+        json_backend = StdlibJSONBackend()
+
+        results = self.plan.apply_to_chunk(
+            [json.dumps(self.raw_data), json.dumps(self.raw_data)],
+            json_backend=json_backend,
+        )
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(json.loads(results[0][0])[0]["type"], "renamed1")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_decoded_data_not_cached(self):
+        altered_raw_data, error = self.plan.apply_to_raw_data(self.raw_data)
+
+        self.assertEqual(altered_raw_data[0]["type"], "renamed1")
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 0))
+
+
+class RevisionCacheMigrationTest(TestCase, MigrationTestMixin):
+    """Tests for caching the results for the stream data of revisions with
+    `revision_cache_bytes`"""
+
+    model = models.SamplePage
+    app_name = "toolkit_test"
+    default_operation_and_block_path = [
+        (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")
+    ]
+    migration_kwargs = {"revision_cache_bytes": 1024 * 1024}
+
+    def setUp(self):
+        self.instance = factories.SamplePageFactory(
+            content__0__char1__value="Char Block 1"
+        )
+        self.revisions = [self.instance.save_revision() for _ in range(3)]
+
+    def test_migrate(self):
+        with self.assertLogs(
+            "wagtail_streamfield_migration_toolkit.migrate_operation", level="INFO"
+        ) as logs:
+            self.apply_migration()
+
+        for revision in self.revisions:
+            revision.refresh_from_db()
+            self.assertEqual(
+                json.loads(revision.content["content"])[0]["type"], "renamed1"
+            )
+        self.assertIn("2 hits, 1 misses", logs.output[0])
+
+    def test_migrate_with_workers(self):
+        self.migration_kwargs = {"revision_cache_bytes": 1024 * 1024, "workers": 2}
+
+        with self.assertLogs(
+            "wagtail_streamfield_migration_toolkit.migrate_operation", level="INFO"
+        ) as logs:
+            self.apply_migration()
+
+        # the revisions may be split between the caches of the workers
+        hits, misses = map(
+            int, re.search(r"(\d+) hits, (\d+) misses", logs.output[0]).groups()
+        )
+        self.assertEqual(hits + misses, 3)
+        self.assertGreaterEqual(misses, 1)
+
+    def test_deconstruct(self):
+        _, _, kwargs = self.init_migration().operations[0].deconstruct()
+
+        self.assertEqual(kwargs["revision_cache_bytes"], 1024 * 1024)
+        self.assertNotIn(
+            "revision_cache_bytes",
+            MigrateStreamData(
+                app_name=self.app_name,
+                model_name="SamplePage",
+                field_name="content",
+                operations_and_block_paths=self.default_operation_and_block_path,
+            ).deconstruct()[2],
+        )
@@ -0,0 +1,84 @@
+import json
+from unittest import mock
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .. import factories, models
+from ..testutils import MigrationTestMixin
+from wagtail_streamfield_migration_toolkit.operations import (
+    RenameStreamChildrenOperation,
+)
+
+
+class RevisionProjectionTest(TestCase, MigrationTestMixin):
+    """Tests for loading only the revision fields needed for the migration"""
+
+    model = models.SamplePage
+    app_name = "toolkit_test"
+    default_operation_and_block_path = [
+        (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")
+    ]
+
+    def setUp(self):
+        self.instance = factories.SamplePageFactory(
+            content__0__char1__value="Char Block 1"
+        )
+        self.revision = self.instance.save_revision()
+        self.revision_table = connection.ops.quote_name(
+            type(self.revision)._meta.db_table
+        )
+
+    def apply_migration_and_get_revision_queries(self, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            self.apply_migration(**kwargs)
+
+        return [
+            query["sql"]
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT")
+            and "stream_data_text" in query["sql"]
+        ]
+
+    def assertRevisionMigrated(self):
+        self.revision.refresh_from_db()
+        self.assertEqual(
+            json.loads(self.revision.content["content"])[0]["type"], "renamed1"
+        )
+        self.assertEqual(self.revision.content["title"], self.instance.title)
+
+    def test_only_needed_fields_loaded(self):
+        revision_queries = self.apply_migration_and_get_revision_queries()
+
+        self.assertEqual(len(revision_queries), 1)
+        self.assertNotIn(
+            "{}.{}".format(self.revision_table, connection.ops.quote_name("user_id")),
+            revision_queries[0],
+        )
+        self.assertRevisionMigrated()
+
+    def test_revision_fields(self):
+        self.migration_kwargs = {"revision_fields": ["user"]}
+
+        revision_queries = self.apply_migration_and_get_revision_queries()
+
+        self.assertIn(
+            "{}.{}".format(self.revision_table, connection.ops.quote_name("user_id")),
+            revision_queries[0],
+        )
+
+    def test_whole_content_loaded_if_key_not_writable(self):
+        """The whole content should be loaded and written on databases where the stream data
+        can't be written on its own"""
+
+        with mock.patch(
+            "wagtail_streamfield_migration_toolkit.migrate_operation.supports_json_key_writes",
+            return_value=False,
+        ), mock.patch(
+            "wagtail_streamfield_migration_toolkit.writers.supports_json_key_writes",
+            return_value=False,
+        ):
+            revision_queries = self.apply_migration_and_get_revision_queries()
+
+        self.assertEqual(revision_queries, [])
+        self.assertRevisionMigrated()
@@ -0,0 +1,80 @@
+import datetime
+import json
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .. import factories, models
+from ..testutils import MigrationTestMixin
+from wagtail_streamfield_migration_toolkit.operations import (
+    RenameStreamChildrenOperation,
+)
+
+
+class RevisionQueryTest(TestCase, MigrationTestMixin):
+    """Tests that revisions are selected with subqueries on the model table rather than with
+    lists of ids collected from the instances"""
+
+    model = models.SamplePage
+    app_name = "toolkit_test"
+    default_operation_and_block_path = [
+        (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")
+    ]
+
+    def create_instances(self, count):
+        revisions = []
+        for i in range(count):
+            instance = factories.SamplePageFactory(
+                content__0__char1__value="Char Block 1"
+            )
+            revision = instance.save_revision()
+            revision.publish()
+            # an old revision which is not the live or latest revision
+            old_revision = instance.save_revision()
+            old_revision.created_at = timezone.now() - datetime.timedelta(days=10)
+            old_revision.save()
+            revisions.append(revision)
+            revisions.append(instance.save_revision())
+        return revisions
+
+    def get_revision_queries(self, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            self.apply_migration(**kwargs)
+
+        return [
+            query["sql"]
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT")
+            and ("stream_data_text" in query["sql"] or "raw_content_text" in query["sql"])
+        ]
+
+    def assertRevisionsMigrated(self, revisions):
+        for revision in revisions:
+            revision.refresh_from_db()
+            self.assertEqual(
+                json.loads(revision.content["content"])[0]["type"], "renamed1"
+            )
+
+    def test_query_size_independent_of_instances(self):
+        revisions_from = timezone.now() - datetime.timedelta(days=2)
+
+        self.create_instances(2)
+        revision_queries = self.get_revision_queries(revisions_from=revisions_from)
+        revisions = self.create_instances(6)
+        more_revision_queries = self.get_revision_queries(
+            revisions_from=revisions_from
+        )
+
+        self.assertEqual(len(revision_queries), 1)
+        self.assertEqual(len(more_revision_queries), 1)
+        self.assertEqual(len(revision_queries[0]), len(more_revision_queries[0]))
+        self.assertRevisionsMigrated(revisions)
+
+    def test_live_revisions(self):
+        revisions = self.create_instances(3)
+
+        self.apply_migration(revisions_from=timezone.now() + datetime.timedelta(days=2))
+
+        # only the live and latest revisions are migrated
+        self.assertRevisionsMigrated(revisions)
@@ -0,0 +1,166 @@
+import datetime
+import json
+from unittest import mock
+from django.db.migrations import Migration
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from .. import factories, models
+from ..testutils import MigrationTestMixin
+from wagtail_streamfield_migration_toolkit.migrate_operation import MigrateStreamData
+from wagtail_streamfield_migration_toolkit.models import (
+    DeferredStreamDataMigration,
+    UnmigratedRevision,
+)
+from wagtail_streamfield_migration_toolkit.operations import (
+    AlterBlockValueOperation,
+    RenameStreamChildrenOperation,
+)
+from wagtail_streamfield_migration_toolkit.pending_migrations import (
+    pending_migrations,
+)
+
+
+class RevisionRetentionTest(TestCase, MigrationTestMixin):
+    """Tests for migrating only the live, latest and most recent revisions of each instance"""
+
+    model = models.SamplePage
+    app_name = "toolkit_test"
+    default_operation_and_block_path = [
+        (RenameStreamChildrenOperation(old_name="char1", new_name="renamed1"), "")
+    ]
+    migration_kwargs = {"revisions_keep_recent": 2, "defer_revisions": True}
+
+    def setUp(self):
+        self.instance = factories.SamplePageFactory(
+            content__0__char1__value="Char Block 1"
+        )
+        self.revisions = []
+        for days in [10, 8, 6, 4, 2]:
+            revision = self.instance.save_revision()
+            revision.created_at = timezone.now() - datetime.timedelta(days=days)
+            revision.save()
+            self.revisions.append(revision)
+        # the oldest revision is live
+        self.revisions[0].publish()
+        # a page without any blocks to migrate in its revisions
+        factories.SamplePageFactory(content__0="char2").save_revision()
+
+    def get_migrated_revisions(self):
+        migrated_revisions = []
+        for revision in self.revisions:
+            revision.refresh_from_db()
+            if json.loads(revision.content["content"])[0]["type"] == "renamed1":
+                migrated_revisions.append(revision)
+        return migrated_revisions
+
+    def get_unmigrated_revision_ids(self):
+        return set(
+            UnmigratedRevision.objects.filter(
+                deferred_migration__key=self.init_migration()
+                .operations[0]
+                .checkpoint_key
+            ).values_list("revision_id", flat=True)
+        )
+
+    def test_keep_recent(self):
+        self.apply_migration()
+
+        # the live revision along with the two most recent ones
+        self.assertEqual(
+            self.get_migrated_revisions(),
+            [self.revisions[0], self.revisions[3], self.revisions[4]],
+        )
+        self.assertEqual(
+            self.get_unmigrated_revision_ids(),
+            {self.revisions[1].id, self.revisions[2].id},
+        )
+        deferred_migration = DeferredStreamDataMigration.objects.get()
+        self.assertEqual(deferred_migration.app_name, "toolkit_test")
+        self.assertEqual(deferred_migration.model_name, "SamplePage")
+        self.assertEqual(deferred_migration.field_name, "content")
+
+    def test_keep_recent_and_revisions_from(self):
+        self.apply_migration(
+            revisions_from=timezone.now() - datetime.timedelta(days=7)
+        )
+
+        self.assertEqual(
+            self.get_migrated_revisions(),
+            [self.revisions[0], self.revisions[2], self.revisions[3], self.revisions[4]],
+        )
+        self.assertEqual(self.get_unmigrated_revision_ids(), {self.revisions[1].id})
+
+    def test_run_again(self):
+        self.apply_migration()
+        self.apply_migration()
+
+        self.assertEqual(
+            self.get_unmigrated_revision_ids(),
+            {self.revisions[1].id, self.revisions[2].id},
+        )
+
+    def test_operations_with_other_arguments(self):
+        """Operations which only differ in their arguments should have separate deferred
+        migrations"""
+
+        for new_value in ["x", "y"]:
+            self.apply_migration(
+                operations_and_block_path=[
+                    (AlterBlockValueOperation(new_value=new_value), "char1")
+                ]
+            )
+
+        self.assertEqual(DeferredStreamDataMigration.objects.count(), 2)
+        for deferred_migration in DeferredStreamDataMigration.objects.all():
+            self.assertEqual(
+                set(
+                    deferred_migration.unmigrated_revisions.values_list(
+                        "revision_id", flat=True
+                    )
+                ),
+                {self.revisions[1].id, self.revisions[2].id},
+            )
+
+    def test_same_operations_in_other_migrations(self):
+        """Identical operations in different migrations should have separate deferred
+        migrations"""
+
+        for migration_name in ["0002_rename_char1", "0003_rename_char1_again"]:
+            with mock.patch.object(
+                pending_migrations,
+                "find",
+                return_value=(Migration(migration_name, "toolkit_test"), 0),
+            ):
+                self.apply_migration()
+
+        self.assertEqual(DeferredStreamDataMigration.objects.count(), 2)
+        for deferred_migration in DeferredStreamDataMigration.objects.all():
+            self.assertEqual(
+                set(
+                    deferred_migration.unmigrated_revisions.values_list(
+                        "revision_id", flat=True
+                    )
+                ),
+                {self.revisions[1].id, self.revisions[2].id},
+            )
+
+
+class InterleavedRevisionRetentionTest(RevisionRetentionTest):
+    migration_kwargs = {
+        "revisions_keep_recent": 2,
+        "defer_revisions": True,
+        "interleave_revisions": True,
+    }
+
+
+class DeferRevisionsOptionTest(SimpleTestCase):
+    def test_defer_revisions_without_retention_policy(self):
+        with self.assertRaises(ValueError):
+            MigrateStreamData(
+                app_name="toolkit_test",
+                model_name="SamplePage",
+                field_name="content",
+                operations_and_block_paths=[],
+                defer_revisions=True,
+            )
@@ -0,0 +1,77 @@
+from django.test import TestCase
+
+from .. import factories, models
+from .test_migrations import BaseMigrationTest
+from wagtail_streamfield_migration_toolkit.row_sources import (
+    KeysetRowSource,
+    QuerysetIteratorRowSource,
+)
+
+
+class RowSourceTestMixin:
+    row_source = None
+
+    def setUp(self):
+        self.instances = [factories.SampleModelFactory() for i in range(5)]
+
+    def test_chunks(self):
+        chunks = list(
+            self.row_source.iter_chunks(
+                models.SampleModel.objects.order_by("pk"), chunk_size=2
+            )
+        )
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(
+            [instance for chunk in chunks for instance in chunk], self.instances
+        )
+
+    def test_start_after(self):
+        chunks = list(
+            self.row_source.iter_chunks(
+                models.SampleModel.objects.order_by("pk"),
+                chunk_size=2,
+                start_after=self.instances[2].pk,
+            )
+        )
+
+        self.assertEqual(
+            [instance for chunk in chunks for instance in chunk], self.instances[3:]
+        )
+
+
+class QuerysetIteratorRowSourceTest(RowSourceTestMixin, TestCase):
+    row_source = QuerysetIteratorRowSource()
+
+
+class KeysetRowSourceTest(RowSourceTestMixin, TestCase):
+    row_source = KeysetRowSource()
+
+    def test_query_per_chunk(self):
+        """Each chunk should be fetched with its own query"""
+
+        chunks = self.row_source.iter_chunks(models.SampleModel.objects.all(), chunk_size=2)
+        with self.assertNumQueries(1):
+            next(chunks)
+        with self.assertNumQueries(1):
+            next(chunks)
+
+
+class TestPageKeysetRowSource(BaseMigrationTest):
+    """Migration tests for pages with instances and revisions fetched in several chunks with a
+    `KeysetRowSource`"""
+
+    model = models.SamplePage
+    factory = factories.SamplePageFactory
+    has_revisions = True
+    app_name = "toolkit_test"
+    migration_kwargs = {"row_source": KeysetRowSource(), "chunk_size": 2}
+
+    def test_migrate_stream_data(self):
+        self._test_migrate_stream_data()
+
+    def test_migrate_revisions(self):
+        self._test_migrate_revisions()
+
+    def test_migrate_revisions_from_date(self):
+        self._test_migrate_revisions_from_date()
@@ -0,0 +1,160 @@
+import json
+from unittest import mock
+from django.db import connection
+from django.db.models import JSONField, F
+from django.db.models.functions import Cast
+from django.test import TestCase
+from wagtail.blocks import StreamValue
+
+from .. import factories, models
+from .test_migrations import BaseMigrationTest
+from wagtail_streamfield_migration_toolkit.writers import (
+    BulkUpdateWriter,
+    ValuesUpdateWriter,
+)
+
+
+class WriterTestMixin:
+    writer = None
+
+    def write_instances(self, model, factory):
+        instances = [factory(content__0__char1__value="Char Block 1") for i in range(3)]
+        for i, instance in enumerate(instances[:2]):
+            instance.content = StreamValue(
+                instance.content.stream_block,
+                [{"type": "char2", "value": "Char Block {}".format(i), "id": "0001"}],
+                is_lazy=True,
+            )
+        self.writer.write(model, instances[:2], "content", connection.alias)
+
+        raw_contents = (
+            model.objects.annotate(raw_content=Cast(F("content"), JSONField()))
+            .order_by("pk")
+            .values_list("raw_content", flat=True)
+        )
+        self.assertEqual(
+            [raw_content[0]["value"] for raw_content in raw_contents],
+            ["Char Block 0", "Char Block 1", "Char Block 1"],
+        )
+        self.assertEqual(
+            [raw_content[0]["type"] for raw_content in raw_contents],
+            ["char2", "char2", "char1"],
+        )
+
+    def test_write(self):
+        self.write_instances(models.SampleModel, factories.SampleModelFactory)
+
+    def test_write_page(self):
+        """The stream data of pages is in the table of the page subclass"""
+
+        self.write_instances(models.SamplePage, factories.SamplePageFactory)
+
+    def test_write_revision_content(self):
+        instance = factories.SamplePageFactory(content__0__char1__value="Char Block 1")
+        revision = instance.save_revision()
+        revision.content["content"] = json.dumps(
+            [{"type": "char2", "value": "Char Block 2", "id": "0001"}]
+        )
+        self.writer.write(type(revision), [revision], "content", connection.alias)
+
+        revision.refresh_from_db()
+        self.assertEqual(json.loads(revision.content["content"])[0]["type"], "char2")
+        self.assertEqual(revision.content["title"], instance.title)
+
+    def test_write_values(self):
+        instances = [
+            factories.SampleModelFactory(content__0__char1__value="Char Block 1")
+            for i in range(2)
+        ]
+        stream_block = models.SampleModel.content.field.stream_block
+        self.writer.write_values(
+            models.SampleModel,
+            "content",
+            [
+                (
+                    instances[0].pk,
+                    StreamValue(
+                        stream_block,
+                        [{"type": "char2", "value": "Char Block 2", "id": "0001"}],
+                        is_lazy=True,
+                    ),
+                )
+            ],
+            connection.alias,
+        )
+
+        for instance in instances:
+            instance.refresh_from_db()
+        self.assertEqual(instances[0].content.raw_data[0]["type"], "char2")
+        self.assertEqual(instances[1].content.raw_data[0]["type"], "char1")
+
+    def test_write_json_key(self):
+        """Only the given key of the revision content should be written"""
+
+        instance = factories.SamplePageFactory(content__0__char1__value="Char Block 1")
+        revision = instance.save_revision()
+        revision.content["content"] = json.dumps(
+            [{"type": "char2", "value": "Char Block 2", "id": "0001"}]
+        )
+        revision.content["title"] = "Changed title"
+        self.writer.write_json_key(
+            type(revision), [revision], "content", "content", connection.alias
+        )
+
+        revision.refresh_from_db()
+        self.assertEqual(json.loads(revision.content["content"])[0]["type"], "char2")
+        self.assertEqual(revision.content["title"], instance.title)
+
+    def test_write_json_key_fallback(self):
+        """The whole field should be written on databases where keys can't be written"""
+
+        instance = factories.SamplePageFactory(content__0__char1__value="Char Block 1")
+        revision = instance.save_revision()
+        revision.content["content"] = json.dumps(
+            [{"type": "char2", "value": "Char Block 2", "id": "0001"}]
+        )
+        with mock.patch.object(connection, "vendor", "oracle"), mock.patch.object(
+            self.writer, "write"
+        ) as write:
+            self.writer.write_json_key(
+                type(revision), [revision], "content", "content", connection.alias
+            )
+
+        write.assert_called_once_with(
+            type(revision), [revision], "content", connection.alias
+        )
+
+    def test_write_nothing(self):
+        with self.assertNumQueries(0):
+            self.writer.write(models.SampleModel, [], "content", connection.alias)
+
+
+class BulkUpdateWriterTest(WriterTestMixin, TestCase):
+    writer = BulkUpdateWriter()
+
+
+class ValuesUpdateWriterTest(WriterTestMixin, TestCase):
+    writer = ValuesUpdateWriter()
+
+
+class TestPageValuesUpdateWriter(BaseMigrationTest):
+    """Migration tests for pages with instances and revisions written by a
+    `ValuesUpdateWriter`"""
+
+    model = models.SamplePage
+    factory = factories.SamplePageFactory
+    has_revisions = True
+    app_name = "toolkit_test"
+    migration_kwargs = {"writer": ValuesUpdateWriter()}
+
+    def test_migrate_stream_data(self):
+        self._test_migrate_stream_data()
+
+    def test_migrate_revisions(self):
+        self._test_migrate_revisions()
+
+    def test_migrate_revisions_from_date(self):
+        self._test_migrate_revisions_from_date()
+
+    def test_unchanged_data_not_written(self):
+        self._test_unchanged_data_not_written()
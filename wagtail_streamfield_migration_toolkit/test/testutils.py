@@ -10,6 +10,8 @@ class MigrationTestMixin:
     model = None
     default_operation_and_block_path = []
     app_name = None
+    # extra keyword arguments for `MigrateStreamData`
+    migration_kwargs = {}
 
     def init_migration(self, revisions_from=None, operations_and_block_path=None):
         migration = Migration(
@@ -22,6 +24,7 @@ class MigrationTestMixin:
             operations_and_block_paths=operations_and_block_path
             or self.default_operation_and_block_path,
             revisions_from=revisions_from,
+            **self.migration_kwargs
         )
         migration.operations = [migration_operation]
 
@@ -11,6 +11,9 @@ class TestNonPageModelWithRevisions(BaseMigrationTest):
     def test_migrate_stream_data(self):
         self._test_migrate_stream_data()
 
+    def test_unchanged_data_not_written(self):
+        self._test_unchanged_data_not_written()
+
     def test_migrate_revisions(self):
         self._test_migrate_revisions()
 
@@ -1,5 +1,12 @@
+import hashlib
+from collections import OrderedDict
 from wagtail.blocks import ListBlock, StreamBlock, StructBlock
 
+from wagtail_streamfield_migration_toolkit.block_paths import parse_block_path
+from wagtail_streamfield_migration_toolkit.optimizer import (
+    optimize_operations_and_block_paths,
+)
+
 
 class InvalidBlockDefError(Exception):
     """Exception for invalid block definitions"""
@@ -211,12 +218,16 @@ def map_list_block_value(list_block_value, block_def, block_path, **kwargs):
     return mapped_value
 
 
-def formatted_list_child_generator(list_block_value):
-    is_old_format = False
+def is_old_list_format(list_block_value):
+    if not list_block_value:
+        return False
     if not isinstance(list_block_value[0], dict):
-        is_old_format = True
-    elif "type" not in list_block_value[0] or list_block_value[0]["type"] != "item":
-        is_old_format = True
+        return True
+    return "type" not in list_block_value[0] or list_block_value[0]["type"] != "item"
+
+
+def formatted_list_child_generator(list_block_value):
+    is_old_format = is_old_list_format(list_block_value)
 
     for child in list_block_value:
         if not is_old_format:
@@ -272,12 +283,9 @@ def apply_changes_to_raw_data(
         altered_raw_data:
     """
 
-    if block_path_str == "":
-        # If block_path_str is "", we're directly applying the operation on the top level
-        # streamblock.
-        block_path = []
-    else:
-        block_path = block_path_str.split(".")
+    # If block_path_str is "", we're directly applying the operation on the top level
+    # streamblock.
+    block_path = parse_block_path(block_path_str)
     block_def = streamfield.field.stream_block
 
     altered_raw_data = map_block_value(
@@ -289,3 +297,498 @@ def apply_changes_to_raw_data(
     )
 
     return altered_raw_data
+
+
+# The `map` method of each of the mappers below returns a tuple of the mapped value and whether
+# anything was changed. When nothing was changed, the value passed to `map` is returned as is.
+
+
+class OperationMapper:
+    """Applies an operation to a block value. This is the end of a compiled block path."""
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    def map(self, block_value):
+        mapped_value = self.operation.apply(block_value)
+        if self.operation.returns_same_value_if_unchanged:
+            return mapped_value, mapped_value is not block_value
+        return mapped_value, True
+
+
+class SequenceMapper:
+    """Applies a list of mappers one after the other to the same block value"""
+
+    def __init__(self, mappers):
+        self.mappers = mappers
+
+    def map(self, block_value):
+        is_changed = False
+        for mapper in self.mappers:
+            block_value, is_mapper_changed = mapper.map(block_value)
+            is_changed = is_changed or is_mapper_changed
+        return block_value, is_changed
+
+
+class StreamChildrenMapper:
+    """Maps the value of each StreamBlock child with the mapper for its type, if there is one
+
+    Attributes:
+        child_mappers (dict): mappers for the child block values, keyed by child block type
+    """
+
+    def __init__(self, child_mappers):
+        self.child_mappers = child_mappers
+
+    def map(self, stream_block_value):
+        child_mappers = self.child_mappers
+        mapped_value = []
+        is_changed = False
+        for child_block in stream_block_value:
+            child_mapper = child_mappers.get(child_block["type"])
+            if child_mapper is None:
+                mapped_value.append(child_block)
+                continue
+            mapped_child_value, is_child_changed = child_mapper.map(child_block["value"])
+            if is_child_changed:
+                mapped_value.append({**child_block, "value": mapped_child_value})
+                is_changed = True
+            else:
+                mapped_value.append(child_block)
+        if not is_changed:
+            return stream_block_value, False
+        return mapped_value, True
+
+
+class StructChildrenMapper:
+    """Maps the value of each StructBlock child with the mapper for its name, if there is one
+
+    Attributes:
+        child_mappers (dict): mappers for the child block values, keyed by child block name
+    """
+
+    def __init__(self, child_mappers):
+        self.child_mappers = child_mappers
+
+    def map(self, struct_block_value):
+        child_mappers = self.child_mappers
+        mapped_value = {}
+        is_changed = False
+        for key, child_value in struct_block_value.items():
+            child_mapper = child_mappers.get(key)
+            if child_mapper is None:
+                mapped_value[key] = child_value
+                continue
+            mapped_value[key], is_child_changed = child_mapper.map(child_value)
+            is_changed = is_changed or is_child_changed
+        if not is_changed:
+            return struct_block_value, False
+        return mapped_value, True
+
+
+class ListChildMapper:
+    """Maps the value of each ListBlock child with `child_mapper`"""
+
+    def __init__(self, child_mapper):
+        self.child_mapper = child_mapper
+
+    def map(self, list_block_value):
+        child_mapper = self.child_mapper
+        # Data in the old list format is always changed, since it is converted to the new format.
+        is_changed = is_old_list_format(list_block_value)
+        mapped_value = []
+        for child_block in formatted_list_child_generator(list_block_value):
+            mapped_child_value, is_child_changed = child_mapper.map(child_block["value"])
+            if is_child_changed:
+                mapped_value.append({**child_block, "value": mapped_child_value})
+                is_changed = True
+            else:
+                mapped_value.append(child_block)
+        if not is_changed:
+            return list_block_value, False
+        return mapped_value, True
+
+
+class InvalidBlockDefMapper:
+    """Stands in for a block which has no definition. Raises only if a matching block is found."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def map(self, block_value):
+        raise InvalidBlockDefError("No current block def named {}".format(self.name))
+
+
+class UnexpectedBlockMapper:
+    """Stands in for a non structural block which has been given a child in the block path"""
+
+    def map(self, block_value):
+        raise ValueError("Unexpected Structural Block: {}".format(block_value))
+
+
+def compile_children_mapper(block_def, operations_by_child_name):
+    """Compiles a mapper for the children of a block, given the operations for each child"""
+
+    if isinstance(block_def, StreamBlock) or isinstance(block_def, StructBlock):
+        child_mappers = {}
+        for name, child_operations_and_block_paths in operations_by_child_name.items():
+            try:
+                child_block_def = block_def.child_blocks[name]
+            except KeyError:
+                child_mappers[name] = InvalidBlockDefMapper(name)
+                continue
+            child_mappers[name] = compile_block_paths(
+                child_block_def, child_operations_and_block_paths
+            )
+        if isinstance(block_def, StreamBlock):
+            return StreamChildrenMapper(child_mappers)
+        return StructChildrenMapper(child_mappers)
+
+    elif isinstance(block_def, ListBlock):
+        # The name of a ListBlock child in the block path is always 'item', so all of the
+        # operations are for the same child.
+        child_operations_and_block_paths = []
+        for operations_and_block_paths in operations_by_child_name.values():
+            child_operations_and_block_paths.extend(operations_and_block_paths)
+        return ListChildMapper(
+            compile_block_paths(block_def.child_block, child_operations_and_block_paths)
+        )
+
+    else:
+        return UnexpectedBlockMapper()
+
+
+def compile_block_paths(block_def, operations_and_block_paths):
+    """
+    Merges a list of operations into a trie keyed by block path, and resolves the block paths
+    against the block definitions, so that all operations can be applied in a single traversal of
+    a block value.
+
+    Operations are still applied in the order they are given. Consecutive operations on children
+    of a block share a single pass over its children, since mapping the value of one child does not
+    affect the others. An operation on the block itself ends such a pass.
+
+    Args:
+        block_def:
+            The definition of the block from which the block paths start.
+        operations_and_block_paths (:obj:`list` of :obj:`tuple` of (:obj:`operation`, :obj:`list`)):
+            List of operations and block paths (as lists of names of the blocks from `block_def`
+            (not included) to the nested block of which the value will be passed to the operation).
+
+    Returns:
+        mapper:
+            An object with a `map` method which gives the same result as applying each operation in
+            turn with `map_block_value`.
+    """
+
+    mappers = []
+    operations_by_child_name = None
+    for operation, block_path in operations_and_block_paths:
+        if len(block_path) == 0:
+            if operations_by_child_name is not None:
+                mappers.append(
+                    compile_children_mapper(block_def, operations_by_child_name)
+                )
+                operations_by_child_name = None
+            mappers.append(OperationMapper(operation))
+        else:
+            if operations_by_child_name is None:
+                operations_by_child_name = {}
+            operations_by_child_name.setdefault(block_path[0], []).append(
+                (operation, block_path[1:])
+            )
+
+    if operations_by_child_name is not None:
+        mappers.append(compile_children_mapper(block_def, operations_by_child_name))
+
+    if len(mappers) == 1:
+        return mappers[0]
+    return SequenceMapper(mappers)
+
+
+class StreamDataMigrationPlan:
+    """A list of operations and block paths compiled against the definition of a StreamField.
+
+    The plan is built once for a migration and can then be applied to the raw data of any number
+    of instances or revisions of the StreamField, in a single traversal of the data for all of the
+    operations.
+
+    The operations are reduced with `optimizer.OperationOptimizer` first, so that for example
+    operations which have no effect after an earlier rename or removal are left out.
+
+    Args:
+        stream_block:
+            The top level StreamBlock definition of the StreamField.
+        operations_and_block_paths (:obj:`list` of :obj:`tuple` of (:obj:`operation`, :obj:`str`)):
+            List of operations and corresponding block paths to apply.
+    """
+
+    def __init__(self, stream_block, operations_and_block_paths):
+        self.mapper = compile_block_paths(
+            stream_block,
+            [
+                (operation, parse_block_path(block_path_str))
+                for operation, block_path_str in optimize_operations_and_block_paths(
+                    operations_and_block_paths
+                )
+            ],
+        )
+
+    def apply(self, raw_data):
+        """Applies all operations in order to the given raw stream data
+
+        Returns:
+            A tuple of the altered raw data and whether anything was changed. If nothing was
+            changed, `raw_data` itself is returned.
+        """
+
+        return self.mapper.map(raw_data)
+
+    def apply_to_chunk(self, raw_data_list, json_backend=None):
+        """Applies all operations in order to each raw stream data in a list
+
+        Args:
+            raw_data_list (list): The raw stream data of a chunk of instances or revisions.
+            json_backend (:obj:`object`, optional): If given, the raw stream data are JSON
+                strings, which are decoded before and encoded after applying the operations with
+                this backend (see `json_backends.get_json_backend`). Defaults to `None`.
+
+        Returns:
+            A list with a tuple of the altered raw data and the `InvalidBlockDefError` raised for
+            each raw stream data. The altered raw data is `None` if nothing was changed or an error
+            was raised.
+        """
+
+        return [
+            self.apply_to_raw_data(raw_data, json_backend=json_backend)
+            for raw_data in raw_data_list
+        ]
+
+    def apply_to_raw_data(self, raw_data, json_backend=None):
+        """Applies all operations in order to a single raw stream data, see `apply_to_chunk`
+
+        Returns:
+            A tuple of the altered raw data (or `None`) and the `InvalidBlockDefError` raised (or
+            `None`).
+        """
+
+        if json_backend is not None:
+            raw_data = json_backend.loads(raw_data)
+        try:
+            altered_raw_data, is_changed = self.apply(raw_data)
+        except InvalidBlockDefError as e:
+            return None, e
+
+        if not is_changed:
+            return None, None
+        elif json_backend is not None:
+            return json_backend.dumps(altered_raw_data), None
+        return altered_raw_data, None
+
+
+class ChainedMigrationPlan(StreamDataMigrationPlan):
+    """Applies the plans of several migrations of a StreamField one after the other, each compiled
+    against the definition of the StreamField at its own migration.
+
+    Args:
+        plans (:obj:`list` of :obj:`StreamDataMigrationPlan`): The plans to apply, in order.
+    """
+
+    def __init__(self, plans):
+        self.mapper = SequenceMapper([plan.mapper for plan in plans])
+
+
+class ResultCache:
+    """A least recently used cache of the results of plans, by a hash of the JSON strings of raw
+    stream data they were applied to, limited to a total size in bytes.
+
+    The size of an entry is the length in bytes of its key and of its altered JSON string (if
+    any) encoded as UTF-8, so results for stream data which isn't changed by a plan take little
+    space.
+
+    Args:
+        max_bytes (int): The maximum total size of the entries. The least recently used entries
+            are dropped to keep the cache within this size.
+
+    Attributes:
+        hits (int): The number of results which were found in the cache.
+        misses (int): The number of results which weren't found in the cache.
+        size (int): The current total size of the entries.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        # The result and size of each entry
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+
+    def get(self, key):
+        """Returns the cached result for a key, or `None`"""
+
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, result):
+        altered_raw_data, _ = result
+        entry_size = len(key)
+        if isinstance(altered_raw_data, str):
+            entry_size += len(altered_raw_data.encode())
+        elif altered_raw_data is not None:
+            entry_size += len(altered_raw_data)
+        if entry_size > self.max_bytes:
+            return
+        self.entries[key] = (result, entry_size)
+        self.size += entry_size
+        while self.size > self.max_bytes:
+            _, (_, dropped_size) = self.entries.popitem(last=False)
+            self.size -= dropped_size
+
+
+class CachedMigrationPlan(StreamDataMigrationPlan):
+    """Keeps the results of a plan for JSON strings of raw stream data in a `ResultCache`, so that
+    stream data which is the same as stream data the plan was already applied to (as is common
+    for the revisions of an instance) isn't decoded and transformed again.
+
+    Raw stream data which isn't a JSON string, such as the stream data of instances, is not
+    cached.
+
+    Args:
+        plan (:obj:`StreamDataMigrationPlan`): The plan to apply.
+        cache (:obj:`ResultCache`): The cache to keep the results in. A cache can be shared by
+            the plans of several fields.
+        key_prefix (:obj:`bytes`, optional): Prefix of the keys of the results of this plan,
+            which must be different for each plan sharing the cache. Defaults to `b""`.
+    """
+
+    def __init__(self, plan, cache, key_prefix=b""):
+        self.mapper = plan.mapper
+        self.cache = cache
+        self.key_prefix = key_prefix
+
+    def apply_to_raw_data(self, raw_data, json_backend=None):
+        if json_backend is None:
+            return super().apply_to_raw_data(raw_data)
+
+        key = (
+            self.key_prefix
+            + hashlib.sha1(
+                raw_data.encode() if isinstance(raw_data, str) else raw_data
+            ).digest()
+        )
+        result = self.cache.get(key)
+        if result is None:
+            result = super().apply_to_raw_data(raw_data, json_backend=json_backend)
+            self.cache.set(key, result)
+        return result
+
+
+class StreamFieldsMigrationPlan:
+    """The plans of one or more StreamFields of a model, applied together to the raw stream data of
+    all of the fields of each instance or revision.
+
+    Args:
+        plans (:obj:`list` of :obj:`StreamDataMigrationPlan`): The plan of each field.
+    """
+
+    def __init__(self, plans):
+        self.plans = plans
+
+    def apply_to_chunk(self, raw_data_list, json_backend=None):
+        """Applies the plan of each field to its raw stream data, for each instance or revision in
+        a chunk
+
+        Args:
+            raw_data_list (list): A tuple with the raw stream data of each field (or `None` if
+                there is none), for each instance or revision of a chunk.
+            json_backend (:obj:`object`, optional): See `StreamDataMigrationPlan.apply_to_chunk`.
+
+        Returns:
+            A list with a tuple of the altered raw data and the `InvalidBlockDefError` raised for
+            each instance or revision. The altered raw data is a tuple with the altered raw data
+            of each field, which is `None` for fields which weren't changed, or `None` itself if
+            nothing was changed or an error was raised.
+        """
+
+        return [
+            self.apply_to_raw_data_tuple(raw_data_tuple, json_backend=json_backend)
+            for raw_data_tuple in raw_data_list
+        ]
+
+    def apply_to_raw_data_tuple(self, raw_data_tuple, json_backend=None):
+        """Applies the plan of each field to the raw stream data of a single instance or revision,
+        see `apply_to_chunk`"""
+
+        altered_raw_data_tuple = []
+        for plan, raw_data in zip(self.plans, raw_data_tuple):
+            altered_raw_data = None
+            if raw_data is not None:
+                altered_raw_data, error = plan.apply_to_raw_data(
+                    raw_data, json_backend=json_backend
+                )
+                if error is not None:
+                    return None, error
+            altered_raw_data_tuple.append(altered_raw_data)
+
+        if all(raw_data is None for raw_data in altered_raw_data_tuple):
+            return None, None
+        return tuple(altered_raw_data_tuple), None
+
+
+class ContentTypesMigrationPlan:
+    """The plans of several models, applied to chunks of revisions of any of the models.
+
+    Args:
+        plans (:obj:`dict`): The `StreamFieldsMigrationPlan` of each model, by the id of its
+            content type.
+    """
+
+    def __init__(self, plans):
+        self.plans = plans
+
+    def apply_to_chunk(self, raw_data_list, json_backend=None):
+        """Applies the plan of the model of each revision in a chunk to its raw stream data
+
+        Args:
+            raw_data_list (list): A tuple of the content type id and the raw stream data of each
+                field of the model (see `StreamFieldsMigrationPlan.apply_to_chunk`), for each
+                revision of a chunk.
+            json_backend (:obj:`object`, optional): See `StreamDataMigrationPlan.apply_to_chunk`.
+
+        Returns:
+            See `StreamFieldsMigrationPlan.apply_to_chunk`.
+        """
+
+        return [
+            self.plans[content_type_id].apply_to_raw_data_tuple(
+                raw_data_tuple, json_backend=json_backend
+            )
+            for content_type_id, raw_data_tuple in raw_data_list
+        ]
+
+
+def get_result_caches(plan):
+    """Returns the `ResultCache`s used by a plan and the plans it is made of, each once, in the
+    same order for a plan and for a copy of it (e.g. in a worker process)."""
+
+    if isinstance(plan, CachedMigrationPlan):
+        return [plan.cache]
+    if isinstance(plan, StreamFieldsMigrationPlan):
+        plans = plan.plans
+    elif isinstance(plan, ContentTypesMigrationPlan):
+        plans = plan.plans.values()
+    else:
+        return []
+
+    caches = []
+    for child_plan in plans:
+        for cache in get_result_caches(child_plan):
+            if not any(cache is seen_cache for seen_cache in caches):
+                caches.append(cache)
+    return caches
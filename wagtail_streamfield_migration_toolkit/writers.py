@@ -0,0 +1,217 @@
+from django.db import connections
+from django.utils.deconstruct import deconstructible
+
+
+class BaseWriter:
+    """Base class for writing back changed rows to the database"""
+
+    def write(self, model, objs, field_name, using):
+        """Writes the value of a field of a chunk of model instances to the database
+
+        Args:
+            model: The model of the instances.
+            objs (list): The model instances to write.
+            field_name (str): The name of the field to write.
+            using (str): The alias of the database to write to.
+        """
+
+        attname = model._meta.get_field(field_name).attname
+        self.write_values(
+            model,
+            field_name,
+            [(obj.pk, getattr(obj, attname)) for obj in objs],
+            using,
+        )
+
+    def write_values(self, model, field_name, pks_and_values, using):
+        """Writes the values of a field of a chunk of rows to the database, without needing model
+        instances for the rows.
+
+        Args:
+            model: The model of the rows.
+            field_name (str): The name of the field to write.
+            pks_and_values (:obj:`list` of :obj:`tuple` of (pk, value)): The primary key of each
+                row along with the value of the field to write.
+            using (str): The alias of the database to write to.
+        """
+
+        raise NotImplementedError
+
+    def write_json_key(self, model, objs, field_name, key, using):
+        """Writes the value of a single key of a JSONField of a chunk of model instances to the
+        database.
+
+        On PostgreSQL, SQLite and MySQL only the value of the key is updated, leaving the rest of
+        the JSON as it is in the database. On other databases the whole field is written with
+        `write`.
+
+        Args:
+            model: The model of the instances.
+            objs (list): The model instances to write.
+            field_name (str): The name of the JSONField.
+            key (str): The top level key in the JSON of which the value should be written. The
+                value must be a string.
+            using (str): The alias of the database to write to.
+        """
+
+        attname = model._meta.get_field(field_name).attname
+        is_written = write_json_key_values(
+            model,
+            field_name,
+            key,
+            [(obj.pk, getattr(obj, attname)[key]) for obj in objs],
+            using,
+        )
+        if not is_written:
+            self.write(model, objs, field_name, using)
+
+
+@deconstructible
+class BulkUpdateWriter(BaseWriter):
+    """Writes back changed rows with `QuerySet.bulk_update`, which updates a chunk of rows with a
+    single `UPDATE ... SET field = CASE WHEN pk = ... THEN ... END` query."""
+
+    def write(self, model, objs, field_name, using):
+        """See `BaseWriter.write`"""
+
+        model.objects.using(using).bulk_update(objs, [field_name])
+
+    def write_values(self, model, field_name, pks_and_values, using):
+        """See `BaseWriter.write_values`"""
+
+        # `bulk_update` needs model instances, so only the primary key and the field are set on
+        # them.
+        objs = [model(pk=pk, **{field_name: value}) for pk, value in pks_and_values]
+        self.write(model, objs, field_name, using)
+
+
+@deconstructible
+class ValuesUpdateWriter(BaseWriter):
+    """Writes back changed rows with a plain `UPDATE` query for each row instead of a `CASE`
+    expression over all rows of the chunk.
+
+    On PostgreSQL all rows of a chunk are updated with a single
+    `UPDATE ... FROM (VALUES (pk, value), ...)` query joining the new values to the table by primary
+    key. On other databases, the `UPDATE` query for each row is run with `executemany`.
+    """
+
+    def write_values(self, model, field_name, pks_and_values, using):
+        """See `BaseWriter.write_values`"""
+
+        if not pks_and_values:
+            return
+
+        connection = connections[using]
+        field = model._meta.get_field(field_name)
+        table, column, pk_field, pk_column = get_update_target(connection, field)
+
+        pks_and_values = [
+            (
+                pk_field.get_db_prep_value(pk, connection),
+                field.get_db_prep_save(value, connection),
+            )
+            for pk, value in pks_and_values
+        ]
+
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "UPDATE {table} SET {column} = CAST(v.value AS {db_type}) "
+                    "FROM (VALUES {values}) AS v (pk, value) "
+                    "WHERE {table}.{pk_column} = CAST(v.pk AS {pk_db_type})".format(
+                        table=table,
+                        column=column,
+                        db_type=field.db_type(connection),
+                        values=", ".join(["(%s, %s)"] * len(pks_and_values)),
+                        pk_column=pk_column,
+                        pk_db_type=pk_field.rel_db_type(connection),
+                    ),
+                    [param for pk_and_value in pks_and_values for param in pk_and_value],
+                )
+            else:
+                cursor.executemany(
+                    "UPDATE {table} SET {column} = %s WHERE {pk_column} = %s".format(
+                        table=table, column=column, pk_column=pk_column
+                    ),
+                    [(value, pk) for pk, value in pks_and_values],
+                )
+
+
+def get_update_target(connection, field):
+    """Returns the quoted table and column names, the primary key field and the quoted primary key
+    column name to update a field with.
+
+    The field may be on a parent model, in which case the parent table is updated, joining on the
+    primary key of the parent (which is the same as that of the child).
+    """
+
+    pk_field = field.model._meta.pk
+    return (
+        connection.ops.quote_name(field.model._meta.db_table),
+        connection.ops.quote_name(field.column),
+        pk_field,
+        connection.ops.quote_name(pk_field.column),
+    )
+
+
+def supports_json_key_writes(connection):
+    """Whether `write_json_key_values` can write to the database of the given connection"""
+    return connection.vendor in ("postgresql", "sqlite", "mysql")
+
+
+def write_json_key_values(model, field_name, key, pks_and_values, using):
+    """Sets the value of a top level key in the JSON of a JSONField to a string, for a chunk of rows
+
+    Args:
+        model: The model of the rows.
+        field_name (str): The name of the JSONField.
+        key (str): The top level key in the JSON to set.
+        pks_and_values (:obj:`list` of :obj:`tuple` of (pk, str)): The primary key of each row
+            along with the string to set the key to.
+        using (str): The alias of the database to write to.
+
+    Returns:
+        Whether the values could be written. Only PostgreSQL, SQLite and MySQL are supported.
+    """
+
+    connection = connections[using]
+    if not supports_json_key_writes(connection):
+        return False
+    if not pks_and_values:
+        return True
+
+    field = model._meta.get_field(field_name)
+    table, column, pk_field, pk_column = get_update_target(connection, field)
+    pks_and_values = [
+        (pk_field.get_db_prep_value(pk, connection), value) for pk, value in pks_and_values
+    ]
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "UPDATE {table} SET {column} = "
+                "jsonb_set({table}.{column}, ARRAY[%s], to_jsonb(CAST(v.value AS text))) "
+                "FROM (VALUES {values}) AS v (pk, value) "
+                "WHERE {table}.{pk_column} = CAST(v.pk AS {pk_db_type})".format(
+                    table=table,
+                    column=column,
+                    values=", ".join(["(%s, %s)"] * len(pks_and_values)),
+                    pk_column=pk_column,
+                    pk_db_type=pk_field.rel_db_type(connection),
+                ),
+                [key]
+                + [param for pk_and_value in pks_and_values for param in pk_and_value],
+            )
+        else:
+            # A string given to JSON_SET is set as a JSON string, on both SQLite and MySQL
+            cursor.executemany(
+                "UPDATE {table} SET {column} = JSON_SET({column}, %s, %s) "
+                "WHERE {pk_column} = %s".format(
+                    table=table, column=column, pk_column=pk_column
+                ),
+                [
+                    ('$."{}"'.format(key), value, pk)
+                    for pk, value in pks_and_values
+                ],
+            )
+    return True